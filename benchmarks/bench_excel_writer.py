@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""
+Benchmarks writing SISTR results with SistrExcelWriter, reporting rows/second and peak (Python) memory.
+
+Example:
+    python benchmarks/bench_excel_writer.py --rows 100000 --projects 100
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from irida_sistr_results.sistr_info import SampleSistrInfo
+from irida_sistr_results.sistr_writer import SistrExcelWriter
+
+QC_STATUSES = ['PASS', 'WARNING', 'FAIL']
+
+
+def create_sistr_info(sample_id):
+    """
+    Creates a SampleSistrInfo with synthetic SISTR predictions for a sample.
+
+    :param sample_id: The sample identifier.
+    :return: The SampleSistrInfo.
+    """
+    sample = {
+        'identifier': str(sample_id),
+        'sampleName': 'sample' + str(sample_id),
+        'createdDate': 1500000000000 + sample_id
+    }
+
+    if sample_id % 10 == 0:
+        return SampleSistrInfo.create_empty_info(sample)
+
+    return SampleSistrInfo({
+        'has_results': True,
+        'sample': sample,
+        'paired_files': [{'identifier': str(sample_id)}],
+        'submission': {
+            'identifier': str(sample_id),
+            'workflowId': 'e8f9cc61-3264-48c6-81d9-02d9e84bccc7',
+            'createdDate': 1500000000000 + sample_id
+        },
+        'sistr_predictions': [{
+            'qc_status': QC_STATUSES[sample_id % len(QC_STATUSES)],
+            'qc_messages': '',
+            'serovar': 'Enteritidis',
+            'serovar_antigen': 'Enteritidis',
+            'serovar_cgmlst': 'Enteritidis',
+            'serogroup': 'D1',
+            'h1': 'g,m',
+            'h2': '-',
+            'o_antigen': '1,9,12',
+            'cgmlst_subspecies': 'enterica',
+            'cgmlst_genome_match': 'SRR1002850',
+            'cgmlst_matching_alleles': 330 - sample_id % 5,
+            'cgmlst_ST': 1468400419,
+            'mash_subspecies': 'enterica',
+            'mash_serovar': 'Enteritidis',
+            'mash_genome': 'SRR1002850',
+            'mash_distance': 0.0001
+        }]
+    }, ['Enteritidis'])
+
+
+def create_sistr_results(rows, projects):
+    """
+    Creates synthetic SISTR results in the same structure as IridaSistrResults.
+
+    :param rows: The total number of results (rows).
+    :param projects: The number of projects to spread the results over.
+    :return: A dictionary of {project id: {sample id: SampleSistrInfo}}.
+    """
+    sistr_results = {str(project): {} for project in range(1, projects + 1)}
+    for sample_id in range(rows):
+        sistr_info = create_sistr_info(sample_id)
+        sistr_results[str(sample_id % projects + 1)][sistr_info.get_sample_id()] = sistr_info
+
+    return sistr_results
+
+
+def run(rows, projects, writer_options):
+    sistr_results = create_sistr_results(rows, projects)
+
+    out_file = tempfile.NamedTemporaryFile(suffix='.xlsx', delete=False).name
+    try:
+        tracemalloc.start()
+        start = time.perf_counter()
+
+        writer = SistrExcelWriter('http://localhost/irida', 'bench_excel_writer', 'bench_excel_writer', 'user', out_file,
+                                  **writer_options)
+        writer.write(sistr_results)
+        writer.close()
+
+        elapsed = time.perf_counter() - start
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        file_size = os.path.getsize(out_file)
+    finally:
+        os.remove(out_file)
+
+    return elapsed, peak, file_size
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks writing SISTR results to an Excel file.')
+    parser.add_argument('--rows', type=int, default=100000, help='The number of rows to write [100000]')
+    parser.add_argument('--projects', type=int, default=100, help='The number of projects [100]')
+    parser.add_argument('--constant-memory', action='store_true',
+                        help='Write the worksheet one row at a time instead of keeping it in memory')
+    args = parser.parse_args()
+
+    writer_options = {'constant_memory': True} if args.constant_memory else {}
+    elapsed, peak, file_size = run(args.rows, args.projects, writer_options)
+
+    print("rows={} projects={} time={:.2f}s rows/sec={:.0f} peak_memory={:.1f}MB file_size={:.1f}MB".format(
+        args.rows, args.projects, elapsed, args.rows / elapsed, peak / 1024 / 1024, file_size / 1024 / 1024))
@@ -0,0 +1,292 @@
+#!/usr/bin/env python
+"""
+Benchmarks the hot paths of irida-sistr-results: loading results from a mock IRIDA server, merging shared/user
+results, ranking submissions of a sample and writing results. Each benchmark runs in a separate process, reporting the
+wall time, the number of requests sent to IRIDA and the peak memory (maximum resident set size) of that process.
+
+Example:
+    python benchmarks/run_benchmarks.py run --output baseline.json
+    python benchmarks/run_benchmarks.py run --output results.json
+    python benchmarks/run_benchmarks.py compare baseline.json results.json
+"""
+
+import argparse
+import functools
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import traceback
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bench_excel_writer import create_sistr_info, create_sistr_results
+from irida_sistr_results.irida_api import IridaAPI
+from irida_sistr_results.irida_connector import IridaConnector
+from irida_sistr_results.irida_sistr_results import IridaSistrResults
+from irida_sistr_results.sistr_info import SampleSistrInfo
+from irida_sistr_results.sistr_writer import SistrCsvWriter, SistrExcelWriter
+from irida_sistr_results.tests.mock_irida import MockIridaData, MockIridaServer
+
+# Number of samples in each project of the traversal benchmarks
+SAMPLES_PER_PROJECT = 100
+
+# The default proportion a metric may grow by before it is flagged as a regression
+DEFAULT_THRESHOLDS = {
+    'wall_time': 0.10,
+    'requests': 0.0,
+    'peak_memory': 0.10,
+}
+
+
+def _serve_mock_irida(samples, latency, port_queue):
+    data = MockIridaData.generate(projects=max(1, samples // SAMPLES_PER_PROJECT),
+                                  samples_per_project=min(samples, SAMPLES_PER_PROJECT))
+    server = MockIridaServer(data, latency=latency)
+    port_queue.put(server.url)
+    server.serve_forever()
+
+
+def bench_traversal(samples, jobs=4, latency=0):
+    """
+    Loads results for all projects with IridaSistrResults.get_sistr_results_from_projects() from a mock IRIDA server
+    (run in a separate process so it's not counted in the time or memory).
+    """
+    url_queue = multiprocessing.Queue()
+    server_process = multiprocessing.Process(target=_serve_mock_irida, args=(samples, latency, url_queue),
+                                             daemon=True)
+    server_process.start()
+    try:
+        url = url_queue.get(timeout=600)
+        connector = IridaConnector('client', 'secret', 'user', 'password', url, 600, pool_size=max(jobs, 10))
+        irida_api = IridaAPI(connector, ['Enteritidis'], jobs)
+        project_ids = [project['identifier'] for project in irida_api.get_user_projects()]
+        requests_before = connector.get_connection_stats().requests_sent
+
+        start = time.perf_counter()
+        sistr_results = IridaSistrResults(irida_api, False, True, jobs=jobs).get_sistr_results_from_projects(
+            project_ids)
+        elapsed = time.perf_counter() - start
+
+        irida_api.close()
+        rows = sum(len(project_results) for project_results in sistr_results.values())
+        return elapsed, connector.get_connection_stats().requests_sent - requests_before, rows
+    finally:
+        server_process.terminate()
+
+
+def bench_writer(writer_class, samples, projects=100):
+    """Writes synthetic results with SistrResultsWriter.write()."""
+    sistr_results = create_sistr_results(samples, projects)
+
+    out_file = tempfile.NamedTemporaryFile(delete=False).name
+    try:
+        start = time.perf_counter()
+        writer = writer_class('http://localhost/irida', 'run_benchmarks', 'run_benchmarks', 'user', out_file)
+        writer.write(sistr_results)
+        writer.close()
+        elapsed = time.perf_counter() - start
+    finally:
+        os.remove(out_file)
+
+    return elapsed, 0, samples
+
+
+def _create_newer_sistr_info(sample_id, qc_status, created_date):
+    sistr_info = create_sistr_info(sample_id).to_dict()
+    if sistr_info['has_results']:
+        sistr_info['submission']['createdDate'] = created_date
+        sistr_info['sistr_predictions'][0]['qc_status'] = qc_status
+    return SampleSistrInfo.from_dict(sistr_info, ['Enteritidis'])
+
+
+def bench_merge(samples, projects=100):
+    """Merges a newer result for every sample into existing results with _load_additional_sistr_results()."""
+    irida_sistr_results = IridaSistrResults(None, True, True)
+    for project, project_results in create_sistr_results(samples, projects).items():
+        irida_sistr_results._load_sistr_results_for_project({'identifier': project}, project_results.values())
+
+    additional_results = [_create_newer_sistr_info(sample_id, 'PASS', 1600000000000) for sample_id in range(samples)]
+
+    start = time.perf_counter()
+    irida_sistr_results._load_additional_sistr_results(additional_results)
+    elapsed = time.perf_counter() - start
+
+    return elapsed, 0, samples
+
+
+def bench_ranking(samples, submissions_per_sample=4):
+    """Ranks several submissions for each sample with IridaAPI._update_sample_sistr_info()."""
+    irida_api = IridaAPI(None, ['Enteritidis'])
+    qc_statuses = ['FAIL', 'WARNING', 'PASS', 'PASS']
+    candidates = [[_create_newer_sistr_info(sample_id, qc_statuses[i % len(qc_statuses)], 1500000000000 + i)
+                   for i in range(submissions_per_sample)] for sample_id in range(samples)]
+    empty_info = SampleSistrInfo.create_empty_info({'identifier': '0', 'sampleName': 'sample0',
+                                                    'createdDate': 1500000000000})
+
+    start = time.perf_counter()
+    for sample_candidates in candidates:
+        sistr_info = empty_info
+        for new_sistr_info in sample_candidates:
+            sistr_info = irida_api._update_sample_sistr_info(sistr_info, new_sistr_info, None)
+    elapsed = time.perf_counter() - start
+
+    return elapsed, 0, samples * submissions_per_sample
+
+
+def get_benchmarks(traversal_sizes, writer_sizes):
+    """
+    Gets the benchmarks to run.
+
+    :param traversal_sizes: The numbers of samples for the traversal benchmarks.
+    :param writer_sizes: The numbers of samples for the writer, merge and ranking benchmarks.
+    :return: A list of (name, function, arguments).
+    """
+    benchmarks = [('traversal_{}'.format(size), bench_traversal, (size,)) for size in traversal_sizes]
+
+    for size in writer_sizes:
+        benchmarks.extend([
+            ('write_csv_{}'.format(size), bench_writer, (SistrCsvWriter, size)),
+            ('write_excel_{}'.format(size), bench_writer, (SistrExcelWriter, size)),
+            ('write_excel_constant_memory_{}'.format(size), bench_writer,
+             (functools.partial(SistrExcelWriter, constant_memory=True), size)),
+            ('merge_{}'.format(size), bench_merge, (size,)),
+            ('ranking_{}'.format(size), bench_ranking, (size,)),
+        ])
+
+    return benchmarks
+
+
+def _run_benchmark(function, args, result_queue):
+    try:
+        elapsed, requests, items = function(*args)
+    except Exception:
+        result_queue.put({'error': traceback.format_exc()})
+        raise
+
+    # ru_maxrss is in kilobytes on Linux (bytes on macOS)
+    peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != 'darwin':
+        peak_memory *= 1024
+
+    result_queue.put({
+        'wall_time': elapsed,
+        'requests': requests,
+        'peak_memory': peak_memory,
+        'items': items,
+        'items_per_second': items / elapsed if elapsed > 0 else None,
+    })
+
+
+def run(args):
+    traversal_sizes = [int(size) for size in args.traversal_sizes.split(',') if size]
+    writer_sizes = [int(size) for size in args.writer_sizes.split(',') if size]
+    # Start each benchmark from a fresh interpreter, so peak memory is not carried over from earlier benchmarks
+    context = multiprocessing.get_context('spawn')
+
+    results = {}
+    for name, function, function_args in get_benchmarks(traversal_sizes, writer_sizes):
+        if args.filter and args.filter not in name:
+            continue
+
+        result_queue = context.Queue()
+        process = context.Process(target=_run_benchmark, args=(function, function_args, result_queue))
+        process.start()
+        result = result_queue.get()
+        process.join()
+
+        if 'error' in result:
+            print("{:<24} failed\n{}".format(name, result['error']), file=sys.stderr)
+            sys.exit(1)
+
+        results[name] = result
+        print("{:<24} time={:.3f}s requests={} peak_memory={:.1f}MB".format(
+            name, result['wall_time'], result['requests'], result['peak_memory'] / 1024 / 1024), flush=True)
+
+    with open(args.output, 'w') as output_h:
+        json.dump({
+            'date': datetime.now().isoformat(sep=' '),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'benchmarks': results
+        }, output_h, indent=2)
+    print("Wrote results to " + args.output)
+
+
+def compare(args):
+    with open(args.baseline) as baseline_h:
+        baseline = json.load(baseline_h)['benchmarks']
+    with open(args.results) as results_h:
+        results = json.load(results_h)['benchmarks']
+
+    thresholds = {
+        'wall_time': args.time_threshold,
+        'requests': args.requests_threshold,
+        'peak_memory': args.memory_threshold,
+    }
+
+    regressions = 0
+    for name in sorted(results.keys()):
+        if name not in baseline:
+            print("{:<24} (not in baseline)".format(name))
+            continue
+
+        for metric, threshold in thresholds.items():
+            base_value = baseline[name][metric]
+            value = results[name][metric]
+            change = (value - base_value) / base_value if base_value else (1.0 if value > base_value else 0.0)
+            regression = change > threshold
+            regressions += regression
+
+            print("{:<24} {:<12} {:>14.3f} -> {:>14.3f} ({:+.1%}){}".format(
+                name, metric, base_value, value, change, '  REGRESSION' if regression else ''))
+
+    if regressions:
+        print("{} regressions".format(regressions))
+        sys.exit(1)
+    else:
+        print("No regressions")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks irida-sistr-results and compares against a baseline.',
+                                     epilog=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    run_parser = subparsers.add_parser('run', help='Runs the benchmarks.')
+    run_parser.add_argument('-o', '--output', action='store', dest='output', default='benchmarks.json',
+                            help='The JSON file to write results to [benchmarks.json]')
+    run_parser.add_argument('--traversal-sizes', action='store', dest='traversal_sizes', default='1000,10000,100000',
+                            help='Comma-separated numbers of samples to load from the mock IRIDA server '
+                                 '[1000,10000,100000]')
+    run_parser.add_argument('--writer-sizes', action='store', dest='writer_sizes', default='10000,100000',
+                            help='Comma-separated numbers of samples to write, merge and rank [10000,100000]')
+    run_parser.add_argument('-k', '--filter', action='store', dest='filter', default=None,
+                            help='Only run benchmarks with names containing this string')
+    run_parser.set_defaults(function=run)
+
+    compare_parser = subparsers.add_parser('compare', help='Compares results against a baseline.')
+    compare_parser.add_argument('baseline', help='The JSON file of baseline results')
+    compare_parser.add_argument('results', help='The JSON file of new results')
+    compare_parser.add_argument('--time-threshold', action='store', dest='time_threshold', type=float,
+                                default=DEFAULT_THRESHOLDS['wall_time'],
+                                help='Proportion the wall time may grow by [{}]'.format(
+                                    DEFAULT_THRESHOLDS['wall_time']))
+    compare_parser.add_argument('--requests-threshold', action='store', dest='requests_threshold', type=float,
+                                default=DEFAULT_THRESHOLDS['requests'],
+                                help='Proportion the number of requests may grow by [{}]'.format(
+                                    DEFAULT_THRESHOLDS['requests']))
+    compare_parser.add_argument('--memory-threshold', action='store', dest='memory_threshold', type=float,
+                                default=DEFAULT_THRESHOLDS['peak_memory'],
+                                help='Proportion the peak memory may grow by [{}]'.format(
+                                    DEFAULT_THRESHOLDS['peak_memory']))
+    compare_parser.set_defaults(function=compare)
+
+    args = parser.parse_args()
+    args.function(args)
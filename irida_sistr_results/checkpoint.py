@@ -0,0 +1,158 @@
+import json
+import logging
+import os
+from datetime import datetime
+
+from irida_sistr_results.sistr_info import SampleSistrInfo
+
+logger = logging.getLogger("checkpoint")
+
+CHECKPOINT_VERSION = 1
+
+
+class Checkpoint(object):
+    """
+    Records each project as its results are merged (along with the results of shared and user submissions merged at
+    the same time) to an append-only JSON Lines file, so a run which fails part way can be resumed without loading
+    the projects already merged again. Replaying the records in order rebuilds the same merged results.
+    """
+
+    def __init__(self, checkpoint_file, resume=False):
+        """
+        Creates a new Checkpoint.
+
+        :param checkpoint_file: The file to record projects to.
+        :param resume: Whether to resume from the projects recorded by a previous run (otherwise the file is started
+                       over).
+        """
+        self.checkpoint_file = checkpoint_file
+        self.resume = resume
+        self.completed_projects = []
+        self._settings = None
+        self._valid_size = 0
+
+    def start(self, settings):
+        """
+        Starts recording, loading the projects recorded by a previous run if resuming.
+
+        :param settings: A JSON-serializable dictionary of the settings of this run which affect the results. Projects
+                         recorded by a previous run with different settings are not resumed.
+        """
+        self._settings = settings
+        if self.resume:
+            self.completed_projects = self._load()
+
+        if not self.completed_projects:
+            self._write_header()
+
+    def _load(self):
+        if not os.path.exists(self.checkpoint_file):
+            logger.info("No checkpoint file %s, loading all results", self.checkpoint_file)
+            return []
+
+        records = self._read_records()
+        line_end, header = next(records, (0, {}))
+        if header.get('version') != CHECKPOINT_VERSION:
+            logger.warning("Checkpoint file %s has unsupported version %s, loading all results",
+                           self.checkpoint_file, header.get('version'))
+            return []
+        elif header.get('settings') != self._settings:
+            logger.warning("Checkpoint file %s was created with settings %s (not %s), loading all results",
+                           self.checkpoint_file, header.get('settings'), self._settings)
+            return []
+
+        logger.info("Resuming from checkpoint file %s created on %s", self.checkpoint_file, header.get('run_date'))
+        self._valid_size = line_end
+
+        projects = []
+        for line_end, record in records:
+            projects.append(record['project'])
+            self._valid_size = line_end
+
+        logger.info("Checkpoint file %s has %s completed projects", self.checkpoint_file, len(projects))
+        return projects
+
+    def _read_records(self):
+        """
+        Reads the records of the checkpoint file, stopping at a record which was only partly written (e.g., if the
+        previous run was killed while writing it).
+
+        :return: A generator of (offset of the end of the record, record dictionary).
+        """
+        with open(self.checkpoint_file, 'rb') as checkpoint_h:
+            offset = 0
+            for line in checkpoint_h:
+                try:
+                    record = json.loads(line) if line.endswith(b'\n') else None
+                except ValueError:
+                    record = None
+
+                if record is None:
+                    logger.warning("Ignoring partly written record at the end of checkpoint file %s",
+                                   self.checkpoint_file)
+                    return
+
+                offset += len(line)
+                yield offset, record
+
+    def _write_header(self):
+        header = {
+            'version': CHECKPOINT_VERSION,
+            'run_date': datetime.now().isoformat(sep=' '),
+            'settings': self._settings
+        }
+
+        tmp_file = self.checkpoint_file + '.tmp'
+        with open(tmp_file, 'w') as checkpoint_h:
+            json.dump(header, checkpoint_h, separators=(',', ':'))
+            checkpoint_h.write('\n')
+        os.replace(tmp_file, self.checkpoint_file)
+        self._valid_size = os.path.getsize(self.checkpoint_file)
+
+    def iter_completed_projects(self, reportable_serovars):
+        """
+        Reads back the projects recorded by a previous run, one at a time.
+
+        :param reportable_serovars: A list of serovars considered as reportable.
+        :return: A generator of (project id, list of SampleSistrInfo of the project, list of SampleSistrInfo of the
+                 shared or user submissions merged with it), in the order the projects were recorded.
+        """
+        if not self.completed_projects:
+            return
+
+        for line_end, record in self._read_records():
+            if line_end > self._valid_size:
+                return
+            elif 'project' in record:
+                yield (record['project'],
+                       [SampleSistrInfo.from_dict(result, reportable_serovars) for result in record['results']],
+                       [SampleSistrInfo.from_dict(result, reportable_serovars) for result in
+                        record['additional_results']])
+
+    def record_project(self, project_id, project_results, additional_results):
+        """
+        Records a project once its results have been merged.
+
+        :param project_id: The project identifier.
+        :param project_results: The list of SampleSistrInfo loaded for the project.
+        :param additional_results: The list of SampleSistrInfo of shared or user submissions merged with the project.
+        """
+        record = {
+            'project': project_id,
+            'results': [result.to_dict() for result in project_results if result is not None],
+            'additional_results': [result.to_dict() for result in additional_results]
+        }
+
+        with open(self.checkpoint_file, 'r+b') as checkpoint_h:
+            # Drops any partly written record left by a previous run
+            checkpoint_h.truncate(self._valid_size)
+            checkpoint_h.seek(self._valid_size)
+            checkpoint_h.write(json.dumps(record, separators=(',', ':')).encode() + b'\n')
+            checkpoint_h.flush()
+            os.fsync(checkpoint_h.fileno())
+            self._valid_size = checkpoint_h.tell()
+
+    def remove(self):
+        """Removes the checkpoint file once the results of the run have been written."""
+        if os.path.exists(self.checkpoint_file):
+            os.remove(self.checkpoint_file)
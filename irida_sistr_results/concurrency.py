@@ -0,0 +1,55 @@
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+
+
+class SerialExecutor(Executor):
+    """An Executor which runs all work in the calling thread, used when running with a single job."""
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+    def map(self, fn, *iterables, timeout=None, chunksize=1):
+        """
+        Lazily maps fn over the iterables, so work is only done as results are consumed (same as builtin map).
+        """
+        return map(fn, *iterables)
+
+
+def create_executor(jobs, thread_name_prefix=''):
+    """
+    Creates an Executor for running work with the given number of jobs.
+
+    :param jobs: The maximum number of jobs to run at once.
+    :param thread_name_prefix: A prefix for the names of any worker threads.
+    :return: A ThreadPoolExecutor bounded to the number of jobs, or a SerialExecutor if jobs <= 1.
+    """
+    if jobs is None or jobs <= 1:
+        return SerialExecutor()
+    else:
+        return ThreadPoolExecutor(max_workers=jobs, thread_name_prefix=thread_name_prefix)
+
+
+def map_bounded(executor, fn, iterable, max_pending):
+    """
+    Maps fn over the iterable in order (like Executor.map), but only submits work up to max_pending items ahead of the
+    result being consumed, so the results waiting to be consumed stay bounded.
+
+    :param executor: The Executor to run the work.
+    :param fn: The function to map.
+    :param iterable: The items to map over.
+    :param max_pending: The maximum number of items submitted but not yet consumed.
+    :return: A generator of the results, in the order of the iterable.
+    """
+    pending = deque()
+    for item in iterable:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= max(max_pending, 1):
+            yield pending.popleft().result()
+
+    while pending:
+        yield pending.popleft().result()
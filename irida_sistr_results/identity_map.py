@@ -0,0 +1,135 @@
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import Future
+
+# Counts the requests made to IRIDA while creating the identity map entry in the current thread/task
+_request_tally = contextvars.ContextVar('irida_request_tally', default=None)
+
+
+def tally_requests(count=1):
+    """
+    Counts requests made to IRIDA against the identity map entry currently being created (if any).
+
+    :param count: The number of requests made.
+    """
+    tally = _request_tally.get()
+    if tally is not None:
+        tally[0] += count
+
+
+class IdentityMap(object):
+    """
+    A per-run map of IRIDA resources (e.g., submissions, samples and hrefs) so that each resource is fetched (and each
+    SampleSistrInfo built) at most once per run. Safe to use from multiple threads, or from a single event loop.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self.hits = {}
+        self.requests_saved = 0
+
+    def get_or_create(self, kind, key, factory):
+        """
+        Gets the value for the given kind and key, creating it (once) if it does not exist.
+
+        :param kind: The kind of resource (e.g., 'submission', 'sample', 'href').
+        :param key: The key of the resource (e.g., the identifier or href).
+        :param factory: A function creating the value if it does not exist.
+        :return: The value.
+        """
+        entry, created = self._get_or_add_entry(kind, key, Future)
+        if not created:
+            value, cost = entry.result()
+            self._hit(kind, cost)
+            return value
+
+        tally = [0]
+        token = _request_tally.set(tally)
+        try:
+            value = factory()
+        except BaseException as e:
+            self._remove_entry(kind, key)
+            entry.set_exception(e)
+            raise
+        finally:
+            _request_tally.reset(token)
+            tally_requests(tally[0])
+
+        entry.set_result((value, tally[0]))
+        return value
+
+    async def get_or_create_async(self, kind, key, coroutine_factory):
+        """
+        Gets the value for the given kind and key, creating it (once) from a coroutine if it does not exist.
+
+        :param kind: The kind of resource (e.g., 'submission', 'sample', 'href').
+        :param key: The key of the resource (e.g., the identifier or href).
+        :param coroutine_factory: A function returning a coroutine which creates the value if it does not exist.
+        :return: The value.
+        """
+        entry, created = self._get_or_add_entry(kind, key, asyncio.get_running_loop().create_future)
+        if not created:
+            value, cost = await asyncio.shield(entry)
+            self._hit(kind, cost)
+            return value
+
+        tally = [0]
+        token = _request_tally.set(tally)
+        try:
+            value = await coroutine_factory()
+        except BaseException as e:
+            self._remove_entry(kind, key)
+            entry.set_exception(e)
+            # Mark the exception as retrieved if there are no other waiters
+            entry.exception()
+            raise
+        finally:
+            _request_tally.reset(token)
+            tally_requests(tally[0])
+
+        entry.set_result((value, tally[0]))
+        return value
+
+    def get_existing(self, kind, key):
+        """
+        Gets the value for the given kind and key only if it has already been created.
+
+        :param kind: The kind of resource (e.g., 'submission', 'sample', 'href').
+        :param key: The key of the resource (e.g., the identifier or href).
+        :return: The value, or None if it has not (yet) been created.
+        """
+        with self._lock:
+            entry = self._entries.get((kind, key))
+        if entry is None or not entry.done() or entry.exception() is not None:
+            return None
+
+        value, cost = entry.result()
+        self._hit(kind, cost)
+        return value
+
+    def _get_or_add_entry(self, kind, key, create_future):
+        with self._lock:
+            entry = self._entries.get((kind, key))
+            if entry is not None:
+                return entry, False
+
+            entry = create_future()
+            self._entries[(kind, key)] = entry
+            return entry, True
+
+    def _remove_entry(self, kind, key):
+        with self._lock:
+            # The map may have been cleared while the entry was being created
+            self._entries.pop((kind, key), None)
+
+    def _hit(self, kind, cost):
+        with self._lock:
+            self.hits[kind] = self.hits.get(kind, 0) + 1
+            self.requests_saved += cost
+
+    def clear(self):
+        """Removes all entries from the map (statistics are kept)."""
+        with self._lock:
+            self._entries = {}
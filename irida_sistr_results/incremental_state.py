@@ -0,0 +1,95 @@
+import json
+import logging
+import os
+from datetime import datetime
+
+from irida_sistr_results.sistr_info import SampleSistrInfo
+
+logger = logging.getLogger("incremental-state")
+
+STATE_VERSION = 1
+
+
+class IncrementalState(object):
+    """
+    Stores the samples and SISTR results seen in each project on a previous run, so the next run only has to load
+    results for samples which are new (or had no completed SISTR results).
+    """
+
+    def __init__(self, state_file, sistr_workflow_ids=None):
+        """
+        Creates a new IncrementalState, loading any state from a previous run.
+
+        :param state_file: The file to load/save the state.
+        :param sistr_workflow_ids: The SISTR workflow ids of this run. State from a previous run using different
+                                   workflow ids is ignored.
+        """
+        self.state_file = state_file
+        self.sistr_workflow_ids = sistr_workflow_ids
+        self._previous_projects = self._load()
+        self._projects = dict(self._previous_projects)
+
+    def _load(self):
+        if not os.path.exists(self.state_file):
+            logger.info("No incremental state file %s, loading all results", self.state_file)
+            return {}
+
+        with open(self.state_file) as state_file_h:
+            state = json.load(state_file_h)
+
+        if state.get('version') != STATE_VERSION:
+            logger.warning("Incremental state file %s has unsupported version %s, loading all results",
+                           self.state_file, state.get('version'))
+            return {}
+        elif state.get('sistr_workflow_ids') != self.sistr_workflow_ids:
+            logger.warning("Incremental state file %s was created for workflows %s (not %s), loading all results",
+                           self.state_file, state.get('sistr_workflow_ids'), self.sistr_workflow_ids)
+            return {}
+
+        logger.info("Loaded incremental state from %s created on %s", self.state_file, state.get('run_date'))
+        return state['projects']
+
+    def get_known_results(self, project_id, reportable_serovars):
+        """
+        Gets the SISTR results for samples in a project with completed SISTR results from the previous run.
+
+        :param project_id: The project identifier.
+        :param reportable_serovars: A list of serovars considered as reportable.
+        :return: A dictionary of {sample id: SampleSistrInfo}.
+        """
+        samples = self._previous_projects.get(str(project_id), {})
+
+        return {sample_id: SampleSistrInfo.from_dict(sample['result'], reportable_serovars)
+                for sample_id, sample in samples.items() if sample['result'] is not None}
+
+    def update_project(self, project_id, project_results):
+        """
+        Records the SISTR results loaded for a project on this run.
+
+        :param project_id: The project identifier.
+        :param project_results: The list of SampleSistrInfo for the project.
+        """
+        samples = {}
+        for result in project_results:
+            if result is not None:
+                samples[result.get_sample_id()] = {
+                    'createdDate': result.get_sample_created_date().isoformat(sep=' '),
+                    'submission': result.get_submission_identifier() if result.has_sistr_results() else None,
+                    'result': result.to_dict() if result.has_sistr_results() else None
+                }
+
+        self._projects[str(project_id)] = samples
+
+    def save(self):
+        """Saves the state of this run for the next run."""
+        state = {
+            'version': STATE_VERSION,
+            'run_date': datetime.now().isoformat(sep=' '),
+            'sistr_workflow_ids': self.sistr_workflow_ids,
+            'projects': self._projects
+        }
+
+        tmp_file = self.state_file + '.tmp'
+        with open(tmp_file, 'w') as state_file_h:
+            json.dump(state, state_file_h, separators=(',', ':'))
+        os.replace(tmp_file, self.state_file)
@@ -1,23 +1,134 @@
 import json
 import logging
+import threading
 from datetime import datetime
+from urllib.parse import urlsplit
 
 from requests.exceptions import HTTPError
 
+from irida_sistr_results import tracing
 from irida_sistr_results.SistrResultsException import SistrResultsException
+from irida_sistr_results.concurrency import create_executor
+from irida_sistr_results.identity_map import IdentityMap
+from irida_sistr_results.progress import Progress
 from irida_sistr_results.sistr_info import SampleSistrInfo
 
 LOGLEVEL_TRACE = 5
 
+# Ways of finding the automated SISTR results of the samples in a project: by traversing the sequencing objects of each
+# sample, or by joining the SISTR analyses listed for the whole project to its samples
+TRAVERSAL_SAMPLES = 'samples'
+TRAVERSAL_PROJECT = 'project'
+TRAVERSALS = [TRAVERSAL_SAMPLES, TRAVERSAL_PROJECT]
+
+# The links of a submission needed to load its SISTR results
+SUBMISSION_RELS = ['self', 'analysis', 'input/paired', 'input/unpaired']
+
 logger = logging.getLogger("irida-api")
 
 
+class SubmissionCandidate(object):
+    """
+    A completed SISTR analysis submission and the sample it was run on (resolved from its input files), listed without
+    loading its SISTR results. Used to decide whether the results are worth loading.
+    """
+
+    def __init__(self, submission_id, sample_id, created_date, submission=None, paired_files=None, sistr_info=None):
+        """
+        Creates a new SubmissionCandidate.
+
+        :param submission_id: The identifier of the analysis submission.
+        :param sample_id: The identifier of the sample the submission was run on, or None if it is not known.
+        :param created_date: The date (a datetime) the submission was created.
+        :param submission: The IRIDA AnalysisSubmission JSON (None if the results are already loaded).
+        :param paired_files: The JSON of the paired input files of the submission.
+        :param sistr_info: The SampleSistrInfo of the submission, if it was already loaded in this run.
+        """
+        self.submission_id = submission_id
+        self.sample_id = sample_id
+        self.created_date = created_date
+        self.submission = submission
+        self.paired_files = paired_files
+        self.sistr_info = sistr_info
+
+    @classmethod
+    def from_sistr_info(cls, sistr_info):
+        """
+        Creates a SubmissionCandidate for a submission whose results have already been loaded.
+
+        :param sistr_info: The SampleSistrInfo of the submission.
+        :return: The SubmissionCandidate.
+        """
+        return cls(sistr_info.get_submission_identifier(), sistr_info.sample_id,
+                   sistr_info.get_submission_created_date(), sistr_info=sistr_info)
+
+
+class SubmissionContext(object):
+    """
+    The IRIDA resources of an analysis submission already known from where it was reached (e.g., the sequencing object
+    an automated submission was run on), so loading its SISTR results only requests the resources which are missing.
+    """
+
+    def __init__(self, paired_files=None, unpaired_files=None, sample=None):
+        """
+        Creates a new SubmissionContext.
+
+        :param paired_files: The paired input files of the submission, or None to load them.
+        :param unpaired_files: The unpaired input files of the submission, or None to load them.
+        :param sample: The sample JSON the paired input files belong to, or None to load it.
+        """
+        self.paired_files = paired_files
+        self.unpaired_files = unpaired_files
+        self.sample = sample
+
+    @classmethod
+    def for_sequencing_object(cls, sequencing_object, sample):
+        """
+        Creates the context of the automated submission of a sequencing object pair, which is run on that pair alone.
+
+        :param sequencing_object: The JSON of the sequencing object pair, as listed for the sample.
+        :param sample: The sample JSON.
+        :return: The SubmissionContext.
+        """
+        return cls(paired_files=[sequencing_object], unpaired_files=[], sample=sample)
+
+
 class IridaAPI(object):
     """A class for dealing with higher-level API functionality of the IRIDA REST API."""
 
-    def __init__(self, irida_connector, reportable_serovars):
+    def __init__(self, irida_connector, reportable_serovars, jobs=1, traversal=TRAVERSAL_SAMPLES):
+        """
+        Creates a new IridaAPI object.
+
+        :param irida_connector: The IridaConnector used to make requests to IRIDA.
+        :param reportable_serovars: A list of serovars considered as reportable.
+        :param jobs: The maximum number of samples to load SISTR results for at once.
+        :param traversal: How to find the automated SISTR results of the samples in a project (one of TRAVERSALS).
+        """
+        if traversal not in TRAVERSALS:
+            raise ValueError("Unknown traversal " + str(traversal) + ", must be one of " + str(TRAVERSALS))
+
         self.irida_connector = irida_connector
         self.reportable_serovars = reportable_serovars
+        self.jobs = jobs
+        self.traversal = traversal
+        self.identity_map = IdentityMap()
+        self.progress = Progress()
+        self.submissions_superseded = 0
+        self.requests_avoided = {}
+        self._executor = None
+        self._stats_lock = threading.Lock()
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = create_executor(self.jobs, thread_name_prefix='irida-sample')
+        return self._executor
+
+    def close(self):
+        """Shuts down any worker threads used to load SISTR results."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
 
     def _get_rel_from_links(self, rel, links):
         href = None
@@ -43,10 +154,11 @@ class IridaAPI(object):
     def _get_sistr_predictions(self, sistr_analysis_href):
         sistr_pred_json = None
 
-        analysis = self.irida_connector.get(sistr_analysis_href)
+        # The analysis and predictions of a COMPLETED submission never change, so can be cached
+        analysis = self.irida_connector.get(sistr_analysis_href, immutable=True)
 
         sistr_href = self._get_rel_from_links('outputFile/sistr-predictions', analysis['links'])
-        sistr_pred = self.irida_connector.get_file(sistr_href)
+        sistr_pred = self.irida_connector.get_file(sistr_href, immutable=True)
         try:
             sistr_pred_json = sistr_pred.json()
         except json.decoder.JSONDecodeError as e:
@@ -65,15 +177,28 @@ class IridaAPI(object):
         else:
             return False
 
+    def _get_sample_id_from_paired(self, paired_json):
+        """
+        Gets the identifier of the sample of paired files from the link to the sample, without loading the sample.
+
+        :param paired_json: The JSON of the paired files.
+        :return: The sample identifier, or None if there is no linked sample.
+        """
+        if not self._has_sample_in_paired(paired_json):
+            return None
+
+        sample_href = self._get_rel_from_links('sample', paired_json[0]['links'])
+        return urlsplit(sample_href).path.rstrip('/').rsplit('/', 1)[-1]
+
     def _get_sample_from_paired(self, paired_json):
         sample = None
 
         links = paired_json[0]['links']
         sample_href = self._get_rel_from_links('sample', links)
-        sample = self.irida_connector.get(sample_href)
+        sample = self.identity_map.get_or_create('href', sample_href, lambda: self.irida_connector.get(sample_href))
 
         if sample is None:
-            raise Exception("Could not get sample corresponding to " + paired_path)
+            raise Exception("Could not get sample corresponding to " + sample_href)
         else:
             return sample
 
@@ -93,7 +218,7 @@ class IridaAPI(object):
         """
         return self.irida_connector.get_resources('/api/projects')
 
-    def get_sistr_results_for_project(self, project, sistr_workflow_ids, sample_created_date_min):
+    def get_sistr_results_for_project(self, project, sistr_workflow_ids, sample_created_date_min, known_results=None):
         """
         Gets information on all SISTR results in a project (that is, automated SISTR results).
         This is structured as a list of objects (on per sample) containing a SampleSistrInfo object if available and whether
@@ -102,40 +227,307 @@ class IridaAPI(object):
         :param project:  The project to search through.
         :param sistr_workflow_ids: A list of SISTR workflow ids, None for all workflow results.
         :param sample_created_date_min: Only return results for samples created after this date.
+        :param known_results: A dictionary of {sample id: SampleSistrInfo} of completed results from a previous run.
+                              These are used in place of loading results for those samples again.
         :return: A list of dictionaries containing SampleSistrInfo objects and/or indicators for missing results.
         """
-        sistr_results = []
-
         sistr_results_for_project = self.irida_connector.get_resources('/api/projects/' + str(project) + '/samples')
 
+        samples = []
         for sample in sistr_results_for_project:
             if self._created_since(sample, sample_created_date_min):
                 logger.debug("sample [id=%s, name=%s, createdDate=%s] created before %s, skipping.",
                              sample['identifier'], sample['sampleName'], sample['createdDate'],
                              sample_created_date_min)
-                continue
+            else:
+                samples.append(sample)
+        self.progress.project_listed(len(samples))
+
+        submissions_by_sample = None
+        if self.traversal == TRAVERSAL_PROJECT:
+            submissions_by_sample = self._get_project_submissions_by_sample(project, sistr_workflow_ids)
+
+        # map() keeps the order of samples so results are identical whether run on one or many threads
+        sample_sistr_results = self._get_executor().map(tracing.propagate(
+            lambda sample: self._get_sistr_info_for_project_sample(sample, sistr_workflow_ids, known_results,
+                                                                   submissions_by_sample)), samples)
+
+        return [sistr_info for sistr_info in sample_sistr_results if sistr_info is not None]
+
+    def _get_sistr_info_for_project_sample(self, sample, sistr_workflow_ids, known_results,
+                                           submissions_by_sample=None):
+        with tracing.span('sample', sample=sample['identifier'], sample_name=sample['sampleName']):
+            sistr_info = self._get_known_sistr_info(sample, known_results)
+            candidates = submissions_by_sample.get(sample['identifier']) if submissions_by_sample else None
+            if sistr_info is None and candidates and self._are_automated_submissions(sample, candidates):
+                sistr_info = self._create_sistr_info_for_sample_from_candidates(sample, candidates,
+                                                                                sistr_workflow_ids)
+            if sistr_info is None:
+                sistr_info = self._get_sistr_info_for_sample(sample, sistr_workflow_ids)
+
+        self.progress.sample_done()
+        return sistr_info
+
+    def _get_project_submissions_by_sample(self, project, sistr_workflow_ids):
+        """
+        Joins the completed SISTR submissions listed for a project to their samples (by the sample of their paired
+        input files), so samples need not be traversed one by one. The listing also has any other submissions shared
+        with the project (e.g., run by a user), so the submissions of a sample are only used if they could be the
+        automated submissions of their pairs (see _are_automated_submissions()).
 
-            sample_pairs = self.irida_connector.get_resources('/api/samples/' + sample['identifier'] + '/pairs')
+        :param project: The project identifier.
+        :param sistr_workflow_ids: A list of SISTR workflow ids, None for all workflow results.
+        :return: A dictionary of {sample id: [SubmissionCandidate]}, in the order the submissions are listed.
+        """
+        submissions_by_sample = {}
+        for candidate in self._get_project_submission_candidates(project, sistr_workflow_ids):
+            if candidate.sample_id is not None:
+                submissions_by_sample.setdefault(candidate.sample_id, []).append(candidate)
+
+        tracing.current_span().set_attribute('joined_samples', len(submissions_by_sample))
+        return submissions_by_sample
+
+    def _project_submissions_key(self, project_id, sistr_workflow_ids):
+        return str(project_id), tuple(sistr_workflow_ids) if sistr_workflow_ids is not None else None
+
+    def _get_project_submission_candidates(self, project_id, sistr_workflow_ids):
+        # Listed once per run, whether joined to the project's samples or merged as submissions shared to the project
+        return self.identity_map.get_or_create(
+            'project_submissions', self._project_submissions_key(project_id, sistr_workflow_ids),
+            lambda: self._get_sistr_submission_candidates(self.irida_connector.get_resources(
+                '/api/projects/' + str(project_id) + '/analyses/sistr'), sistr_workflow_ids, True))
+
+    def _are_automated_submissions(self, sample, candidates):
+        """
+        Checks, using only what was loaded when listing the project's submissions, whether the submissions joined to a
+        sample could be the automated submissions of the pairs they were run on: each must be run on a single pair
+        with an automated SISTR submission, and no two on the same pair (as when a user runs SISTR on a pair again).
+        Otherwise the sample is traversed instead, and the submissions are left to be merged as submissions shared
+        with the project.
+
+        Confirming each submission is the automated submission of its pair would cost a request per submission (more
+        than traversing the sample), so a submission run by a user is joined if it is the only one listed for its
+        pair, and the merge of submissions shared with the project settles which result is kept.
+
+        :param sample: The sample JSON.
+        :param candidates: The SubmissionCandidates joined to the sample.
+        :return: True if the submissions could all be automated submissions, False otherwise.
+        """
+        pair_ids = set()
+        for candidate in candidates:
+            pair_id = self._get_candidate_pair_id(candidate)
+            if pair_id is None or pair_id in pair_ids:
+                logger.debug("Submission [id=%s] listed for sample [id=%s, name=%s] may not be an automated "
+                             "submission, traversing sample", candidate.submission_id, sample['identifier'],
+                             sample['sampleName'])
+                return False
+            pair_ids.add(pair_id)
+
+        return True
+
+    def _get_candidate_pair_id(self, candidate):
+        """
+        Gets the identifier of the sequencing object pair a listed submission was run on, if it could be the automated
+        submission of the pair.
 
-            sistr_info = SampleSistrInfo.create_empty_info(sample)
+        :param candidate: The SubmissionCandidate.
+        :return: The identifier of the pair, or None if the submission cannot be an automated submission.
+        """
+        if candidate.paired_files is None:
+            # Already loaded in this run, so not an automated submission if its pair was resolved to another one
+            pair_id = candidate.sistr_info.paired_id
+            pair_submission = self.identity_map.get_existing('pair_submission', pair_id) if pair_id else None
+            if pair_submission is not None and pair_submission['identifier'] != candidate.submission_id:
+                return None
+            return pair_id
+
+        pair = self._get_candidate_pair(candidate)
+        return pair['identifier'] if pair is not None else None
+
+    def _get_candidate_pair(self, candidate):
+        """
+        Gets the sequencing object pair a listed submission was run on, if it could be the automated submission of the
+        pair (which is run on that pair alone).
+
+        :param candidate: The SubmissionCandidate.
+        :return: The JSON of the pair, or None if the submission cannot be an automated submission.
+        """
+        if len(candidate.paired_files) != 1:
+            return None
 
-            if len(sample_pairs) > 0:
-                for sequencing_object in sample_pairs:
-                    if (self._has_rel_in_links('analysis/sistr', sequencing_object['links'])):
-                        sistr_rel = self._get_rel_from_links('analysis/sistr', sequencing_object['links'])
-                        sistr = self.irida_connector.get(sistr_rel)
+        pair = candidate.paired_files[0]
+        if not self._has_rel_in_links('analysis/sistr', pair.get('links') or []):
+            return None
+        return pair
+
+    def _get_pair_submission(self, sequencing_object):
+        """
+        Gets the automated SISTR submission of a sequencing object pair.
+
+        :param sequencing_object: The JSON of the pair, with an 'analysis/sistr' link.
+        :return: The AnalysisSubmission JSON.
+        """
+        # Resolved once per run, as pairs may be shared by samples in several projects
+        sistr_rel = self._get_rel_from_links('analysis/sistr', sequencing_object['links'])
+        return self.identity_map.get_or_create('pair_submission', sequencing_object['identifier'],
+                                               lambda: self.irida_connector.get(sistr_rel))
+
+    def _create_sistr_info_for_sample_from_candidates(self, sample, candidates, sistr_workflow_ids):
+        """
+        Picks the best SISTR results for a sample from the submissions joined to it (as _create_sistr_info_for_sample()
+        does for the submissions of its sequencing objects), loading results newest first until one passes QC.
+
+        :param sample: The sample JSON.
+        :param candidates: The SubmissionCandidates of the sample, in the order they were listed.
+        :param sistr_workflow_ids: A list of SISTR workflow ids, None for all workflow results.
+        :return: The SampleSistrInfo picked, or None if none of the submissions could be loaded.
+        """
+        load_order = sorted(range(len(candidates)), key=lambda index: candidates[index].created_date, reverse=True)
+        new_sistr_infos = {}
+        for position, index in enumerate(load_order):
+            # The sample as listed for the project is the one linked from the input files of its submissions
+            new_sistr_info = self._get_sistr_info_for_candidate(candidates[index], sample)
+            if new_sistr_info is not None:
+                new_sistr_infos[index] = new_sistr_info
+                if new_sistr_info.get_qc_status() == 'PASS':
+                    self._count_superseded_submissions(len(load_order) - position - 1)
+                    break
+
+        if not new_sistr_infos:
+            return None
+
+        return self._pick_sample_sistr_info(sample, new_sistr_infos, sistr_workflow_ids)
+
+    def _get_known_sistr_info(self, sample, known_results):
+        """
+        Gets the known (from a previous run) SISTR results for a sample.
+
+        :param sample: The sample JSON.
+        :param known_results: A dictionary of {sample id: SampleSistrInfo} of completed results, or None.
+        :return: The known SampleSistrInfo, or None if there are no known results for this sample.
+        """
+        if not known_results:
+            return None
+
+        known_result = known_results.get(sample['identifier'])
+        if known_result is not None and known_result.get_sample_created_date() == datetime.fromtimestamp(
+                sample['createdDate'] / 1000):
+            logger.debug("Using known results for sample [id=%s, name=%s]", sample['identifier'],
+                         sample['sampleName'])
+            return known_result
+        else:
+            return None
+
+    def _get_sistr_info_for_sample(self, sample, sistr_workflow_ids):
+        """
+        Gets the best automated SISTR results for a single sample.
+
+        :param sample: The sample JSON.
+        :param sistr_workflow_ids: A list of SISTR workflow ids, None for all workflow results.
+        :return: A SampleSistrInfo object for the sample, or None if the sample has no sequencing data.
+        """
+        # Samples shared between projects are only traversed once
+        return self.identity_map.get_or_create('sample', self._sample_key(sample, sistr_workflow_ids),
+                                               lambda: self._create_sistr_info_for_sample(sample, sistr_workflow_ids))
+
+    def _sample_key(self, sample, sistr_workflow_ids):
+        return sample['identifier'], tuple(sistr_workflow_ids) if sistr_workflow_ids is not None else None
+
+    def _create_sistr_info_for_sample(self, sample, sistr_workflow_ids):
+        sample_pairs = self.irida_connector.get_resources('/api/samples/' + sample['identifier'] + '/pairs')
+        tracing.current_span().set_attribute('pairs', len(sample_pairs))
+
+        if len(sample_pairs) == 0:
+            return None
+
+        completed_sistrs = []
+        contexts = []
+        for sequencing_object in sample_pairs:
+            if (self._has_rel_in_links('analysis/sistr', sequencing_object['links'])):
+                sistr = self._get_pair_submission(sequencing_object)
+
+                if (sistr['analysisState'] != 'COMPLETED'):
+                    logger.debug(
+                        "Skipping automated SISTR results associated with sample=%s as state is not 'COMPLETED'.",
+                        sample['identifier'])
+                else:
+                    completed_sistrs.append(sistr)
+                    contexts.append(SubmissionContext.for_sequencing_object(sequencing_object, sample))
 
-                        if (sistr['analysisState'] != 'COMPLETED'):
-                            logger.debug(
-                                "Skipping automated SISTR results associated with sample=%s as state is not 'COMPLETED'.",
-                                sample['identifier'])
-                        else:
-                            new_sistr_info = self.get_sistr_info_from_submission(sistr)
-                            sistr_info = self._update_sample_sistr_info(sistr_info, new_sistr_info,
-                                                                        sistr_workflow_ids)
+        load_order = self._get_submission_load_order(completed_sistrs, sistr_workflow_ids)
+        new_sistr_infos = {}
+        for index in load_order:
+            new_sistr_infos[index] = self.get_sistr_info_from_submission(completed_sistrs[index], contexts[index])
+            if new_sistr_infos[index].get_qc_status() == 'PASS':
+                break
 
-                sistr_results.append(sistr_info)
-        return sistr_results
+        self._count_superseded_submissions(len(load_order) - len(new_sistr_infos))
+        return self._pick_sample_sistr_info(sample, new_sistr_infos, sistr_workflow_ids)
+
+    def _get_submission_load_order(self, submissions, sistr_workflow_ids):
+        """
+        Orders the completed SISTR submissions of a sample for loading, using only the submission metadata:
+        submissions of other workflows are left out and the rest are ordered newest first. As
+        _update_sample_sistr_info() picks the newest result passing QC (or the first result if none pass), the results
+        of submissions after the first to pass QC in this order can never be picked, so need not be loaded.
+
+        :param submissions: The completed SISTR submissions of the sample, in the order of its sequencing objects.
+        :param sistr_workflow_ids: A list of SISTR workflow ids, None for all workflow results.
+        :return: A list of indices into submissions, in the order to load them.
+        """
+        indices = []
+        for index, submission in enumerate(submissions):
+            if sistr_workflow_ids is None or submission['workflowId'] in sistr_workflow_ids:
+                indices.append(index)
+            else:
+                logger.debug("Skipping sistr submission [id=%s, workflowId=%s]. workflowId not in %s",
+                             submission['identifier'], submission['workflowId'], sistr_workflow_ids)
+
+        # sorted() is stable, so submissions created at the same time stay in the order _update_sample_sistr_info()
+        # would see them
+        return sorted(indices, key=lambda index: submissions[index]['createdDate'], reverse=True)
+
+    def _pick_sample_sistr_info(self, sample, new_sistr_infos, sistr_workflow_ids):
+        """
+        Picks the best of the loaded SISTR results for a sample.
+
+        :param sample: The sample JSON.
+        :param new_sistr_infos: A dictionary of {index from _get_submission_load_order(): SampleSistrInfo}.
+        :param sistr_workflow_ids: A list of SISTR workflow ids, None for all workflow results.
+        :return: The SampleSistrInfo picked, or an empty SampleSistrInfo if there are no results.
+        """
+        sistr_info = SampleSistrInfo.create_empty_info(sample)
+        for index in sorted(new_sistr_infos):
+            sistr_info = self._update_sample_sistr_info(sistr_info, new_sistr_infos[index], sistr_workflow_ids)
+        return sistr_info
+
+    def _count_superseded_submissions(self, count):
+        if count:
+            tracing.current_span().set_attribute('superseded_submissions', count)
+            with self._stats_lock:
+                self.submissions_superseded += count
+
+    def _count_avoided_requests(self, endpoints):
+        """
+        Counts requests not sent to IRIDA as their resources were already known.
+
+        :param endpoints: The classes of endpoint (as from irida_metrics.classify_endpoint()) of the avoided requests.
+        """
+        if endpoints:
+            tracing.current_span().set_attribute('avoided_requests', len(endpoints))
+            with self._stats_lock:
+                for endpoint in endpoints:
+                    self.requests_avoided[endpoint] = self.requests_avoided.get(endpoint, 0) + 1
+
+    def get_requests_avoided(self):
+        """
+        Gets the number of requests not sent to IRIDA in this run as their resources were already known (e.g., the
+        input files and sample of a submission reached from a sample's sequencing object).
+
+        :return: The total number of requests avoided.
+        """
+        with self._stats_lock:
+            return sum(self.requests_avoided.values())
 
     def _created_since(self, sample, sample_created_date_min):
         return sample_created_date_min and datetime.fromtimestamp(
@@ -157,40 +549,77 @@ class IridaAPI(object):
 
         return curr_sistr_info
 
-    def get_sistr_info_from_submission(self, submission):
+    def get_sistr_info_from_submission(self, submission, context=None):
         """
-        Gets the relevent SISTR information from an IRIDA SISTR AnalysisSubmission.
+        Gets the relevent SISTR information from an IRIDA SISTR AnalysisSubmission. The submission must be 'COMPLETED',
+        as the inputs and outputs of the submission are assumed to never change (and so may be cached).
 
         :param submission: The IRIDA SISTR AnalysisSubmission data structure.
+        :param context: A SubmissionContext of the resources of the submission already known (default None to load
+                        them all).
         :return: The SISTR information object (SampleSistrInfo) fro this submission.
         """
+        # The same submission may be reached from a sample, a project or the user's analyses
+        with tracing.span('submission', submission=submission['identifier']):
+            return self.identity_map.get_or_create('submission', submission['identifier'],
+                                                   lambda: self._create_sistr_info_from_submission(submission,
+                                                                                                   context))
+
+    def _create_sistr_info_from_submission(self, submission, context=None):
+        context = context or SubmissionContext()
         sistr_info = {}
 
         links = submission['links']
         paired_path = self._get_rel_from_links('input/paired', links)
         sistr_analysis_href = self._get_rel_from_links('analysis', links)
 
-        unpaired_path = self._get_rel_from_links('input/unpaired', links)
-        unpaired_files = self.irida_connector.get_resources(unpaired_path)
+        unpaired_files = context.unpaired_files
+        if unpaired_files is None:
+            unpaired_path = self._get_rel_from_links('input/unpaired', links)
+            unpaired_files = self.irida_connector.get_resources(unpaired_path, immutable=True)
 
-        if len(unpaired_files) > 0:
-            self_href = self._get_rel_from_links('self', submission['links'])
-            raise Exception(
-                'Error: unpaired files were found for analysis submission ' + self_href + '. SISTR results from unpaired files not currently supported')
+        self._check_no_unpaired_files(submission, unpaired_files)
 
-        paired = self.irida_connector.get_resources(paired_path)
+        paired = context.paired_files if context.paired_files is not None else self.irida_connector.get_resources(
+            paired_path, immutable=True)
 
         sistr_info['paired_files'] = paired
         sistr_info['sistr_predictions'] = self._get_sistr_predictions(sistr_analysis_href)
         sistr_info['has_results'] = True
-        if (self._has_sample_in_paired(paired)):
+        if context.sample is not None:
+            sistr_info['sample'] = context.sample
+        elif (self._has_sample_in_paired(paired)):
             sistr_info['sample'] = self._get_sample_from_paired(paired)
         else:
             sistr_info['sample'] = None
         sistr_info['submission'] = submission
 
+        self._count_avoided_requests(self._get_known_endpoints(context, paired))
         return SampleSistrInfo(sistr_info, self.reportable_serovars)
 
+    def _check_no_unpaired_files(self, submission, unpaired_files):
+        if len(unpaired_files) > 0:
+            self_href = self._get_rel_from_links('self', submission['links'])
+            raise Exception(
+                'Error: unpaired files were found for analysis submission ' + self_href + '. SISTR results from unpaired files not currently supported')
+
+    def _get_known_endpoints(self, context, paired):
+        """
+        Gets the requests for the resources of a submission which were not sent as they were already known.
+
+        :param context: The SubmissionContext the submission was loaded with.
+        :param paired: The paired input files of the submission.
+        :return: A list of the classes of endpoint of the requests avoided.
+        """
+        endpoints = []
+        if context.unpaired_files is not None:
+            endpoints.append('submission_inputs')
+        if context.paired_files is not None:
+            endpoints.append('submission_inputs')
+        if context.sample is not None and self._has_sample_in_paired(paired):
+            endpoints.append('sample')
+        return endpoints
+
     def get_sistr_submissions_for_user(self, sistr_workflow_ids=None):
         """
         Gets all SISTR results accessible by a user (includes those submitted by a user or shared with a user via a project).
@@ -202,17 +631,10 @@ class IridaAPI(object):
         sistr_analysis_list = []
         for sistr in sistr_submissions_for_user:
             try:
-                if (sistr['analysisState'] == 'COMPLETED'):
-                    if sistr_workflow_ids is None or sistr['workflowId'] in sistr_workflow_ids:
-                        sistr_analysis_list.append(self.get_sistr_info_from_submission(sistr))
-                    else:
-                        logger.debug("Skipping sistr submission [id=%s, workflowId=%s]. workflowId not in %s".format(
-                            sistr['identifier'], sistr['workflowId'], sistr_workflow_ids))
-                else:
-                    logger.debug('Skipping incompleted sistr submission [id=%s]', sistr['identifier'])
+                if self._is_included_submission(sistr, sistr_workflow_ids):
+                    sistr_analysis_list.append(self.get_sistr_info_from_submission(sistr))
             except (HTTPError, SistrResultsException) as e:
-                logger.warning('Could not read information for SISTR analysis submission id=' + str(
-                    sistr['identifier']) + ', name=' + str(sistr['name']) + ', ignoring these results. ' + str(e))
+                self._log_submission_error(sistr, e)
 
         return sistr_analysis_list
 
@@ -229,21 +651,138 @@ class IridaAPI(object):
         sistr_analysis_list = []
         for sistr in sistr_submissions_for_project:
             try:
-                if (sistr['analysisState'] == 'COMPLETED'):
-                    if sistr_workflow_ids is None or sistr['workflowId'] in sistr_workflow_ids:
-                        sistr_analysis = self._get_sistr_submission(sistr['identifier'])
-                        sistr_analysis_list.append(self.get_sistr_info_from_submission(sistr_analysis))
-                    else:
-                        logger.debug("Skipping sistr submission [id=%s, workflowId=%s]. workflowId not in %s".format(
-                            sistr['identifier'], sistr['workflowId'], sistr_workflow_ids))
-                else:
-                    logger.debug('Skipping incompleted sistr submission [id=%s]', sistr['identifier'])
+                if self._is_included_submission(sistr, sistr_workflow_ids):
+                    sistr_analysis_list.append(self._get_sistr_info_for_shared_submission(sistr))
             except (HTTPError, SistrResultsException) as e:
-                logger.warning('Could not read information for SISTR analysis submission id=' + str(
-                    sistr['identifier']) + ', name=' + str(sistr['name']) + ', ignoring these results. ' + str(e))
+                self._log_submission_error(sistr, e)
 
         return sistr_analysis_list
 
+    def get_sistr_submission_candidates_for_user(self, sistr_workflow_ids=None):
+        """
+        Lists the completed SISTR analysis submissions accessible by a user (as get_sistr_submissions_for_user()),
+        resolving the sample of each from its input files but without loading their SISTR results.
+        :param sistr_workflow_ids: A list of SISTR workflow ids, None for all workflow results.
+        :return: A list of SubmissionCandidate objects (load their results with get_sistr_info_for_candidates()).
+        """
+        sistr_submissions_for_user = self.irida_connector.get_resources('/api/analysisSubmissions/analysisType/sistr')
+        return self._get_sistr_submission_candidates(sistr_submissions_for_user, sistr_workflow_ids, False)
+
+    def get_sistr_submission_candidates_shared_to_project(self, project_id, sistr_workflow_ids=None):
+        """
+        Lists the completed SISTR analysis submissions shared to a project (as
+        get_sistr_submissions_shared_to_project()), resolving the sample of each from its input files but without
+        loading their SISTR results.
+        :param project_id: The project identifier.
+        :param sistr_workflow_ids: A list of SISTR workflow ids of results to include.
+        :return: A list of SubmissionCandidate objects (load their results with get_sistr_info_for_candidates()).
+        """
+        return self._get_project_submission_candidates(project_id, sistr_workflow_ids)
+
+    def get_sistr_info_for_candidates(self, candidates):
+        """
+        Loads the SISTR results of submission candidates.
+        :param candidates: A list of SubmissionCandidate objects.
+        :return: A list of SampleSistrInfo objects, in the same order (skipping submissions which could not be read).
+        """
+        sistr_infos = self._get_executor().map(tracing.propagate(self._get_sistr_info_for_candidate), candidates)
+        return [sistr_info for sistr_info in sistr_infos if sistr_info is not None]
+
+    def _get_sistr_submission_candidates(self, sistr_submissions, sistr_workflow_ids, reload_submission):
+        included_submissions = [sistr for sistr in sistr_submissions if
+                                self._is_included_submission(sistr, sistr_workflow_ids)]
+
+        candidates = self._get_executor().map(tracing.propagate(
+            lambda sistr: self._get_sistr_submission_candidate(sistr, reload_submission)), included_submissions)
+        return [candidate for candidate in candidates if candidate is not None]
+
+    def _get_sistr_submission_candidate(self, sistr, reload_submission):
+        try:
+            # Submissions already loaded in this run (e.g., from a sample) need no more requests
+            sistr_info = self.identity_map.get_existing('submission', sistr['identifier'])
+            if sistr_info is not None:
+                return SubmissionCandidate.from_sistr_info(sistr_info)
+
+            submission = self._get_listed_submission(sistr, reload_submission)
+            paired_path = self._get_rel_from_links('input/paired', submission['links'])
+            paired = self.irida_connector.get_resources(paired_path, immutable=True)
+
+            return SubmissionCandidate(submission['identifier'], self._get_sample_id_from_paired(paired),
+                                       datetime.fromtimestamp(submission['createdDate'] / 1000), submission, paired)
+        except (HTTPError, SistrResultsException) as e:
+            self._log_submission_error(sistr, e)
+            return None
+
+    def _has_submission_links(self, sistr):
+        """Whether a listed submission has all the links needed to load its results (so need not be reloaded)."""
+        links = sistr.get('links') or []
+        return all(self._has_rel_in_links(rel, links) for rel in SUBMISSION_RELS)
+
+    def _get_listed_submission(self, sistr, reload_submission):
+        """
+        Gets the full AnalysisSubmission of a listed submission, only reloading it if asked to and the listing is
+        missing links needed to load its results.
+
+        :param sistr: The AnalysisSubmission JSON as listed.
+        :param reload_submission: Whether the listing may be missing links (e.g., submissions shared to a project).
+        :return: The AnalysisSubmission JSON.
+        """
+        if not reload_submission:
+            return sistr
+        elif self._has_submission_links(sistr):
+            self._count_avoided_requests(['analysis_submission'])
+            return sistr
+        else:
+            return self._get_sistr_submission(sistr['identifier'])
+
+    def _get_sistr_info_for_candidate(self, candidate, sample=None):
+        if candidate.sistr_info is not None:
+            return candidate.sistr_info
+
+        try:
+            # Kept, as user submissions may be examined again for each project when streaming
+            candidate.sistr_info = self.get_sistr_info_from_submission(candidate.submission,
+                                                                       self._get_candidate_context(candidate, sample))
+            return candidate.sistr_info
+        except (HTTPError, SistrResultsException) as e:
+            self._log_submission_error(candidate.submission, e)
+            return None
+
+    def _get_candidate_context(self, candidate, sample):
+        """
+        Gets the resources of a listed submission already known.
+
+        :param candidate: The SubmissionCandidate.
+        :param sample: The sample JSON of a submission joined to a sample, as the (possible) automated submission of
+                       its pair (see _are_automated_submissions()), or None for any other submission.
+        :return: The SubmissionContext.
+        """
+        if sample is not None:
+            return SubmissionContext.for_sequencing_object(candidate.paired_files[0], sample)
+        return SubmissionContext(paired_files=candidate.paired_files)
+
+    def _is_included_submission(self, sistr, sistr_workflow_ids):
+        if (sistr['analysisState'] != 'COMPLETED'):
+            logger.debug('Skipping incompleted sistr submission [id=%s]', sistr['identifier'])
+            return False
+        elif sistr_workflow_ids is not None and sistr['workflowId'] not in sistr_workflow_ids:
+            logger.debug("Skipping sistr submission [id=%s, workflowId=%s]. workflowId not in %s", sistr['identifier'],
+                         sistr['workflowId'], sistr_workflow_ids)
+            return False
+        else:
+            return True
+
+    def _log_submission_error(self, sistr, e):
+        logger.warning('Could not read information for SISTR analysis submission id=' + str(
+            sistr['identifier']) + ', name=' + str(sistr['name']) + ', ignoring these results. ' + str(e))
+
+    def _get_sistr_info_for_shared_submission(self, sistr):
+        # Only reload the submission if it has not already been loaded in this run
+        sistr_info = self.identity_map.get_existing('submission', sistr['identifier'])
+        if sistr_info is None:
+            sistr_info = self.get_sistr_info_from_submission(self._get_listed_submission(sistr, True))
+        return sistr_info
+
     def _get_sistr_submission(self, id):
         """
         Gets the particular AnalysisSubmission for the given SISTR analysis id.
@@ -0,0 +1,559 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+
+from requests.exceptions import HTTPError
+
+from irida_sistr_results import tracing
+from irida_sistr_results.SistrResultsException import SistrResultsException
+from irida_sistr_results.identity_map import tally_requests
+from irida_sistr_results.irida_api import TRAVERSAL_PROJECT, TRAVERSAL_SAMPLES, IridaAPI, SubmissionCandidate, \
+    SubmissionContext
+from irida_sistr_results.irida_metrics import classify_endpoint
+from irida_sistr_results.irida_transport import ACCEPT_ENCODING, ConnectionStats
+from irida_sistr_results.sistr_info import SampleSistrInfo
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+LOGLEVEL_TRACE = 5
+
+logger = logging.getLogger("irida-async")
+
+
+class AsyncIridaConnector(object):
+    """Low-level asynchronous connections to the IRIDA REST API, with a cap on the number of requests in flight."""
+
+    def __init__(self, irida_connector, max_in_flight=100):
+        """
+        Creates a new object for asynchronously connecting to the IRIDA REST API.
+
+        :param irida_connector: An authenticated IridaConnector, used for the access token, base path and timeout.
+        :param max_in_flight: The maximum number of requests to IRIDA in flight at once.
+
+        :return: An object which can be used to asynchronously connect to IRIDA.
+        """
+        if aiohttp is None:
+            raise ImportError("The asynchronous engine requires the 'aiohttp' package, please install it with "
+                              "'pip install irida-sistr-results[async]'")
+
+        self.irida_connector = irida_connector
+        self.max_in_flight = max_in_flight
+        self._session = None
+        self._semaphore = None
+        self._connection_stats = ConnectionStats()
+
+    def get_connection_stats(self):
+        """
+        Gets statistics on the connections made to IRIDA.
+
+        :return:  A ConnectionStats object.
+        """
+        return self._connection_stats
+
+    def get_request_metrics(self):
+        """
+        Gets the per-endpoint metrics of the requests made to IRIDA (shared with the wrapped IridaConnector).
+
+        :return:  A RequestMetrics object.
+        """
+        return self.irida_connector.get_request_metrics()
+
+    def _create_trace_config(self):
+        async def on_request_start(session, context, params):
+            self._connection_stats.request_sent()
+
+        async def on_connection_create_end(session, context, params):
+            self._connection_stats.connection_opened()
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        return trace_config
+
+    def _get_session(self):
+        # Must be created from within the running event loop
+        if self._session is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_in_flight),
+                timeout=aiohttp.ClientTimeout(total=self.irida_connector.get_timeout()),
+                headers={'Accept-Encoding': ACCEPT_ENCODING},
+                trace_configs=[self._create_trace_config()])
+        return self._session
+
+    def _join_path(self, path):
+        return self.irida_connector.get_url(path)
+
+    async def _request(self, path, headers=None, immutable=False):
+        loop = asyncio.get_running_loop()
+        cache = self.irida_connector.cache if immutable else None
+        if cache is not None:
+            # The cache is read from/written to disk in a worker thread, so other requests in flight are not stalled
+            body = await loop.run_in_executor(None, cache.get, path)
+            if body is not None:
+                logger.debug("Found path=" + path + " in cache")
+                return body.decode('utf-8')
+
+        endpoint = classify_endpoint(path)
+        token_manager = self.irida_connector.token_manager
+        access_token = token_manager.get_access_token()
+        status, body = await self._request_with_token(path, endpoint, headers, access_token)
+
+        # The token may have expired or been revoked part way through a run
+        if status == 401:
+            self.get_request_metrics().record_retry(endpoint)
+            access_token = await loop.run_in_executor(None, token_manager.refresh, access_token)
+            status, body = await self._request_with_token(path, endpoint, headers, access_token)
+            if status == 401:
+                raise HTTPError("401 Error: Unauthorized for url: {}".format(path))
+
+        if cache is not None:
+            await loop.run_in_executor(None, cache.put, path, body)
+
+        return body.decode('utf-8')
+
+    async def _request_with_token(self, path, endpoint, headers, access_token):
+        headers = dict(headers) if headers is not None else {}
+        headers['Authorization'] = 'Bearer ' + access_token
+
+        attempt = 0
+        while True:
+            try:
+                response, body = await self._send(path, endpoint, headers,
+                                                  self.irida_connector.get_request_timeout(endpoint, attempt))
+                if response.status < 500:
+                    break
+                retry_delay = self.irida_connector.get_retry_delay(endpoint, attempt)
+                if retry_delay is None:
+                    break
+            except asyncio.TimeoutError:
+                retry_delay = self.irida_connector.get_retry_delay(endpoint, attempt)
+                if retry_delay is None:
+                    raise
+
+            logger.debug("Retrying path=%s in %s seconds", path, retry_delay)
+            await asyncio.sleep(retry_delay)
+            attempt += 1
+
+        if response.status >= 400 and response.status != 401:
+            raise HTTPError("{} Error: {} for url: {}".format(response.status, response.reason, response.url))
+        return response.status, body
+
+    async def _send(self, path, endpoint, headers, timeout):
+        session = self._get_session()
+        request_metrics = self.get_request_metrics()
+        throttle = self.irida_connector.throttle
+        tally_requests()
+        async with self._semaphore:
+            permit = await throttle.acquire_async() if throttle is not None else None
+            start = time.perf_counter()
+            status = None
+            try:
+                with tracing.span('GET ' + endpoint, url=path) as span:
+                    request_metrics.request_started()
+                    start = time.perf_counter()
+                    try:
+                        async with session.get(path, headers=headers,
+                                               timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                            body = await response.read()
+                    except (aiohttp.ClientError, asyncio.TimeoutError):
+                        request_metrics.record_error(endpoint, time.perf_counter() - start)
+                        raise
+                    status = response.status
+                    request_metrics.record(endpoint, time.perf_counter() - start, len(body), status)
+                    span.set_attribute('status', status)
+            finally:
+                if throttle is not None:
+                    throttle.release(permit, endpoint, time.perf_counter() - start, status)
+
+        return response, body
+
+    async def get(self, path, immutable=False):
+        """
+        An asynchronous GET request to a particular path in IRIDA.
+
+        :param path: The path to GET, minus the IRIDA url (e.g., '/projects').
+        :param immutable: Whether the resource at this path never changes, so may be read from/stored in the cache.
+
+        :return:  The ['resource'] part of the GET JSON response.
+        """
+        path = self._join_path(path)
+        logger.debug("Getting path=" + path)
+        response_json = json.loads(await self._request(path, immutable=immutable))
+        self._log_json(response_json)
+
+        return response_json['resource']
+
+    async def get_resources(self, path, immutable=False):
+        """
+        Asynchronously GETs the resources from an IRIDA REST API endpoint (e.g., (get '/projects')['resources']
+
+        :param path: The path to GET the resources.
+        :param immutable: Whether the resources at this path never change, so may be read from/stored in the cache.
+
+        :return:  The ['resources'] part of the GET JSON response.
+        """
+        return (await self.get(path, immutable))['resources']
+
+    async def get_file(self, path, immutable=False):
+        """
+        Asynchronously GETs the file contents from an IRIDA REST API endpoint.
+
+        :param path: The path to GET the file.
+        :param immutable: Whether the file at this path never changes, so may be read from/stored in the cache.
+
+        :return:  The file contents as a string.
+        """
+        return await self._request(self._join_path(path), headers={'Accept': 'text/plain'}, immutable=immutable)
+
+    async def close(self):
+        """Closes any open connections to IRIDA."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _log_json(self, json_obj):
+        logger.log(LOGLEVEL_TRACE, json.dumps(json_obj, sort_keys=True, separators=(',', ':'), indent=4))
+
+
+class AsyncIridaAPI(IridaAPI):
+    """
+    An IridaAPI which traverses the IRIDA REST API using an asyncio event loop.
+
+    The public methods are the same (blocking) methods as IridaAPI, but requests within each call are run concurrently
+    on an event loop in a background thread, bounded by the AsyncIridaConnector.
+    """
+
+    def __init__(self, async_irida_connector, reportable_serovars, traversal=TRAVERSAL_SAMPLES):
+        """
+        Creates a new AsyncIridaAPI object.
+
+        :param async_irida_connector: The AsyncIridaConnector used to make requests to IRIDA.
+        :param reportable_serovars: A list of serovars considered as reportable.
+        :param traversal: How to find the automated SISTR results of the samples in a project (one of TRAVERSALS).
+        """
+        super(AsyncIridaAPI, self).__init__(async_irida_connector, reportable_serovars, traversal=traversal)
+        self._loop = None
+        self._loop_thread = None
+        self._loop_lock = threading.Lock()
+
+    def _get_loop(self):
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(target=self._loop.run_forever, name='irida-async', daemon=True)
+                self._loop_thread.start()
+            return self._loop
+
+    def _run(self, coroutine):
+        """
+        Runs the coroutine on the event loop and waits for the result. Safe to call from multiple threads.
+        """
+        return asyncio.run_coroutine_threadsafe(tracing.propagate_async(coroutine), self._get_loop()).result()
+
+    def close(self):
+        """Closes connections to IRIDA and stops the event loop."""
+        with self._loop_lock:
+            if self._loop is not None:
+                asyncio.run_coroutine_threadsafe(self.irida_connector.close(), self._loop).result()
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._loop_thread.join()
+                self._loop.close()
+                self._loop = None
+                self._loop_thread = None
+
+    def get_user_project(self, project_id):
+        return self._run(self.irida_connector.get('/api/projects/' + str(project_id)))
+
+    def get_user_projects(self):
+        return self._run(self.irida_connector.get_resources('/api/projects'))
+
+    def get_sistr_results_for_project(self, project, sistr_workflow_ids, sample_created_date_min, known_results=None):
+        return self._run(self._get_sistr_results_for_project_async(project, sistr_workflow_ids,
+                                                                   sample_created_date_min, known_results))
+
+    def get_sistr_info_from_submission(self, submission, context=None):
+        return self._run(self._get_sistr_info_from_submission_async(submission, context))
+
+    def get_sistr_submissions_for_user(self, sistr_workflow_ids=None):
+        return self._run(self._get_sistr_submissions_async('/api/analysisSubmissions/analysisType/sistr',
+                                                           sistr_workflow_ids, False))
+
+    def get_sistr_submissions_shared_to_project(self, project_id, sistr_workflow_ids=None):
+        return self._run(self._get_sistr_submissions_async('/api/projects/' + str(project_id) + '/analyses/sistr',
+                                                           sistr_workflow_ids, True))
+
+    def get_sistr_submission_candidates_for_user(self, sistr_workflow_ids=None):
+        return self._run(self._get_sistr_submission_candidates_async('/api/analysisSubmissions/analysisType/sistr',
+                                                                     sistr_workflow_ids, False))
+
+    def get_sistr_submission_candidates_shared_to_project(self, project_id, sistr_workflow_ids=None):
+        return self._run(self._get_project_submission_candidates_async(project_id, sistr_workflow_ids))
+
+    def get_sistr_info_for_candidates(self, candidates):
+        return self._run(self._get_sistr_info_for_candidates_async(candidates))
+
+    async def _get_sistr_results_for_project_async(self, project, sistr_workflow_ids, sample_created_date_min,
+                                                   known_results):
+        sistr_results_for_project = await self.irida_connector.get_resources(
+            '/api/projects/' + str(project) + '/samples')
+
+        samples = []
+        for sample in sistr_results_for_project:
+            if self._created_since(sample, sample_created_date_min):
+                logger.debug("sample [id=%s, name=%s, createdDate=%s] created before %s, skipping.",
+                             sample['identifier'], sample['sampleName'], sample['createdDate'],
+                             sample_created_date_min)
+            else:
+                samples.append(sample)
+        self.progress.project_listed(len(samples))
+
+        submissions_by_sample = None
+        if self.traversal == TRAVERSAL_PROJECT:
+            submissions_by_sample = await self._get_project_submissions_by_sample_async(project, sistr_workflow_ids)
+
+        # gather() keeps the order of samples so results are identical to IridaAPI
+        sample_sistr_results = await asyncio.gather(
+            *[self._get_sistr_info_for_sample_async(sample, sistr_workflow_ids, known_results, submissions_by_sample)
+              for sample in samples])
+
+        return [sistr_info for sistr_info in sample_sistr_results if sistr_info is not None]
+
+    async def _get_sistr_info_for_sample_async(self, sample, sistr_workflow_ids, known_results=None,
+                                               submissions_by_sample=None):
+        with tracing.span('sample', sample=sample['identifier'], sample_name=sample['sampleName']):
+            known_result = self._get_known_sistr_info(sample, known_results)
+            if known_result is not None:
+                self.progress.sample_done()
+                return known_result
+
+            sistr_info = None
+            candidates = submissions_by_sample.get(sample['identifier']) if submissions_by_sample else None
+            if candidates and self._are_automated_submissions(sample, candidates):
+                sistr_info = await self._create_sistr_info_for_sample_from_candidates_async(sample, candidates,
+                                                                                            sistr_workflow_ids)
+            if sistr_info is None:
+                sistr_info = await self.identity_map.get_or_create_async(
+                    'sample', self._sample_key(sample, sistr_workflow_ids),
+                    lambda: self._create_sistr_info_for_sample_async(sample, sistr_workflow_ids))
+
+        self.progress.sample_done()
+        return sistr_info
+
+    async def _get_project_submissions_by_sample_async(self, project, sistr_workflow_ids):
+        submissions_by_sample = {}
+        for candidate in await self._get_project_submission_candidates_async(project, sistr_workflow_ids):
+            if candidate.sample_id is not None:
+                submissions_by_sample.setdefault(candidate.sample_id, []).append(candidate)
+
+        tracing.current_span().set_attribute('joined_samples', len(submissions_by_sample))
+        return submissions_by_sample
+
+    async def _get_project_submission_candidates_async(self, project_id, sistr_workflow_ids):
+        return await self.identity_map.get_or_create_async(
+            'project_submissions', self._project_submissions_key(project_id, sistr_workflow_ids),
+            lambda: self._get_sistr_submission_candidates_async(
+                '/api/projects/' + str(project_id) + '/analyses/sistr', sistr_workflow_ids, True))
+
+    async def _get_pair_submission_async(self, sequencing_object):
+        sistr_rel = self._get_rel_from_links('analysis/sistr', sequencing_object['links'])
+        return await self.identity_map.get_or_create_async('pair_submission', sequencing_object['identifier'],
+                                                           lambda: self.irida_connector.get(sistr_rel))
+
+    async def _create_sistr_info_for_sample_from_candidates_async(self, sample, candidates, sistr_workflow_ids):
+        load_order = sorted(range(len(candidates)), key=lambda index: candidates[index].created_date, reverse=True)
+        new_sistr_infos = {}
+        for position, index in enumerate(load_order):
+            new_sistr_info = await self._get_sistr_info_for_candidate_async(candidates[index], sample)
+            if new_sistr_info is not None:
+                new_sistr_infos[index] = new_sistr_info
+                if new_sistr_info.get_qc_status() == 'PASS':
+                    self._count_superseded_submissions(len(load_order) - position - 1)
+                    break
+
+        if not new_sistr_infos:
+            return None
+
+        return self._pick_sample_sistr_info(sample, new_sistr_infos, sistr_workflow_ids)
+
+    async def _create_sistr_info_for_sample_async(self, sample, sistr_workflow_ids):
+        sample_pairs = await self.irida_connector.get_resources('/api/samples/' + sample['identifier'] + '/pairs')
+        tracing.current_span().set_attribute('pairs', len(sample_pairs))
+
+        if len(sample_pairs) == 0:
+            return None
+
+        sistr_objects = [sequencing_object for sequencing_object in sample_pairs if
+                         self._has_rel_in_links('analysis/sistr', sequencing_object['links'])]
+        sistrs = await asyncio.gather(
+            *[self._get_pair_submission_async(sequencing_object) for sequencing_object in sistr_objects])
+
+        completed_sistrs = []
+        contexts = []
+        for sequencing_object, sistr in zip(sistr_objects, sistrs):
+            if (sistr['analysisState'] != 'COMPLETED'):
+                logger.debug(
+                    "Skipping automated SISTR results associated with sample=%s as state is not 'COMPLETED'.",
+                    sample['identifier'])
+            else:
+                completed_sistrs.append(sistr)
+                contexts.append(SubmissionContext.for_sequencing_object(sequencing_object, sample))
+
+        # Loaded one at a time (as IridaAPI), as usually the newest submission passes QC and the rest are not needed
+        load_order = self._get_submission_load_order(completed_sistrs, sistr_workflow_ids)
+        new_sistr_infos = {}
+        for index in load_order:
+            new_sistr_infos[index] = await self._get_sistr_info_from_submission_async(completed_sistrs[index],
+                                                                                      contexts[index])
+            if new_sistr_infos[index].get_qc_status() == 'PASS':
+                break
+
+        self._count_superseded_submissions(len(load_order) - len(new_sistr_infos))
+        return self._pick_sample_sistr_info(sample, new_sistr_infos, sistr_workflow_ids)
+
+    async def _get_sistr_predictions_async(self, sistr_analysis_href):
+        analysis = await self.irida_connector.get(sistr_analysis_href, immutable=True)
+
+        sistr_href = self._get_rel_from_links('outputFile/sistr-predictions', analysis['links'])
+        sistr_pred = await self.irida_connector.get_file(sistr_href, immutable=True)
+        try:
+            sistr_pred_json = json.loads(sistr_pred)
+        except json.decoder.JSONDecodeError as e:
+            raise SistrResultsException("Error parsing JSON") from e
+
+        if (sistr_pred_json is None):
+            raise SistrResultsException("Could not get SISTR predictions for sistr " + sistr_analysis_href)
+
+        self._log_json(sistr_pred_json)
+
+        return sistr_pred_json
+
+    async def _get_sistr_info_from_submission_async(self, submission, context=None):
+        with tracing.span('submission', submission=submission['identifier']):
+            return await self.identity_map.get_or_create_async(
+                'submission', submission['identifier'],
+                lambda: self._create_sistr_info_from_submission_async(submission, context))
+
+    async def _get_input_files_async(self, path, known_files):
+        if known_files is not None:
+            return known_files
+        return await self.irida_connector.get_resources(path, immutable=True)
+
+    async def _create_sistr_info_from_submission_async(self, submission, context=None):
+        context = context or SubmissionContext()
+        sistr_info = {}
+
+        links = submission['links']
+        paired_path = self._get_rel_from_links('input/paired', links)
+        sistr_analysis_href = self._get_rel_from_links('analysis', links)
+        unpaired_path = self._get_rel_from_links('input/unpaired', links)
+
+        # Checked before loading anything else, as IridaAPI does, so no requests are wasted on submissions with
+        # unpaired files
+        unpaired_files = await self._get_input_files_async(unpaired_path, context.unpaired_files)
+        self._check_no_unpaired_files(submission, unpaired_files)
+
+        paired, sistr_predictions = await asyncio.gather(
+            self._get_input_files_async(paired_path, context.paired_files),
+            self._get_sistr_predictions_async(sistr_analysis_href))
+
+        sistr_info['paired_files'] = paired
+        sistr_info['sistr_predictions'] = sistr_predictions
+        sistr_info['has_results'] = True
+        if context.sample is not None:
+            sistr_info['sample'] = context.sample
+        elif (self._has_sample_in_paired(paired)):
+            sample_href = self._get_rel_from_links('sample', paired[0]['links'])
+            sistr_info['sample'] = await self.identity_map.get_or_create_async(
+                'href', sample_href, lambda: self.irida_connector.get(sample_href))
+        else:
+            sistr_info['sample'] = None
+        sistr_info['submission'] = submission
+
+        self._count_avoided_requests(self._get_known_endpoints(context, paired))
+        return SampleSistrInfo(sistr_info, self.reportable_serovars)
+
+    async def _get_sistr_submission_info_async(self, sistr, sistr_workflow_ids, reload_submission):
+        try:
+            if self._is_included_submission(sistr, sistr_workflow_ids):
+                if reload_submission:
+                    return await self._get_sistr_info_for_shared_submission_async(sistr)
+                return await self._get_sistr_info_from_submission_async(sistr)
+        except (HTTPError, SistrResultsException) as e:
+            self._log_submission_error(sistr, e)
+
+        return None
+
+    async def _get_sistr_info_for_shared_submission_async(self, sistr):
+        sistr_info = self.identity_map.get_existing('submission', sistr['identifier'])
+        if sistr_info is None:
+            submission = await self._get_listed_submission_async(sistr, True)
+            sistr_info = await self._get_sistr_info_from_submission_async(submission)
+        return sistr_info
+
+    async def _get_listed_submission_async(self, sistr, reload_submission):
+        if not reload_submission:
+            return sistr
+        elif self._has_submission_links(sistr):
+            self._count_avoided_requests(['analysis_submission'])
+            return sistr
+        else:
+            return await self.irida_connector.get('/api/analysisSubmissions/' + str(sistr['identifier']))
+
+    async def _get_sistr_submissions_async(self, path, sistr_workflow_ids, reload_submission):
+        sistr_submissions = await self.irida_connector.get_resources(path)
+
+        sistr_analysis_list = await asyncio.gather(
+            *[self._get_sistr_submission_info_async(sistr, sistr_workflow_ids, reload_submission) for sistr in
+              sistr_submissions])
+
+        return [sistr_info for sistr_info in sistr_analysis_list if sistr_info is not None]
+
+    async def _get_sistr_submission_candidates_async(self, path, sistr_workflow_ids, reload_submission):
+        sistr_submissions = await self.irida_connector.get_resources(path)
+
+        candidates = await asyncio.gather(
+            *[self._get_sistr_submission_candidate_async(sistr, reload_submission) for sistr in sistr_submissions
+              if self._is_included_submission(sistr, sistr_workflow_ids)])
+
+        return [candidate for candidate in candidates if candidate is not None]
+
+    async def _get_sistr_submission_candidate_async(self, sistr, reload_submission):
+        try:
+            sistr_info = self.identity_map.get_existing('submission', sistr['identifier'])
+            if sistr_info is not None:
+                return SubmissionCandidate.from_sistr_info(sistr_info)
+
+            submission = await self._get_listed_submission_async(sistr, reload_submission)
+            paired_path = self._get_rel_from_links('input/paired', submission['links'])
+            paired = await self.irida_connector.get_resources(paired_path, immutable=True)
+
+            return SubmissionCandidate(submission['identifier'], self._get_sample_id_from_paired(paired),
+                                       datetime.fromtimestamp(submission['createdDate'] / 1000), submission, paired)
+        except (HTTPError, SistrResultsException) as e:
+            self._log_submission_error(sistr, e)
+            return None
+
+    async def _get_sistr_info_for_candidates_async(self, candidates):
+        sistr_infos = await asyncio.gather(
+            *[self._get_sistr_info_for_candidate_async(candidate) for candidate in candidates])
+
+        return [sistr_info for sistr_info in sistr_infos if sistr_info is not None]
+
+    async def _get_sistr_info_for_candidate_async(self, candidate, sample=None):
+        if candidate.sistr_info is not None:
+            return candidate.sistr_info
+
+        try:
+            candidate.sistr_info = await self._get_sistr_info_from_submission_async(
+                candidate.submission, self._get_candidate_context(candidate, sample))
+            return candidate.sistr_info
+        except (HTTPError, SistrResultsException) as e:
+            self._log_submission_error(candidate.submission, e)
+            return None
@@ -0,0 +1,132 @@
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+
+logger = logging.getLogger("irida-cache")
+
+# Number of writes to batch up before committing to disk
+COMMIT_INTERVAL = 100
+
+
+class IridaResponseCache(object):
+    """
+    A persistent SQLite cache of IRIDA responses, keyed by URL.
+
+    This must only be used for resources which never change (e.g., the analysis, SISTR predictions and input files of
+    a COMPLETED analysis submission). The least recently used responses are evicted once the cache grows beyond a
+    maximum size.
+    """
+
+    def __init__(self, cache_file, max_size_bytes=1024 * 1024 * 1024):
+        """
+        Creates (or opens) a response cache.
+
+        :param cache_file: The SQLite file to store the cache in.
+        :param max_size_bytes: The maximum size (of the compressed responses) to store in the cache.
+        """
+        self.cache_file = cache_file
+        self.max_size_bytes = max_size_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.evicted = 0
+
+        self._lock = threading.Lock()
+        self._pending_writes = 0
+        self._connection = sqlite3.connect(cache_file, timeout=30, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.execute('CREATE TABLE IF NOT EXISTS responses ('
+                                 'url TEXT PRIMARY KEY, body BLOB NOT NULL, size INTEGER NOT NULL, '
+                                 'last_access REAL NOT NULL)')
+        self._connection.execute('CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)')
+        self._connection.commit()
+        self._size = self._connection.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def get(self, url):
+        """
+        Gets a cached response.
+
+        :param url: The URL of the response.
+
+        :return: The body of the response (bytes), or None if the URL is not in the cache.
+        """
+        with self._lock:
+            row = self._connection.execute('SELECT body FROM responses WHERE url = ?', (url,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._connection.execute('UPDATE responses SET last_access = ? WHERE url = ?', (time.time(), url))
+            self._wrote()
+
+        return zlib.decompress(row[0])
+
+    def put(self, url, body):
+        """
+        Stores a response in the cache.
+
+        :param url: The URL of the response.
+        :param body: The body of the response (bytes).
+        """
+        compressed_body = zlib.compress(body)
+        size = len(compressed_body)
+
+        if size > self.max_size_bytes:
+            logger.debug("Response for url=%s of size %s too large to cache", url, size)
+            return
+
+        with self._lock:
+            existing = self._connection.execute('SELECT size FROM responses WHERE url = ?', (url,)).fetchone()
+            if existing is not None:
+                self._size -= existing[0]
+
+            self._connection.execute('INSERT OR REPLACE INTO responses (url, body, size, last_access) '
+                                     'VALUES (?, ?, ?, ?)', (url, compressed_body, size, time.time()))
+            self._size += size
+            self.stored += 1
+
+            if self._size > self.max_size_bytes:
+                self._evict()
+            self._wrote()
+
+    def _evict(self):
+        # Evict down to 90% of the maximum so we don't evict on every put once full
+        target_size = self.max_size_bytes * 0.9
+        cursor = self._connection.execute('SELECT url, size FROM responses ORDER BY last_access')
+        evict_urls = []
+        for url, size in cursor:
+            if self._size <= target_size:
+                break
+            evict_urls.append((url,))
+            self._size -= size
+
+        self._connection.executemany('DELETE FROM responses WHERE url = ?', evict_urls)
+        self.evicted += len(evict_urls)
+        logger.debug("Evicted %s responses from cache %s", len(evict_urls), self.cache_file)
+
+    def _wrote(self):
+        self._pending_writes += 1
+        if self._pending_writes >= COMMIT_INTERVAL:
+            self._connection.commit()
+            self._pending_writes = 0
+
+    def get_size(self):
+        """Gets the current size (in bytes) of the compressed responses in the cache."""
+        return self._size
+
+    def get_hit_rate(self):
+        """Gets the fraction of lookups which were found in the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+    def close(self):
+        """Writes any pending changes and closes the cache."""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.commit()
+                self._connection.close()
+                self._connection = None
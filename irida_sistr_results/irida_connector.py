@@ -1,27 +1,28 @@
 import json
 import logging
-from urllib.parse import urlsplit
+import threading
+import time
+from urllib.parse import urljoin, urlsplit
 
+import requests
 from rauth import OAuth2Service
 
+from irida_sistr_results.identity_map import tally_requests
+from irida_sistr_results import tracing
+from irida_sistr_results.irida_metrics import RequestMetrics, classify_endpoint
+from irida_sistr_results.irida_token import IridaTokenManager
+from irida_sistr_results.irida_transport import configure_session
+
 LOGLEVEL_TRACE = 5
 
 logger = logging.getLogger("irida_connector")
 
 
-def decode_access_token(s):
-    """
-    Used to decode the access token.
-    :param s: The input bytes.
-    :return: A dictionary.
-    """
-    return json.loads(s.decode('utf-8'))
-
-
 class IridaConnector(object):
     """Low-level connections to the IRIDA REST API"""
 
-    def __init__(self, client_id, client_secret, username, password, base_url, timeout):
+    def __init__(self, client_id, client_secret, username, password, base_url, timeout, pool_size=10, cache=None,
+                 token_file=None, throttle=None, max_in_flight=None):
         """
         Creates a new object for connecting to the IRIDA REST API
 
@@ -31,25 +32,27 @@ class IridaConnector(object):
         :param password:  The password for the user.
         :param base_url:  The base URL for IRIDA (minis the '/api' part)
         :param timeout:  The maximum timeout for any connection to IRIDA.
+        :param pool_size:  The maximum number of connections to keep open to IRIDA.
+        :param cache:  An IridaResponseCache for responses of immutable resources (default None for no cache).
+        :param token_file:  A file to store access tokens between runs (default None to not store tokens).
+        :param throttle:  A RequestThrottle to control the load put on IRIDA (default None to send requests as they
+                          are made, each with the fixed timeout, and not retry failures).
+        :param max_in_flight:  The maximum number of requests to IRIDA in flight at once, shared by all threads
+                               (default None for no limit).
 
         :return: An object which can be used to connect to IRIDA.
         """
         base_url = base_url.rstrip('/')
+        self._base_url = base_url
         self._base_path = urlsplit(base_url).path
         self._timeout = timeout
+        self.cache = cache
+        self.throttle = throttle
+        self.max_in_flight = max_in_flight
+        self._in_flight_limit = threading.BoundedSemaphore(max_in_flight) if max_in_flight is not None else None
 
         access_token_url = base_url + '/api/oauth/token'
 
-        params = {
-            "data": {
-                "grant_type": "password",
-                "client_id": client_id,
-                "client_secret": client_secret,
-                "username": username,
-                "password": password
-            }
-        }
-
         oauth_service = OAuth2Service(
             client_id=client_id,
             client_secret=client_secret,
@@ -58,20 +61,42 @@ class IridaConnector(object):
             base_url=base_url
         )
 
-        token = oauth_service.get_access_token(decoder=decode_access_token, **params)
-        self.session = oauth_service.get_session(token)
+        self.token_manager = IridaTokenManager(oauth_service, username, password, token_file)
+        # Fail early if the username/password or client_id/client_secret are invalid
+        self.token_manager.get_access_token()
+
+        self.session = requests.Session()
+        self._adapter = configure_session(self.session, pool_size)
+        self._request_metrics = RequestMetrics()
+
+    def get_connection_stats(self):
+        """
+        Gets statistics on the connections made to IRIDA.
+
+        :return:  A ConnectionStats object.
+        """
+        return self._adapter.connection_stats
+
+    def get_request_metrics(self):
+        """
+        Gets the per-endpoint metrics (counts, latencies, sizes, errors and retries) of the requests made to IRIDA.
 
-    def get(self, path):
+        :return:  A RequestMetrics object.
+        """
+        return self._request_metrics
+
+    def get(self, path, immutable=False):
         """
         A GET request to a particular path in IRIDA.
 
         :param path: The path to GET, minus the IRIDA url (e.g., '/projects').
+        :param immutable: Whether the resource at this path never changes, so may be read from/stored in the cache.
 
         :return:  The result of rauth.OAuth2Service.get()
         """
         path = self._join_path(path)
         logger.debug("Getting path=" + path)
-        response = self.session.get(path, timeout=self._timeout)
+        response = self._get_response(path, immutable)
 
         if (response.ok):
             self._log_json(response.json())
@@ -79,6 +104,122 @@ class IridaConnector(object):
         else:
             response.raise_for_status()
 
+    def _get_response(self, path, immutable, headers=None):
+        if not immutable or self.cache is None:
+            return self._session_get(path, headers)
+
+        url = urljoin(self._base_url, path)
+        body = self.cache.get(url)
+        if body is not None:
+            logger.debug("Found path=" + path + " in cache")
+            return self._cached_response(url, body)
+
+        response = self._session_get(path, headers)
+        if (response.ok):
+            self.cache.put(url, response.content)
+
+        return response
+
+    def _session_get(self, path, headers):
+        url = urljoin(self._base_url, path)
+        endpoint = classify_endpoint(url)
+        access_token = self.token_manager.get_access_token()
+        response = self._session_get_with_token(url, endpoint, headers, access_token)
+
+        # The token may have expired or been revoked part way through a run
+        if response.status_code == 401:
+            self._request_metrics.record_retry(endpoint)
+            response = self._session_get_with_token(url, endpoint, headers, self.token_manager.refresh(access_token))
+
+        return response
+
+    def _session_get_with_token(self, url, endpoint, headers, access_token):
+        headers = dict(headers) if headers is not None else {}
+        headers['Authorization'] = 'Bearer ' + access_token
+
+        attempt = 0
+        while True:
+            try:
+                response = self._send(url, endpoint, headers, self.get_request_timeout(endpoint, attempt))
+                if response.status_code < 500:
+                    return response
+                retry_delay = self.get_retry_delay(endpoint, attempt)
+                if retry_delay is None:
+                    return response
+            except requests.exceptions.Timeout:
+                retry_delay = self.get_retry_delay(endpoint, attempt)
+                if retry_delay is None:
+                    raise
+
+            logger.debug("Retrying path=%s in %s seconds", url, retry_delay)
+            time.sleep(retry_delay)
+            attempt += 1
+
+    def _send(self, url, endpoint, headers, timeout):
+        tally_requests()
+        if self._in_flight_limit is not None:
+            self._in_flight_limit.acquire()
+        throttle = self.throttle
+        permit = throttle.acquire() if throttle is not None else None
+        start = time.perf_counter()
+        status = None
+        try:
+            with tracing.span('GET ' + endpoint, url=url) as span:
+                self._request_metrics.request_started()
+                start = time.perf_counter()
+                try:
+                    response = self.session.get(url, headers=headers, timeout=timeout)
+                except requests.exceptions.RequestException:
+                    self._request_metrics.record_error(endpoint, time.perf_counter() - start)
+                    raise
+                status = response.status_code
+                self._request_metrics.record(endpoint, time.perf_counter() - start, len(response.content), status)
+                span.set_attribute('status', status)
+        finally:
+            if throttle is not None:
+                throttle.release(permit, endpoint, time.perf_counter() - start, status)
+            if self._in_flight_limit is not None:
+                self._in_flight_limit.release()
+
+        return response
+
+    def get_request_timeout(self, endpoint, attempt=0):
+        """
+        Gets the timeout for an attempt at a request to IRIDA.
+
+        :param endpoint: The class of endpoint requested (from classify_endpoint()).
+        :param attempt: The number of the attempt (starting at 0), retries always get the maximum timeout.
+        :return: The timeout (in seconds).
+        """
+        if self.throttle is None or attempt > 0:
+            return self._timeout
+        return self.throttle.get_timeout(endpoint, self._timeout)
+
+    def get_retry_delay(self, endpoint, attempt):
+        """
+        Gets the time to wait before retrying a request which failed with a server error or timeout (and counts the
+        retry).
+
+        :param endpoint: The class of endpoint requested (from classify_endpoint()).
+        :param attempt: The number of the attempt which failed (starting at 0).
+        :return: The time (in seconds) to wait, or None if the request should not be retried.
+        """
+        if self.throttle is None:
+            return None
+
+        retry_delay = self.throttle.get_retry_delay(attempt)
+        if retry_delay is not None:
+            self._request_metrics.record_retry(endpoint)
+        return retry_delay
+
+    def _cached_response(self, url, body):
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response.encoding = 'utf-8'
+        response._content = body
+        return response
+
     def _join_path(self, path):
         if (self._base_path is None or self._base_path == ''):
             return path
@@ -91,25 +232,41 @@ class IridaConnector(object):
             else:
                 return self._base_path + '/' + path
 
-    def get_resources(self, path):
+    def get_url(self, path):
+        """
+        Gets the full URL to a particular path in IRIDA.
+
+        :param path: The path, minus the IRIDA url (e.g., '/projects'), or a full URL.
+
+        :return:  The full URL to the path.
+        """
+        return urljoin(self._base_url, self._join_path(path))
+
+    def get_timeout(self):
+        """Gets the maximum timeout for any connection to IRIDA."""
+        return self._timeout
+
+    def get_resources(self, path, immutable=False):
         """
         GETs the resources from an IRIDA REST API endpoint (e.g., (get '/projects')['resources']
 
         :param path: The path to GET the resources.
+        :param immutable: Whether the resources at this path never change, so may be read from/stored in the cache.
 
         :return:  The ['resources'] part of the GET JSON response.
         """
-        return self.get(path)['resources']
+        return self.get(path, immutable)['resources']
 
-    def get_file(self, path):
+    def get_file(self, path, immutable=False):
         """
         GETs the file contents from an IRIDA REST API endpoint.
 
         :param path: The path to GET the file.
+        :param immutable: Whether the file at this path never changes, so may be read from/stored in the cache.
 
         :return:  The file contents.
         """
-        return self.session.get(path, headers={'Accept': 'text/plain'}, timeout=self._timeout)
+        return self._get_response(path, immutable, headers={'Accept': 'text/plain'})
 
     def _log_json(self, json_obj):
         logger.log(LOGLEVEL_TRACE, json.dumps(json_obj, sort_keys=True, separators=(',', ':'), indent=4))
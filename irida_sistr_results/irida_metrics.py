@@ -0,0 +1,282 @@
+import json
+import re
+import threading
+from urllib.parse import urlsplit
+
+# Upper bounds (in seconds) of the request latency histogram buckets, the last bucket is everything slower
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+# Classes of IRIDA REST API endpoints, matched against the end of the request path (first match wins)
+ENDPOINTS = [
+    ('projects', r'/api/projects'),
+    ('project', r'/api/projects/\d+'),
+    ('project_samples', r'/api/projects/\d+/samples'),
+    ('project_analyses', r'/api/projects/\d+/analyses/sistr'),
+    ('sample', r'/api/samples/\d+'),
+    ('sample_pairs', r'/api/samples/\d+/pairs'),
+    ('pair', r'/api/sequencingObjects/pairs/\d+'),
+    ('pair_analysis_submission', r'/api/sequencingObjects/pairs/\d+/analysis/sistr'),
+    ('user_analysis_submissions', r'/api/analysisSubmissions/analysisType/sistr'),
+    ('analysis_submission', r'/api/analysisSubmissions/\d+'),
+    ('analysis', r'/api/analysisSubmissions/\d+/analysis'),
+    ('predictions_file', r'/api/analysisSubmissions/\d+/analysis/file/[^/]+'),
+    ('submission_inputs', r'/api/analysisSubmissions/\d+/sequenceFiles/(pairs|unpaired)'),
+]
+
+OTHER_ENDPOINT = 'other'
+
+PROMETHEUS_PREFIX = 'irida_sistr_results_'
+
+_endpoint_patterns = [(name, re.compile(pattern + '/?$')) for name, pattern in ENDPOINTS]
+
+
+def _bucket_label(upper_bound):
+    return '+Inf' if upper_bound == float('inf') else repr(upper_bound)
+
+
+def classify_endpoint(url):
+    """
+    Gets the class of IRIDA REST API endpoint for a URL (e.g., 'project_samples' or 'predictions_file').
+
+    :param url: The URL or path of the request.
+    :return: The endpoint name, or 'other' if it is not a known endpoint.
+    """
+    path = urlsplit(url).path
+    for name, pattern in _endpoint_patterns:
+        if pattern.search(path):
+            return name
+    return OTHER_ENDPOINT
+
+
+class EndpointMetrics(object):
+    """Counts, latencies and sizes of the requests to a single class of IRIDA endpoint."""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.bytes_received = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.latency_buckets = [0] * len(LATENCY_BUCKETS)
+
+    def observe_latency(self, latency):
+        self.latency_sum += latency
+        self.latency_max = max(self.latency_max, latency)
+        for i, upper_bound in enumerate(LATENCY_BUCKETS):
+            if latency <= upper_bound:
+                self.latency_buckets[i] += 1
+                break
+
+    def get_mean_latency(self):
+        """Gets the mean latency (in seconds) of the requests, or None if there were no requests."""
+        observed = sum(self.latency_buckets)
+        return self.latency_sum / observed if observed else None
+
+    def get_latency_percentile(self, percentile):
+        """
+        Estimates a percentile of the latency from the histogram.
+
+        :param percentile: The percentile (e.g., 0.95).
+        :return: The upper bound (in seconds) of the bucket containing the percentile (the maximum latency for the
+                 last bucket), or None if there were no requests.
+        """
+        observed = sum(self.latency_buckets)
+        if not observed:
+            return None
+
+        cumulative = 0
+        for upper_bound, count in zip(LATENCY_BUCKETS, self.latency_buckets):
+            cumulative += count
+            if cumulative >= percentile * observed:
+                return min(upper_bound, self.latency_max)
+        return self.latency_max
+
+    def to_dict(self):
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'retries': self.retries,
+            'bytes_received': self.bytes_received,
+            'latency_seconds': {
+                'sum': self.latency_sum,
+                'mean': self.get_mean_latency(),
+                'max': self.latency_max,
+                'p50': self.get_latency_percentile(0.5),
+                'p95': self.get_latency_percentile(0.95),
+                'buckets': {_bucket_label(upper_bound): count for upper_bound, count in
+                            zip(LATENCY_BUCKETS, self.latency_buckets)},
+            },
+        }
+
+
+class RequestMetrics(object):
+    """
+    Thread-safe per-endpoint metrics of the requests made to IRIDA: request counts, latency histograms, bytes received,
+    errors and retries. Written out as a summary table, JSON or a Prometheus textfile.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self.in_flight = 0
+
+    def _get_endpoint(self, endpoint):
+        metrics = self._endpoints.get(endpoint)
+        if metrics is None:
+            metrics = self._endpoints[endpoint] = EndpointMetrics()
+        return metrics
+
+    def request_started(self):
+        """Counts a request as in flight until it is recorded with record() or record_error()."""
+        with self._lock:
+            self.in_flight += 1
+
+    def record(self, endpoint, latency, bytes_received, status):
+        """
+        Records a response from IRIDA.
+
+        :param endpoint: The class of endpoint requested (from classify_endpoint()).
+        :param latency: The time (in seconds) until the response was received.
+        :param bytes_received: The size (in bytes) of the response body.
+        :param status: The HTTP status code, 400 and above are counted as errors.
+        """
+        with self._lock:
+            self.in_flight -= 1
+            metrics = self._get_endpoint(endpoint)
+            metrics.requests += 1
+            metrics.bytes_received += bytes_received
+            metrics.observe_latency(latency)
+            if status >= 400:
+                metrics.errors += 1
+
+    def record_error(self, endpoint, latency):
+        """
+        Records a request which failed without a response (e.g., a connection error or timeout).
+
+        :param endpoint: The class of endpoint requested (from classify_endpoint()).
+        :param latency: The time (in seconds) until the request failed.
+        """
+        with self._lock:
+            self.in_flight -= 1
+            metrics = self._get_endpoint(endpoint)
+            metrics.requests += 1
+            metrics.errors += 1
+            metrics.observe_latency(latency)
+
+    def record_retry(self, endpoint):
+        """
+        Records that a request is being retried (e.g., after refreshing an expired access token).
+
+        :param endpoint: The class of endpoint requested (from classify_endpoint()).
+        """
+        with self._lock:
+            self._get_endpoint(endpoint).retries += 1
+
+    def get_endpoint_metrics(self):
+        """
+        Gets the metrics of each class of endpoint.
+
+        :return: A dictionary of {endpoint name: EndpointMetrics}.
+        """
+        with self._lock:
+            return dict(self._endpoints)
+
+    def get_total(self, field):
+        """
+        Gets the total of a field (e.g., 'requests' or 'bytes_received') over all endpoints.
+
+        :param field: The name of an EndpointMetrics field.
+        :return: The total.
+        """
+        with self._lock:
+            return sum(getattr(metrics, field) for metrics in self._endpoints.values())
+
+    def format_table(self):
+        """
+        Formats a summary table of the metrics of each endpoint.
+
+        :return: A list of lines of the table.
+        """
+        lines = ['{:<26} {:>9} {:>7} {:>7} {:>10} {:>9} {:>9} {:>9}'.format(
+            'Endpoint', 'Requests', 'Errors', 'Retries', 'MB', 'Mean ms', 'p95 ms', 'Total s')]
+
+        for endpoint, metrics in sorted(self.get_endpoint_metrics().items(), key=lambda item: -item[1].latency_sum):
+            mean_latency = metrics.get_mean_latency()
+            p95_latency = metrics.get_latency_percentile(0.95)
+            lines.append('{:<26} {:>9} {:>7} {:>7} {:>10.2f} {:>9} {:>9} {:>9.1f}'.format(
+                endpoint, metrics.requests, metrics.errors, metrics.retries, metrics.bytes_received / 1024 / 1024,
+                '{:.1f}'.format(mean_latency * 1000) if mean_latency is not None else '-',
+                '{:.1f}'.format(p95_latency * 1000) if p95_latency is not None else '-',
+                metrics.latency_sum))
+
+        return lines
+
+    def to_dict(self, run_stats=None):
+        """
+        Gets a JSON-serializable dictionary of the metrics.
+
+        :param run_stats: A dictionary of statistics of the whole run (e.g., samples/sec) to include.
+        :return: A dictionary.
+        """
+        return {
+            'run': run_stats if run_stats is not None else {},
+            'endpoints': {endpoint: metrics.to_dict() for endpoint, metrics in
+                          sorted(self.get_endpoint_metrics().items())},
+        }
+
+    def to_prometheus(self, run_stats=None):
+        """
+        Formats the metrics in the Prometheus text exposition format (e.g., for the node_exporter textfile collector).
+
+        :param run_stats: A dictionary of numeric statistics of the whole run to include as gauges.
+        :return: The metrics as a string.
+        """
+        endpoints = sorted(self.get_endpoint_metrics().items())
+        lines = []
+
+        def add_counter(name, description, field):
+            lines.append('# HELP {}{} {}'.format(PROMETHEUS_PREFIX, name, description))
+            lines.append('# TYPE {}{} counter'.format(PROMETHEUS_PREFIX, name))
+            for endpoint, metrics in endpoints:
+                lines.append('{}{}{{endpoint="{}"}} {}'.format(PROMETHEUS_PREFIX, name, endpoint,
+                                                               getattr(metrics, field)))
+
+        add_counter('requests_total', 'Requests sent to IRIDA.', 'requests')
+        add_counter('request_errors_total', 'Requests to IRIDA which failed.', 'errors')
+        add_counter('request_retries_total', 'Requests to IRIDA which were retried.', 'retries')
+        add_counter('response_bytes_total', 'Bytes of response bodies received from IRIDA.', 'bytes_received')
+
+        name = PROMETHEUS_PREFIX + 'request_duration_seconds'
+        lines.append('# HELP {} Latency of requests to IRIDA.'.format(name))
+        lines.append('# TYPE {} histogram'.format(name))
+        for endpoint, metrics in endpoints:
+            cumulative = 0
+            for upper_bound, count in zip(LATENCY_BUCKETS, metrics.latency_buckets):
+                cumulative += count
+                lines.append('{}_bucket{{endpoint="{}",le="{}"}} {}'.format(name, endpoint, _bucket_label(upper_bound),
+                                                                          cumulative))
+            lines.append('{}_sum{{endpoint="{}"}} {}'.format(name, endpoint, metrics.latency_sum))
+            lines.append('{}_count{{endpoint="{}"}} {}'.format(name, endpoint, cumulative))
+
+        for stat, value in sorted((run_stats or {}).items()):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                lines.append('# TYPE {}run_{} gauge'.format(PROMETHEUS_PREFIX, stat))
+                lines.append('{}run_{} {}'.format(PROMETHEUS_PREFIX, stat, value))
+
+        return '\n'.join(lines) + '\n'
+
+    def write(self, metrics_file, run_stats=None):
+        """
+        Writes the metrics to a file, in the Prometheus text format if the file name ends with '.prom', otherwise
+        as JSON.
+
+        :param metrics_file: The file to write to.
+        :param run_stats: A dictionary of statistics of the whole run to include.
+        """
+        with open(metrics_file, 'w') as metrics_h:
+            if metrics_file.endswith('.prom'):
+                metrics_h.write(self.to_prometheus(run_stats))
+            else:
+                json.dump(self.to_dict(run_stats), metrics_h, indent=2)
+                metrics_h.write('\n')
@@ -1,5 +1,10 @@
 import logging
+import threading
 
+from irida_sistr_results import tracing
+from irida_sistr_results.checkpoint import Checkpoint
+from irida_sistr_results.concurrency import create_executor, map_bounded
+from irida_sistr_results.incremental_state import IncrementalState
 from irida_sistr_results.irida_sistr_workflow import IridaSistrWorkflow
 
 logger = logging.getLogger("irida-sistr-results")
@@ -9,7 +14,8 @@ class IridaSistrResults(object):
     """Class for constructing the top-level data structures mapping projects to lists of SISTR results."""
 
     def __init__(self, irida_api, include_user_results, update_existing_with_user_results,
-                 sistr_workflow_versions_or_ids=None, sample_created_min_date=None):
+                 sistr_workflow_versions_or_ids=None, sample_created_min_date=None, jobs=1, incremental_state_file=None,
+                 checkpoint_file=None, resume=False):
         """
         Creates a new IridaSistrResults object.
 
@@ -18,6 +24,13 @@ class IridaSistrResults(object):
         :param update_existing_with_user_results:  Whether or not to update existing results with newer results run by a user.
         :param sistr_workflow_versions_or_ids: A list of SISTR workflow versions (or UUIDs) of results to include.
         :param sample_created_min_date: The minimum (oldest) sample created date for samples to include results for.
+        :param jobs: The maximum number of projects to load SISTR results for at once.
+        :param incremental_state_file: A file recording the results of a previous run, so only results for new samples
+                                       (or samples without completed results) are loaded. None to load all results.
+        :param checkpoint_file: A file recording each project once its results are merged, so a run which fails part
+                                way can be resumed. None to not record projects.
+        :param resume: Whether to resume from the projects recorded in checkpoint_file by a previous run, rather than
+                       loading them again.
 
         :return:  A new IridaSistrResults object.
         """
@@ -27,7 +40,15 @@ class IridaSistrResults(object):
         self.sistr_workflow_ids = IridaSistrWorkflow.workflow_ids_or_versions_to_ids(sistr_workflow_versions_or_ids)
         self.sistr_results = {}
         self.sample_project = {}
+        self._streamed_projects = set()
+        self._candidate_submissions = set()
+        self._loaded_submissions = set()
         self.sample_created_min_date = sample_created_min_date
+        self.jobs = jobs
+        self._results_lock = threading.RLock()
+        self.incremental_state = None if incremental_state_file is None else IncrementalState(incremental_state_file,
+                                                                                                  self.sistr_workflow_ids)
+        self.checkpoint = None if checkpoint_file is None else Checkpoint(checkpoint_file, resume)
 
     def get_sistr_results_all_projects(self):
         """
@@ -53,26 +74,237 @@ class IridaSistrResults(object):
 
         return self._get_sistr_results(projects)
 
+    def iter_sistr_results_all_projects(self):
+        """
+        Streams SISTR results from all projects accessible by the current user, one project at a time.
+
+        :return:  A generator of (project id, SISTR results for the project) in order of project id.
+        """
+        projects = self.irida_api.get_user_projects()
+        return self._iter_sistr_results(projects)
+
+    def iter_sistr_results_from_projects(self, project_ids):
+        """
+        Streams SISTR results from the list of IRIDA project identifiers, one project at a time.
+
+        :param project_ids:  The list of project ids.
+
+        :return:  A generator of (project id, SISTR results for the project) in order of project id.
+        """
+        projects = [self.irida_api.get_user_project(p) for p in project_ids]
+        return self._iter_sistr_results(projects)
+
+    def _iter_sistr_results(self, projects):
+        """
+        Finalizes the SISTR results of each project (including results shared to the project and user results) and
+        releases them once consumed, so only a few projects are held in memory at once. Unlike
+        _get_sistr_results(), results shared to a project are not used to update samples in projects which
+        were already streamed.
+        """
+        # User results are not per-project, so must be listed before any project can be finalized (their results are
+        # only loaded once a project with a sample they could replace results for is merged)
+        user_candidates = []
+        if (self.include_user_results):
+            user_candidates = self.irida_api.get_sistr_submission_candidates_for_user(self.sistr_workflow_ids)
+
+        # Stream in the same order the writers sort projects
+        projects = sorted(projects, key=lambda p: int(p['identifier']))
+
+        resumed_projects = set()
+        for project_id in self._resume_from_checkpoint(projects, True):
+            resumed_projects.add(project_id)
+            yield project_id, self._release_sistr_results_for_project(project_id)
+
+        projects = [p for p in projects if p['identifier'] not in resumed_projects]
+        self.irida_api.progress.add_projects(len(projects))
+
+        with create_executor(self.jobs, thread_name_prefix='irida-project') as executor:
+            project_results = map_bounded(executor, tracing.propagate(self._fetch_sistr_results_for_project),
+                                          projects, self.jobs)
+            for p, (sistr_results, shared_candidates) in zip(projects, project_results):
+                self._merge_project(p, sistr_results, [shared_candidates, user_candidates])
+                yield p['identifier'], self._release_sistr_results_for_project(p['identifier'])
+
+    def _release_sistr_results_for_project(self, project_id):
+        with self._results_lock:
+            sistr_results_project = self.sistr_results.pop(project_id)
+            self._streamed_projects.add(project_id)
+
+            for sample_id in sistr_results_project:
+                self.sample_project[sample_id].remove(project_id)
+                if not self.sample_project[sample_id]:
+                    del self.sample_project[sample_id]
+
+        # Submissions/samples loaded so far are no longer needed, except by projects still in flight
+        self.irida_api.identity_map.clear()
+
+        return sistr_results_project
+
     def _get_sistr_results(self, projects):
-        for p in projects:
-            logger.debug("Working on project [" + p['identifier'] + ', ' + p['name'] + ']')
-            self._load_sistr_results_for_project(p)
-            self._load_sistr_results_shared_to_project(p['identifier'])
+        resumed_projects = set(self._resume_from_checkpoint(projects, False))
+        projects = [p for p in projects if p['identifier'] not in resumed_projects]
+
+        self.irida_api.progress.add_projects(len(projects))
+        with create_executor(self.jobs, thread_name_prefix='irida-project') as executor:
+            # Projects are fetched concurrently but merged in order, so results match a sequential run
+            project_results = executor.map(tracing.propagate(self._fetch_sistr_results_for_project), projects)
+            for p, (sistr_results, shared_candidates) in zip(projects, project_results):
+                self._merge_project(p, sistr_results, [shared_candidates])
 
         if (self.include_user_results):
-            self._load_sistr_results_from_user()
+            with tracing.span('user_results'):
+                self._load_sistr_results_from_user()
 
         return self.sistr_results
 
+    def _merge_project(self, project, sistr_results, candidate_lists):
+        """
+        Merges the automated SISTR results of a project, then the results of any submission candidates which could
+        replace them, recording the project in the checkpoint (if any).
+
+        :param project: The project JSON.
+        :param sistr_results: The automated SISTR results of the project.
+        :param candidate_lists: Lists of SubmissionCandidates (shared to the project or accessible by the user).
+        """
+        logger.debug("Working on project [" + project['identifier'] + ', ' + project['name'] + ']')
+        with tracing.span('merge_project', project=project['identifier']):
+            self._load_sistr_results_for_project(project, sistr_results)
+            additional_results = []
+            for candidates in candidate_lists:
+                additional_results.extend(self._load_submission_candidates(candidates))
+
+            if self.checkpoint is not None:
+                self.checkpoint.record_project(project['identifier'], sistr_results, additional_results)
+
+    def _resume_from_checkpoint(self, projects, stream):
+        """
+        Starts the checkpoint (if any), and merges the projects recorded in it by a previous run (only those in
+        projects), in the order they were recorded.
+
+        :param projects: The list of project JSON of this run.
+        :param stream: Whether the results are streamed (which merges shared and user results differently).
+        :return: A generator of the identifiers of the projects merged from the checkpoint.
+        """
+        if self.checkpoint is None:
+            return
+
+        self.checkpoint.start(self._get_checkpoint_settings(stream))
+        projects_by_id = {p['identifier']: p for p in projects}
+        resumed = 0
+        for project_id, sistr_results, additional_results in self.checkpoint.iter_completed_projects(
+                self.irida_api.reportable_serovars):
+            if project_id in projects_by_id:
+                logger.debug("Resuming project [" + project_id + "] from checkpoint")
+                self._load_sistr_results_for_project(projects_by_id[project_id], sistr_results)
+                self._load_additional_sistr_results(additional_results)
+                resumed += 1
+                yield project_id
+
+        if resumed:
+            logger.info("Resumed %s projects completed by a previous run, loading the remaining %s projects",
+                        resumed, len(projects) - resumed)
+
+    def _get_checkpoint_settings(self, stream):
+        return {
+            'sistr_workflow_ids': self.sistr_workflow_ids,
+            'sample_created_min_date': self.sample_created_min_date.isoformat(
+                sep=' ') if self.sample_created_min_date else None,
+            'include_user_results': self.include_user_results,
+            'update_existing_with_user_results': self.update_existing_with_user_results,
+            'stream': stream
+        }
+
+    def remove_checkpoint(self):
+        """Removes the checkpoint file (if any), once the results of the run have been written."""
+        if self.checkpoint is not None:
+            self.checkpoint.remove()
+
+    def save_incremental_state(self):
+        """Saves the results loaded on this run to the incremental state file (if any) for the next run."""
+        if self.incremental_state is not None:
+            self.incremental_state.save()
+
+    def get_submissions_skipped(self):
+        """
+        Gets the number of SISTR submissions shared to projects or accessible by the user whose results were never
+        loaded, as they could not replace the results of any examined sample.
+        """
+        return len(self._candidate_submissions - self._loaded_submissions)
+
     def _load_sistr_results_from_user(self):
-        user_results = self.irida_api.get_sistr_submissions_for_user(self.sistr_workflow_ids)
-        self._load_additional_sistr_results(user_results)
+        user_candidates = self.irida_api.get_sistr_submission_candidates_for_user(self.sistr_workflow_ids)
+        self._load_submission_candidates(user_candidates)
+
+    def _load_submission_candidates(self, candidates):
+        """
+        Loads and merges the results of the submissions (shared to a project or accessible by the user) which could
+        replace the results of an examined sample, without loading the results of any others.
+
+        :param candidates: A list of SubmissionCandidate objects.
+        :return: A list of the SampleSistrInfo loaded and merged.
+        """
+        with self._results_lock:
+            replacing_candidates = [candidate for candidate in candidates if self._can_replace_result(candidate)]
+
+        self._candidate_submissions.update(candidate.submission_id for candidate in candidates if
+                                           candidate.sistr_info is None)
+        self._loaded_submissions.update(candidate.submission_id for candidate in replacing_candidates)
+        logger.debug("Loading results for %s of %s SISTR submissions which could replace examined results",
+                     len(replacing_candidates), len(candidates))
 
-    def _load_sistr_results_shared_to_project(self, project_id):
-        project_results = self.irida_api.get_sistr_submissions_shared_to_project(project_id, self.sistr_workflow_ids)
-        self._load_additional_sistr_results(project_results)
+        if not replacing_candidates:
+            return []
+
+        additional_results = self.irida_api.get_sistr_info_for_candidates(replacing_candidates)
+        self._load_additional_sistr_results(additional_results)
+        return additional_results
+
+    def _can_replace_result(self, candidate):
+        """
+        Whether the results of a submission could replace the current result of a sample in an examined project (as
+        merged by _merge_additional_sistr_results()).
+        """
+        for project in self.sample_project.get(candidate.sample_id, []):
+            current_result = self.sistr_results[project].get(candidate.sample_id)
+            if current_result is None:
+                continue
+            elif not current_result.has_sistr_results():
+                return True
+            elif (self.update_existing_with_user_results and
+                  current_result.get_submission_created_date() < candidate.created_date):
+                return True
+
+        return False
+
+    def _fetch_sistr_results_for_project(self, project):
+        """
+        Fetches (but does not merge) the automated SISTR results for a project, and lists the SISTR submissions shared
+        to the project.
+
+        :param project: The project JSON.
+        :return: A tuple of (automated results, SubmissionCandidates shared to the project).
+        """
+        project_id = project['identifier']
+        with tracing.span('project', project=project_id, project_name=project['name']) as span:
+            known_results = None
+            if self.incremental_state is not None:
+                known_results = self.incremental_state.get_known_results(project_id,
+                                                                         self.irida_api.reportable_serovars)
+
+            sistr_results = self.irida_api.get_sistr_results_for_project(project_id, self.sistr_workflow_ids,
+                                                                         self.sample_created_min_date, known_results)
+            shared_candidates = self.irida_api.get_sistr_submission_candidates_shared_to_project(
+                project_id, self.sistr_workflow_ids)
+            span.set_attribute('samples', len(sistr_results))
+
+        self.irida_api.progress.project_done()
+        return sistr_results, shared_candidates
 
     def _load_additional_sistr_results(self, additional_results):
+        with self._results_lock:
+            self._merge_additional_sistr_results(additional_results)
+
+    def _merge_additional_sistr_results(self, additional_results):
         for result in additional_results:
             sample_id = result.get_sample_id()
 
@@ -95,15 +327,20 @@ class IridaSistrResults(object):
                             logger.debug(self._result_to_sample_log_string(sistr_results_project[sample_id], result,
                                                                            "newer") + " Not updating.")
 
-    def _load_sistr_results_for_project(self, project):
+    def _load_sistr_results_for_project(self, project, project_results):
+        with self._results_lock:
+            self._merge_sistr_results_for_project(project, project_results)
+
+    def _merge_sistr_results_for_project(self, project, project_results):
         project_id = project['identifier']
 
-        if (project_id in self.sistr_results):
+        if (project_id in self.sistr_results or project_id in self._streamed_projects):
             raise Exception("Error: project " + str(project_id) + " already examined")
 
         self.sistr_results[project_id] = {}
-        project_results = self.irida_api.get_sistr_results_for_project(project_id, self.sistr_workflow_ids,
-                                                                       self.sample_created_min_date)
+
+        if self.incremental_state is not None:
+            self.incremental_state.update_project(project_id, project_results)
 
         for result in project_results:
             if result is None:
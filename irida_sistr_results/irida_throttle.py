@@ -0,0 +1,325 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger("irida-throttle")
+
+# Weights of new latencies in the smoothed latency and its variation (as for TCP round-trip times, RFC 6298)
+LATENCY_ALPHA = 0.125
+LATENCY_BETA = 0.25
+
+# Number of responses from an endpoint before its latency is used to adapt concurrency or timeouts
+LATENCY_WARMUP = 10
+
+# A smoothed latency above this multiple of the lowest latency seen for an endpoint (plus some slack for jitter on fast
+# endpoints) is taken as a sign that IRIDA is overloaded
+LATENCY_TOLERANCE = 2.0
+LATENCY_SLACK = 0.05
+
+# Adaptive timeouts are this multiple of the expected worst-case latency of an endpoint, but at least TIMEOUT_MIN seconds
+TIMEOUT_MULTIPLIER = 3.0
+TIMEOUT_MIN = 5.0
+
+# The adaptive concurrency limit starts here (doubling each round trip until IRIDA shows signs of load), and is
+# multiplied by BACKOFF_RATIO on an error or rising latency
+INITIAL_CONCURRENCY = 4
+BACKOFF_RATIO = 0.5
+
+# Requests failing with a server error (5xx) or a timeout are retried this many times, waiting
+# RETRY_BACKOFF * 2^attempt seconds before each retry
+MAX_RETRIES = 3
+RETRY_BACKOFF = 1.0
+
+
+class LatencyEstimate(object):
+    """The smoothed latency (and its variation) of requests to a single class of IRIDA endpoint."""
+
+    def __init__(self):
+        self.count = 0
+        self.smoothed = 0.0
+        self.variation = 0.0
+        self.minimum = 0.0
+
+    def observe(self, latency):
+        if self.count == 0:
+            self.smoothed = self.minimum = latency
+            self.variation = latency / 2
+        else:
+            self.variation = (1 - LATENCY_BETA) * self.variation + LATENCY_BETA * abs(self.smoothed - latency)
+            self.smoothed = (1 - LATENCY_ALPHA) * self.smoothed + LATENCY_ALPHA * latency
+            self.minimum = min(self.minimum, latency)
+        self.count += 1
+
+    def is_congested(self):
+        """Whether the latency has risen far enough above the lowest latency seen to suggest IRIDA is overloaded."""
+        return self.count >= LATENCY_WARMUP and self.smoothed > self.minimum * LATENCY_TOLERANCE + LATENCY_SLACK
+
+    def get_timeout(self, max_timeout):
+        """
+        Gets a timeout for a request, well above the latencies seen so far.
+
+        :param max_timeout: The maximum timeout (in seconds), used until enough latencies have been seen.
+        :return: The timeout (in seconds).
+        """
+        if self.count < LATENCY_WARMUP:
+            return max_timeout
+        return min(max_timeout, max(TIMEOUT_MIN, TIMEOUT_MULTIPLIER * (self.smoothed + 4 * self.variation)))
+
+
+class TokenBucket(object):
+    """A thread-safe token bucket, limiting the rate of requests while allowing short bursts."""
+
+    def __init__(self, rate, burst=None, clock=time.monotonic):
+        """
+        Creates a new TokenBucket.
+
+        :param rate: The number of tokens added per second.
+        :param burst: The maximum number of tokens held (default one second's worth).
+        :param clock: A function returning the current time in seconds.
+        """
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1)
+        self.delayed = 0
+        self.delay_time = 0.0
+
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated = clock()
+
+    def reserve(self):
+        """
+        Takes a token from the bucket, going into debt if it is empty.
+
+        :return: The time (in seconds) to wait before the token may be used.
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+
+            if self._tokens >= 0:
+                return 0.0
+
+            delay = -self._tokens / self.rate
+            self.delayed += 1
+            self.delay_time += delay
+            return delay
+
+
+def _wake(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class AdaptiveConcurrencyLimit(object):
+    """
+    A limit on the number of requests in flight, adapted to the load IRIDA can sustain by additive increase,
+    multiplicative decrease (AIMD): the limit grows by one for each round trip without signs of load, and is cut on
+    an error or rising latency. Usable from both threads (acquire()) and asyncio tasks (acquire_async()).
+    """
+
+    def __init__(self, max_limit, min_limit=1, initial_limit=INITIAL_CONCURRENCY):
+        """
+        Creates a new AdaptiveConcurrencyLimit.
+
+        :param max_limit: The highest the limit may grow to.
+        :param min_limit: The lowest the limit may be cut to.
+        :param initial_limit: The limit to start at.
+        """
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = float(min(max_limit, max(initial_limit, min_limit)))
+        self.lowest_limit = self.highest_limit = int(self.limit)
+        self.decreases = 0
+        self.in_flight = 0
+
+        # Signals from requests sent before the last decrease are ignored, so the limit is cut at most once per round
+        # trip (as TCP does)
+        self._generation = 0
+        self._slow_start = True
+        self._condition = threading.Condition()
+        self._async_waiters = deque()
+
+    def _try_acquire(self):
+        if self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return self._generation
+        return None
+
+    def acquire(self):
+        """
+        Waits until a request may be sent.
+
+        :return: A permit, to pass to release() once the request completes.
+        """
+        with self._condition:
+            permit = self._try_acquire()
+            while permit is None:
+                self._condition.wait()
+                permit = self._try_acquire()
+            return permit
+
+    async def acquire_async(self):
+        """
+        Waits (without blocking the event loop) until a request may be sent.
+
+        :return: A permit, to pass to release() once the request completes.
+        """
+        while True:
+            with self._condition:
+                permit = self._try_acquire()
+                if permit is not None:
+                    return permit
+                waiter = asyncio.get_running_loop().create_future()
+                self._async_waiters.append(waiter)
+            await waiter
+
+    def release(self, permit, congested):
+        """
+        Releases the permit of a completed request, adapting the limit.
+
+        :param permit: The permit from acquire().
+        :param congested: Whether the request showed signs of IRIDA being overloaded (an error or rising latency).
+        """
+        with self._condition:
+            at_limit = self.in_flight >= int(self.limit)
+            self.in_flight -= 1
+
+            if congested:
+                if permit == self._generation:
+                    self.limit = max(self.min_limit, self.limit * BACKOFF_RATIO)
+                    self.lowest_limit = min(self.lowest_limit, int(self.limit))
+                    self.decreases += 1
+                    self._generation += 1
+                    self._slow_start = False
+                    logger.debug("Decreased concurrency limit to %s", int(self.limit))
+            elif at_limit:
+                # Only grow the limit when it is what's holding requests back
+                self.limit = min(self.max_limit, self.limit + (1 if self._slow_start else 1 / self.limit))
+                self.highest_limit = max(self.highest_limit, int(self.limit))
+
+            self._condition.notify_all()
+            waiters, self._async_waiters = self._async_waiters, deque()
+
+        for waiter in waiters:
+            waiter.get_loop().call_soon_threadsafe(_wake, waiter)
+
+
+class RequestThrottle(object):
+    """
+    Client-side control of the load put on IRIDA: a rate limit on requests, an adaptive limit on the requests in
+    flight, adaptive per-endpoint timeouts and retries (with backoff) of requests failing with a server error or timeout.
+    Shared by all threads/tasks making requests.
+    """
+
+    def __init__(self, rate_limit=None, max_concurrency=None, adaptive_timeout=False, max_retries=MAX_RETRIES):
+        """
+        Creates a new RequestThrottle.
+
+        :param rate_limit: The maximum number of requests per second, or None for no limit.
+        :param max_concurrency: The maximum number of requests in flight the adaptive concurrency limit may grow to,
+                                or None to not adapt the concurrency.
+        :param adaptive_timeout: Whether to adapt the timeout of requests to each endpoint to the latencies seen.
+        :param max_retries: The number of times to retry requests failing with a server error or timeout.
+        """
+        self.rate_limiter = TokenBucket(rate_limit) if rate_limit is not None else None
+        self.concurrency_limit = AdaptiveConcurrencyLimit(max_concurrency) if max_concurrency is not None else None
+        self.adaptive_timeout = adaptive_timeout
+        self.max_retries = max_retries
+
+        self._lock = threading.Lock()
+        self._latencies = {}
+
+    def acquire(self):
+        """
+        Waits until a request may be sent.
+
+        :return: A permit, to pass to release() once the request completes.
+        """
+        permit = self.concurrency_limit.acquire() if self.concurrency_limit is not None else None
+        if self.rate_limiter is not None:
+            delay = self.rate_limiter.reserve()
+            if delay > 0:
+                time.sleep(delay)
+        return permit
+
+    async def acquire_async(self):
+        """
+        Waits (without blocking the event loop) until a request may be sent.
+
+        :return: A permit, to pass to release() once the request completes.
+        """
+        permit = await self.concurrency_limit.acquire_async() if self.concurrency_limit is not None else None
+        if self.rate_limiter is not None:
+            delay = self.rate_limiter.reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        return permit
+
+    def release(self, permit, endpoint, latency, status):
+        """
+        Records a completed request.
+
+        :param permit: The permit from acquire().
+        :param endpoint: The class of endpoint requested (from classify_endpoint()).
+        :param latency: The time (in seconds) until the response was received or the request failed.
+        :param status: The HTTP status code, or None if the request failed without a response.
+        """
+        failed = status is None or status >= 500 or status == 429
+        with self._lock:
+            estimate = self._latencies.get(endpoint)
+            if estimate is None:
+                estimate = self._latencies[endpoint] = LatencyEstimate()
+            if not failed:
+                estimate.observe(latency)
+            congested = failed or estimate.is_congested()
+
+        if self.concurrency_limit is not None:
+            self.concurrency_limit.release(permit, congested)
+
+    def get_timeout(self, endpoint, max_timeout):
+        """
+        Gets the timeout for a request.
+
+        :param endpoint: The class of endpoint requested.
+        :param max_timeout: The maximum timeout (in seconds).
+        :return: The timeout (in seconds), max_timeout unless adaptive timeouts are enabled.
+        """
+        if not self.adaptive_timeout:
+            return max_timeout
+
+        with self._lock:
+            estimate = self._latencies.get(endpoint)
+            return estimate.get_timeout(max_timeout) if estimate is not None else max_timeout
+
+    def get_retry_delay(self, attempt):
+        """
+        Gets the time to wait before retrying a request which failed with a server error or timeout.
+
+        :param attempt: The number of the attempt which failed (starting at 0).
+        :return: The time (in seconds) to wait, or None if the request should not be retried.
+        """
+        if attempt >= self.max_retries:
+            return None
+        return RETRY_BACKOFF * 2 ** attempt
+
+    def format_summary(self):
+        """
+        Formats a summary of the throttling over the run.
+
+        :return: A list of lines.
+        """
+        lines = []
+        if self.concurrency_limit is not None:
+            limit = self.concurrency_limit
+            lines.append("Adaptive concurrency limit ended at {} requests in flight (lowest {}, highest {}, maximum {}) "
+                         "after {} decreases".format(int(limit.limit), limit.lowest_limit, limit.highest_limit,
+                                                     limit.max_limit, limit.decreases))
+        if self.rate_limiter is not None:
+            lines.append("Rate limit of {} requests/sec delayed {} requests by {:.1f} seconds in total".format(
+                self.rate_limiter.rate, self.rate_limiter.delayed, self.rate_limiter.delay_time))
+        return lines
@@ -0,0 +1,167 @@
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger("irida-token")
+
+# Tokens expiring within this many seconds are refreshed before use
+EXPIRY_MARGIN_SECONDS = 60
+
+
+def decode_token_response(response):
+    """
+    Decodes a token from an IRIDA OAuth2 token response.
+
+    :param response: The requests.Response from the token endpoint.
+    :return: A dictionary of the token, with 'expires_at' (seconds since epoch) computed from 'expires_in'.
+    """
+    token = response.json()
+    # Raises KeyError (like rauth) if IRIDA did not grant a token
+    token['access_token']
+
+    if token.get('expires_in') is not None:
+        token['expires_at'] = time.time() + float(token['expires_in'])
+    else:
+        token['expires_at'] = None
+
+    return token
+
+
+class IridaTokenManager(object):
+    """
+    Manages the OAuth2 access token used to connect to IRIDA.
+
+    The token is (optionally) stored in a file readable only by the current user, and re-used between runs while it is
+    still valid. Once the token expires, or IRIDA rejects it, it is refreshed (using the refresh token if IRIDA
+    provided one, or else by authenticating again with the username and password). Safe to use from multiple threads.
+    """
+
+    def __init__(self, oauth_service, username, password, token_file=None):
+        """
+        Creates a new IridaTokenManager.
+
+        :param oauth_service: The rauth.OAuth2Service for IRIDA.
+        :param username:  The username of the user for IRIDA.
+        :param password:  The password for the user.
+        :param token_file:  A file to store tokens between runs (default None to not store tokens).
+        """
+        self.oauth_service = oauth_service
+        self.username = username
+        self.password = password
+        self.token_file = token_file
+        self.tokens_requested = 0
+        self.tokens_refreshed = 0
+
+        self._lock = threading.Lock()
+        self._token = None
+
+    def _get_token_key(self):
+        return '{}@{}#{}'.format(self.username, self.oauth_service.access_token_url, self.oauth_service.client_id)
+
+    def _is_valid(self, token):
+        return token is not None and (
+                token.get('expires_at') is None or token['expires_at'] - EXPIRY_MARGIN_SECONDS > time.time())
+
+    def get_access_token(self):
+        """
+        Gets a valid access token, loading a stored token or requesting a new token if necessary.
+
+        :return: The access token.
+        """
+        with self._lock:
+            if not self._is_valid(self._token):
+                if self._token is None:
+                    self._token = self._load_token()
+
+                if self._token is None:
+                    self._token = self._request_token()
+                elif not self._is_valid(self._token):
+                    self._token = self._refresh_token(self._token)
+
+            return self._token['access_token']
+
+    def refresh(self, rejected_access_token):
+        """
+        Refreshes the access token after it has been rejected by IRIDA.
+
+        :param rejected_access_token: The access token rejected by IRIDA.
+        :return: The new access token.
+        """
+        with self._lock:
+            # Another thread may have already refreshed the token
+            if self._token is None or self._token['access_token'] == rejected_access_token:
+                logger.info("Access token for IRIDA was rejected, refreshing token")
+                self._token = self._refresh_token(self._token)
+
+            return self._token['access_token']
+
+    def _request_token(self):
+        logger.debug("Requesting new access token for user=%s from %s", self.username,
+                     self.oauth_service.access_token_url)
+        token = decode_token_response(self.oauth_service.get_raw_access_token(data={
+            'grant_type': 'password',
+            'username': self.username,
+            'password': self.password
+        }))
+        self.tokens_requested += 1
+        self._save_token(token)
+
+        return token
+
+    def _refresh_token(self, token):
+        if token is not None and token.get('refresh_token') is not None:
+            try:
+                new_token = decode_token_response(self.oauth_service.get_raw_access_token(data={
+                    'grant_type': 'refresh_token',
+                    'refresh_token': token['refresh_token']
+                }))
+                self.tokens_refreshed += 1
+                self._save_token(new_token)
+
+                return new_token
+            except (KeyError, ValueError) as e:
+                logger.debug("Could not refresh access token, authenticating again: %s", e)
+
+        return self._request_token()
+
+    def _load_token(self):
+        if self.token_file is None or not os.path.exists(self.token_file):
+            return None
+
+        try:
+            with open(self.token_file) as token_file_h:
+                token = json.load(token_file_h).get(self._get_token_key())
+        except (OSError, ValueError) as e:
+            logger.warning("Could not read stored access tokens from %s: %s", self.token_file, e)
+            return None
+
+        if token is not None:
+            logger.debug("Loaded stored access token for user=%s from %s", self.username, self.token_file)
+
+        return token
+
+    def _save_token(self, token):
+        if self.token_file is None:
+            return
+
+        tokens = {}
+        if os.path.exists(self.token_file):
+            try:
+                with open(self.token_file) as token_file_h:
+                    tokens = json.load(token_file_h)
+            except (OSError, ValueError):
+                tokens = {}
+
+        # Drop expired tokens of other users/servers so the file doesn't grow forever
+        tokens = {key: stored_token for key, stored_token in tokens.items() if self._is_valid(stored_token)}
+        tokens[self._get_token_key()] = token
+
+        # Only the current user may read/write the stored tokens
+        tmp_file = self.token_file + '.tmp'
+        file_descriptor = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        os.chmod(tmp_file, 0o600)
+        with os.fdopen(file_descriptor, 'w') as token_file_h:
+            json.dump(tokens, token_file_h)
+        os.replace(tmp_file, self.token_file)
@@ -0,0 +1,84 @@
+import threading
+
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# Ask IRIDA to compress responses (JSON and the text/plain SISTR predictions), these are decoded transparently
+ACCEPT_ENCODING = 'gzip, deflate'
+
+
+class ConnectionStats(object):
+    """Thread-safe counts of the connections opened to IRIDA and the requests sent over them."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+        self.requests_sent = 0
+
+    def connection_opened(self):
+        with self._lock:
+            self.connections_opened += 1
+
+    def request_sent(self):
+        with self._lock:
+            self.requests_sent += 1
+
+    def get_connections_reused(self):
+        """
+        Gets the number of requests which were sent over an already open (kept-alive) connection.
+        """
+        with self._lock:
+            return max(self.requests_sent - self.connections_opened, 0)
+
+
+def _counting_pool_class(pool_class, connection_stats):
+    class CountingConnectionPool(pool_class):
+        def _new_conn(self):
+            connection_stats.connection_opened()
+            return super(CountingConnectionPool, self)._new_conn()
+
+    return CountingConnectionPool
+
+
+class IridaHTTPAdapter(HTTPAdapter):
+    """A requests HTTPAdapter with a tuned connection pool, which counts connections opened and reused."""
+
+    def __init__(self, pool_size=10, connection_stats=None):
+        """
+        Creates a new IridaHTTPAdapter.
+
+        :param pool_size: The maximum number of connections to keep open to IRIDA. Requests beyond this wait for a
+                          free connection rather than opening (and then throwing away) a new one.
+        :param connection_stats: A ConnectionStats object used to count connections (default creates a new one).
+        """
+        self.connection_stats = connection_stats if connection_stats is not None else ConnectionStats()
+        super(IridaHTTPAdapter, self).__init__(pool_connections=4, pool_maxsize=pool_size, pool_block=True)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super(IridaHTTPAdapter, self).init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _counting_pool_class(HTTPConnectionPool, self.connection_stats),
+            'https': _counting_pool_class(HTTPSConnectionPool, self.connection_stats),
+        }
+
+    def send(self, request, **kwargs):
+        self.connection_stats.request_sent()
+        return super(IridaHTTPAdapter, self).send(request, **kwargs)
+
+
+def configure_session(session, pool_size=10, connection_stats=None):
+    """
+    Configures a requests session for talking to IRIDA with connection pooling, keep-alive and compression.
+
+    :param session: The requests (rauth) session to configure.
+    :param pool_size: The maximum number of connections to keep open to IRIDA.
+    :param connection_stats: A ConnectionStats object used to count connections (default creates a new one).
+
+    :return: The IridaHTTPAdapter mounted on the session.
+    """
+    adapter = IridaHTTPAdapter(pool_size, connection_stats)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({'Accept-Encoding': ACCEPT_ENCODING, 'Connection': 'keep-alive'})
+
+    return adapter
@@ -0,0 +1,245 @@
+import logging
+import sys
+import threading
+import time
+from collections import deque
+from datetime import timedelta
+
+logger = logging.getLogger("irida-progress")
+
+PROGRESS_MODES = ['auto', 'bar', 'log', 'none']
+
+# How often (in seconds) progress is sampled (and the progress bar redrawn)
+TICK_INTERVAL = 1.0
+
+# Number of ticks over which the current throughput is measured
+RATE_WINDOW = 60
+
+BAR_WIDTH = 30
+
+
+class Progress(object):
+    """
+    Thread-safe counts of the projects and samples found and completed while loading results, updated by IridaAPI
+    and IridaSistrResults as listings are fetched and samples are loaded.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.projects_total = 0
+        self.projects_listed = 0
+        self.projects_done = 0
+        self.samples_total = 0
+        self.samples_done = 0
+
+    def add_projects(self, count):
+        """
+        Counts projects which will be loaded.
+
+        :param count: The number of projects.
+        """
+        with self._lock:
+            self.projects_total += count
+
+    def project_listed(self, sample_count):
+        """
+        Counts the samples of a project, once the samples in the project have been listed.
+
+        :param sample_count: The number of samples to load results for in the project.
+        """
+        with self._lock:
+            self.projects_listed += 1
+            self.samples_total += sample_count
+
+    def sample_done(self):
+        """Counts a sample whose results have been loaded."""
+        with self._lock:
+            self.samples_done += 1
+
+    def project_done(self):
+        """Counts a project whose results have been loaded."""
+        with self._lock:
+            self.projects_done += 1
+
+    def get_estimated_samples(self):
+        """
+        Estimates the total number of samples, from the samples in projects listed so far and the average number of
+        samples in those projects for the projects not yet listed.
+
+        :return: The estimated total number of samples.
+        """
+        with self._lock:
+            if self.projects_listed == 0 or self.projects_listed >= self.projects_total:
+                return self.samples_total
+            remaining_projects = self.projects_total - self.projects_listed
+            return self.samples_total + round(remaining_projects * self.samples_total / self.projects_listed)
+
+
+class ProgressReporter(object):
+    """
+    Reports the progress of loading results from a background thread, as a progress bar on a terminal or as periodic
+    log lines (e.g., when run from cron): samples completed, throughput, requests in flight, cache hit rate and an ETA.
+    """
+
+    def __init__(self, progress, request_metrics=None, cache=None, mode='auto', interval=60, stream=None,
+                 clock=time.monotonic):
+        """
+        Creates a new ProgressReporter (call start() to start reporting).
+
+        :param progress: The Progress to report.
+        :param request_metrics: The RequestMetrics of the connection to IRIDA (for requests in flight), or None.
+        :param cache: The IridaResponseCache (for the hit rate), or None.
+        :param mode: 'bar' for a progress bar, 'log' for log lines, 'auto' for a bar if the stream is a terminal
+                     (otherwise log lines) or 'none' to not report progress.
+        :param interval: The time (in seconds) between log lines.
+        :param stream: The stream to draw the progress bar on (default sys.stderr).
+        :param clock: A function returning the current time in seconds.
+        """
+        if mode not in PROGRESS_MODES:
+            raise ValueError("Invalid progress mode [{}], must be one of {}".format(mode, PROGRESS_MODES))
+
+        self.progress = progress
+        self.request_metrics = request_metrics
+        self.cache = cache
+        self.interval = interval
+        self.stream = stream if stream is not None else sys.stderr
+        if mode == 'auto':
+            mode = 'bar' if self.stream.isatty() else 'log'
+        self.mode = mode
+
+        self._clock = clock
+        self._start_time = clock()
+        self._last_log_time = self._start_time
+        self._samples = deque(maxlen=RATE_WINDOW)
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Starts reporting progress in a background thread."""
+        self._start_time = self._last_log_time = self._clock()
+        if self.mode != 'none':
+            self._thread = threading.Thread(target=self._run, name='irida-progress', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops reporting progress."""
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+            if self.mode == 'bar':
+                self.stream.write('\n')
+                self.stream.flush()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _run(self):
+        while not self._stop_event.wait(TICK_INTERVAL):
+            self.tick()
+        self.tick(final=True)
+
+    def tick(self, final=False):
+        """
+        Samples the progress and reports it (if it is time to do so).
+
+        :param final: Whether this is the last report of the run.
+        """
+        now = self._clock()
+        self._samples.append((now, self.progress.samples_done))
+        status = self.get_status()
+
+        if self.mode == 'bar':
+            self.stream.write('\r' + self.format_bar(status))
+            self.stream.flush()
+        elif self.mode == 'log' and (final or now - self._last_log_time >= self.interval):
+            self._last_log_time = now
+            logger.info(self.format_log_line(status))
+
+    def get_status(self):
+        """
+        Gets the current status of the run.
+
+        :return: A dictionary of the samples/projects done and total, throughput (samples/sec), requests in flight,
+                 cache hit rate and elapsed and estimated remaining time (in seconds, None if unknown).
+        """
+        progress = self.progress
+        samples_total = progress.get_estimated_samples()
+        samples_done = progress.samples_done
+
+        rate = None
+        if len(self._samples) >= 2:
+            (first_time, first_done), (last_time, last_done) = self._samples[0], self._samples[-1]
+            if last_time > first_time:
+                rate = (last_done - first_done) / (last_time - first_time)
+
+        eta = None
+        if rate and progress.projects_listed > 0:
+            eta = max(samples_total - samples_done, 0) / rate
+
+        return {
+            'projects_done': progress.projects_done,
+            'projects_total': progress.projects_total,
+            'samples_done': samples_done,
+            'samples_total': samples_total,
+            'rate': rate,
+            'in_flight': self.request_metrics.in_flight if self.request_metrics is not None else None,
+            'cache_hit_rate': self.cache.get_hit_rate() if self.cache is not None else None,
+            'elapsed': self._clock() - self._start_time,
+            'eta': eta,
+        }
+
+    def _format_duration(self, seconds):
+        return str(timedelta(seconds=round(seconds))) if seconds is not None else '?'
+
+    def _format_percent(self, done, total):
+        return '{:.1f}%'.format(100 * done / total) if total else '?'
+
+    def format_log_line(self, status):
+        """
+        Formats the status as a log line of key=value pairs.
+
+        :param status: The status, from get_status().
+        :return: The log line.
+        """
+        fields = [
+            ('samples', '{}/{}'.format(status['samples_done'], status['samples_total'])),
+            ('percent', self._format_percent(status['samples_done'], status['samples_total'])),
+            ('projects', '{}/{}'.format(status['projects_done'], status['projects_total'])),
+            ('rate', '{:.1f}/s'.format(status['rate']) if status['rate'] is not None else '?'),
+        ]
+        if status['in_flight'] is not None:
+            fields.append(('in_flight', status['in_flight']))
+        if status['cache_hit_rate'] is not None:
+            fields.append(('cache_hit_rate', '{:.1f}%'.format(status['cache_hit_rate'] * 100)))
+        fields.append(('elapsed', self._format_duration(status['elapsed'])))
+        fields.append(('eta', self._format_duration(status['eta'])))
+
+        return 'Progress: ' + ' '.join('{}={}'.format(key, value) for key, value in fields)
+
+    def format_bar(self, status):
+        """
+        Formats the status as a single-line progress bar.
+
+        :param status: The status, from get_status().
+        :return: The progress bar.
+        """
+        total = status['samples_total']
+        filled = min(BAR_WIDTH * status['samples_done'] // total, BAR_WIDTH) if total else 0
+        line = '[{}{}] {:>6} {}/{} samples, {}/{} projects'.format(
+            '#' * filled, '.' * (BAR_WIDTH - filled), self._format_percent(status['samples_done'], total),
+            status['samples_done'], total, status['projects_done'], status['projects_total'])
+        if status['rate'] is not None:
+            line += ', {:.1f}/s'.format(status['rate'])
+        if status['in_flight'] is not None:
+            line += ', {} in flight'.format(status['in_flight'])
+        if status['cache_hit_rate'] is not None:
+            line += ', cache {:.0f}%'.format(status['cache_hit_rate'] * 100)
+        line += ', ETA ' + self._format_duration(status['eta'])
+
+        # Pad to clear any longer line previously drawn
+        return line.ljust(100)
@@ -2,13 +2,88 @@ from datetime import datetime
 
 from irida_sistr_results.irida_sistr_workflow import IridaSistrWorkflow
 
+# Fields kept from the first SISTR prediction (all others are dropped)
+SISTR_PREDICTION_FIELDS = (
+    'serovar',
+    'serovar_antigen',
+    'serovar_cgmlst',
+    'serogroup',
+    'h1',
+    'h2',
+    'o_antigen',
+    'qc_messages',
+    'cgmlst_subspecies',
+    'cgmlst_genome_match',
+    'cgmlst_matching_alleles',
+    'cgmlst_ST',
+    'mash_subspecies',
+    'mash_serovar',
+    'mash_genome',
+    'mash_distance',
+)
+
+QC_STATUSES = ['MISSING', 'FAIL', 'WARNING', 'PASS']
+REPORTABLE_STATUSES = ['FAIL', 'PASS']
+
+
+def _to_datetime(timestamp):
+    return datetime.fromtimestamp(timestamp / 1000) if timestamp is not None else None
+
+
+def _to_timestamp(date):
+    return int(round(date.timestamp() * 1000)) if date is not None else None
+
 
 class SampleSistrInfo(object):
-    """Stores and provides access to SISTR/IRIDA information for a particular sample."""
+    """
+    Stores and provides access to SISTR/IRIDA information for a particular sample.
+
+    Only the fields written out to the results are kept from the IRIDA JSON (the sample, submission, paired files and
+    SISTR predictions), and the values used for sorting are computed once, so that a large number of these can be kept
+    in memory at once.
+    """
+
+    __slots__ = ('has_results', 'sample_id', 'sample_name', 'sample_created_date', 'paired_id',
+                 'submission_identifier', 'submission_workflow_id', 'submission_created_date', 'qc_status',
+                 'qc_status_numerical', 'reportable_serovar_status') + SISTR_PREDICTION_FIELDS
 
     def __init__(self, sistr_info, reportable_serovars):
-        self.sistr_info = sistr_info
-        self.reportable_serovars = reportable_serovars
+        """
+        Construct a new SampleSistrInfo.
+
+        :param sistr_info: A dictionary of the 'sample', 'submission', 'paired_files' and 'sistr_predictions' JSON
+                           from IRIDA, and whether or not the sample 'has_results'.
+        :param reportable_serovars: A list of serovars considered as reportable.
+        """
+        self.has_results = sistr_info['has_results']
+
+        sample = sistr_info.get('sample')
+        if sample is not None:
+            self.sample_id = sample.get('identifier')
+            self.sample_name = sample.get('sampleName')
+            self.sample_created_date = _to_datetime(sample.get('createdDate'))
+        else:
+            self.sample_id = self.sample_name = self.sample_created_date = None
+
+        submission = sistr_info.get('submission') or {}
+        self.submission_identifier = submission.get('identifier')
+        self.submission_workflow_id = submission.get('workflowId')
+        self.submission_created_date = _to_datetime(submission.get('createdDate'))
+
+        paired_files = sistr_info.get('paired_files')
+        self.paired_id = paired_files[0]['identifier'] if self.has_results and paired_files else None
+
+        sistr = sistr_info['sistr_predictions'][0] if self.has_results else {}
+        for field in SISTR_PREDICTION_FIELDS:
+            setattr(self, field, sistr.get(field))
+
+        self.qc_status = sistr['qc_status'] if self.has_results else 'MISSING'
+        self.qc_status_numerical = QC_STATUSES.index(self.qc_status)
+
+        if self.has_results and self.qc_status == 'PASS' and self.serovar in reportable_serovars:
+            self.reportable_serovar_status = 'PASS'
+        else:
+            self.reportable_serovar_status = 'FAIL'
 
     @classmethod
     def create_empty_info(cls, sample, sequencing_object=None):
@@ -29,77 +104,111 @@ class SampleSistrInfo(object):
 
         return cls(data, reportable_serovars)
 
+    @classmethod
+    def from_dict(cls, data, reportable_serovars):
+        """
+        Creates a SampleSistrInfo object from the dictionary form created by to_dict().
+        :param data: The dictionary.
+        :param reportable_serovars: A list of serovars considered as reportable.
+        :return: The SampleSistrInfo.
+        """
+        return cls(data, reportable_serovars)
+
+    def to_dict(self):
+        """
+        Gets a JSON-serializable dictionary form of this SampleSistrInfo, which can be loaded with from_dict().
+        :return: A dictionary.
+        """
+        data = {
+            'has_results': self.has_results,
+            'sample': None
+        }
+
+        if self.sample_id is not None:
+            data['sample'] = {
+                'identifier': self.sample_id,
+                'sampleName': self.sample_name,
+                'createdDate': _to_timestamp(self.sample_created_date)
+            }
+
+        if self.has_results:
+            sistr = {field: getattr(self, field) for field in SISTR_PREDICTION_FIELDS}
+            sistr['qc_status'] = self.qc_status
+
+            data['submission'] = {
+                'identifier': self.submission_identifier,
+                'workflowId': self.submission_workflow_id,
+                'createdDate': _to_timestamp(self.submission_created_date)
+            }
+            data['paired_files'] = [{'identifier': self.paired_id}]
+            data['sistr_predictions'] = [sistr]
+
+        return data
+
     def has_sistr_results(self):
-        return self.sistr_info['has_results']
+        return self.has_results
 
     def get_sample_name(self):
-        if (self.sistr_info['sample'] is not None):
-            return self.sistr_info['sample']['sampleName']
+        if (self.sample_name is not None):
+            return self.sample_name
         else:
             return "N/A"
 
-    def _get_sistr(self):
-        return self.sistr_info['sistr_predictions'][0]
-
     def get_serovar(self):
-        return self._get_sistr()['serovar']
+        return self.serovar
 
     def get_serovar_antigen(self):
-        return self._get_sistr()['serovar_antigen']
+        return self.serovar_antigen
 
     def get_serovar_cgmlst(self):
-        serovar_cgmlst = self._get_sistr()['serovar_cgmlst']
-        if (serovar_cgmlst is None):
+        if (self.serovar_cgmlst is None):
             return ''
         else:
-            return serovar_cgmlst
+            return self.serovar_cgmlst
 
     def get_reportable_serovar_status(self):
-        if self.has_sistr_results() and self.is_qc_pass() and self.get_serovar() in self.reportable_serovars:
-            return 'PASS'
-        else:
-            return 'FAIL'
+        return self.reportable_serovar_status
 
     def is_reportable_serovar(self):
-        return self.get_reportable_serovar_status() == 'PASS'
+        return self.reportable_serovar_status == 'PASS'
 
     def get_reportable_status_numerical(self):
         """Gets numerical value of reportable status, used for sorting"""
-        return ['FAIL', 'PASS'].index(self.get_reportable_serovar_status())
+        return REPORTABLE_STATUSES.index(self.reportable_serovar_status)
 
     def get_serogroup(self):
-        return self._get_sistr()['serogroup']
+        return self.serogroup
 
     def get_h1(self):
-        return self._get_sistr()['h1']
+        return self.h1
 
     def get_h2(self):
-        return self._get_sistr()['h2']
+        return self.h2
 
     def get_o_antigen(self):
-        return self._get_sistr()['o_antigen']
+        return self.o_antigen
 
     def is_qc_pass(self):
-        return self.get_qc_status() == 'PASS'
+        return self.qc_status == 'PASS'
 
     def get_qc_status(self):
-        return 'MISSING' if (not self.has_sistr_results()) else self._get_sistr()['qc_status']
+        return self.qc_status
 
     def get_qc_status_numerical(self):
         """Gets numerical value for QC status, used for sorting"""
-        return ['MISSING', 'FAIL', 'WARNING', 'PASS'].index(self.get_qc_status())
+        return self.qc_status_numerical
 
     def get_qc_messages(self):
-        return self._get_sistr()['qc_messages']
+        return self.qc_messages
 
     def get_cgmlst_subspecies(self):
-        return self._get_sistr()['cgmlst_subspecies']
+        return self.cgmlst_subspecies
 
     def get_cgmlst_genome(self):
-        return self._get_sistr()['cgmlst_genome_match']
+        return self.cgmlst_genome_match
 
     def get_cgmlst_matching_alleles(self):
-        return self._get_sistr()['cgmlst_matching_alleles']
+        return self.cgmlst_matching_alleles
 
     def get_cgmlst_matching_total_alleles(self):
         return str(self.get_cgmlst_matching_alleles()) + '/330'
@@ -108,19 +217,19 @@ class SampleSistrInfo(object):
         return float(self.get_cgmlst_matching_alleles()) / 330
 
     def get_cgmlst_sequence_type(self):
-        return self._get_sistr()['cgmlst_ST']
+        return self.cgmlst_ST
 
     def get_mash_subspecies(self):
-        return self._get_sistr()['mash_subspecies']
+        return self.mash_subspecies
 
     def get_mash_serovar(self):
-        return self._get_sistr()['mash_serovar']
+        return self.mash_serovar
 
     def get_mash_genome(self):
-        return self._get_sistr()['mash_genome']
+        return self.mash_genome
 
     def get_mash_distance(self):
-        return self._get_sistr()['mash_distance']
+        return self.mash_distance
 
     def get_submission_url(self, irida_base_url):
         submission_url = irida_base_url
@@ -133,28 +242,28 @@ class SampleSistrInfo(object):
         return submission_url
 
     def get_submission_identifier(self):
-        return self.sistr_info['submission']['identifier']
+        return self.submission_identifier
 
     def get_submission_workflow_id(self):
-        return self.sistr_info['submission']['workflowId']
+        return self.submission_workflow_id
 
     def get_submission_workflow_version(self):
         return IridaSistrWorkflow.workflow_id_to_version(self.get_submission_workflow_id())
 
     def get_submission_created_date(self):
-        return datetime.fromtimestamp(self.sistr_info['submission']['createdDate'] / 1000)
+        return self.submission_created_date
 
     def get_sample_created_date(self):
-        if (self.sistr_info['sample'] is not None):
-            return datetime.fromtimestamp(self.sistr_info['sample']['createdDate'] / 1000)
+        if (self.sample_id is not None):
+            return self.sample_created_date
         else:
             return "N/A"
 
     def get_sample_id(self):
-        if (self.sistr_info['sample'] is not None):
-            return self.sistr_info['sample']['identifier']
+        if (self.sample_id is not None):
+            return self.sample_id
         else:
             return "N/A"
 
     def get_paired_id(self):
-        return self.sistr_info['paired_files'][0]['identifier']
+        return self.paired_id
@@ -1,13 +1,91 @@
 import abc
 import csv
+import gzip
+import io
+import json
+import sqlite3
 from collections import OrderedDict
 from datetime import datetime
-from operator import methodcaller
 
 import xlsxwriter
 
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from irida_sistr_results import tracing
+from irida_sistr_results.SistrResultsException import SistrResultsException
 from irida_sistr_results.version import __version__
 
+# A name (without spaces or punctuation) for the column of each header title, used by formats with named fields
+COLUMN_NAMES = OrderedDict([
+    ('Project ID', 'project_id'),
+    ('Sample Name', 'sample_name'),
+    ('Reportable Serovar Status', 'reportable_serovar_status'),
+    ('QC Status', 'qc_status'),
+    ('Serovar (overall)', 'serovar'),
+    ('Serovar (antigen)', 'serovar_antigen'),
+    ('Serovar (cgMLST)', 'serovar_cgmlst'),
+    ('Serogroup', 'serogroup'),
+    ('H1', 'h1'),
+    ('H2', 'h2'),
+    ('O-antigen', 'o_antigen'),
+    ('cgMLST Subspecies', 'cgmlst_subspecies'),
+    ('cgMLST Matching Genome', 'cgmlst_genome_match'),
+    ('Alleles Matching Genome', 'cgmlst_matching_alleles'),
+    ('cgMLST Percent Matching', 'cgmlst_matching_proportion'),
+    ('cgMLST Sequence Type', 'cgmlst_st'),
+    ('Mash Subspecies', 'mash_subspecies'),
+    ('Mash Serovar', 'mash_serovar'),
+    ('Mash Matching Genome Name', 'mash_genome'),
+    ('Mash Distance', 'mash_distance'),
+    ('QC Messages', 'qc_messages'),
+    ('IRIDA URL', 'irida_url'),
+    ('Sample Created Date', 'sample_created_date'),
+    ('IRIDA Sample Identifier', 'sample_id'),
+    ('IRIDA File Pair Identifier', 'paired_id'),
+    ('IRIDA Submission Identifier', 'submission_id'),
+    ('IRIDA Analysis Date', 'analysis_date'),
+    ('IRIDA Workflow Version', 'workflow_version'),
+    ('IRIDA Workflow ID', 'workflow_id'),
+])
+
+
+def can_open_text_file(out_file):
+    """
+    Whether or not the packages needed to write to a text file with the compression given by its extension are
+    installed.
+
+    :param out_file: The file name.
+    :return: True if open_text_file() can write to this file, False otherwise.
+    """
+    return not out_file.endswith('.zst') or zstandard is not None
+
+
+def open_text_file(out_file):
+    """
+    Opens a text file for writing, compressing it with gzip (a '.gz' extension) or zstd (a '.zst' extension).
+
+    :param out_file: The file name.
+    :return: The file object.
+    """
+    if out_file.endswith('.gz'):
+        return gzip.open(out_file, 'wt')
+    elif out_file.endswith('.zst'):
+        if zstandard is None:
+            raise ImportError("Writing zstd compressed files requires the 'zstandard' package, please install it with "
+                              "'pip install irida-sistr-results[zstd]'")
+        return io.TextIOWrapper(zstandard.ZstdCompressor().stream_writer(open(out_file, 'wb')))
+    else:
+        return open(out_file, 'w')
+
 
 class SistrResultsWriter(object):
     """Abstract class resonsible for writing SISTR results to a table format"""
@@ -118,6 +196,16 @@ class SistrResultsWriter(object):
 
         return header_list
 
+    def _get_column_name(self, title):
+        """
+        Gets the name of a column, for formats with named fields.
+
+        :param title: The title of the header column.
+
+        :return: The column name.
+        """
+        return COLUMN_NAMES[title]
+
     def _format_timestamp(self, timestamp):
         return timestamp.isoformat(sep=' ')
 
@@ -250,38 +338,91 @@ class SistrResultsWriter(object):
         Writes out the results to an appropriate file with the appropriate format
 
         :param sistr_results:  The SISTR results to write to a table.
+        :return: None
+        """
+        self.begin()
+
+        for project in sorted(sistr_results.keys(), key=int):
+            self.write_project(project, sistr_results[project])
+
+        self.finish()
+
+    def begin(self):
+        """
+        Starts writing results (to be followed by write_project() for each project, in order, and then finish()).
+
         :return: None
         """
         self.set_row(0)
         self._write_header(self._get_header_list())
         self.set_row(1)
 
-        for project in sorted(sistr_results.keys(), key=int):
-            row_start_project = self.get_row()
+    def write_project(self, project, sistr_results_project):
+        """
+        Writes out the results for a single project.
 
-            sistr_results_project = sistr_results[project]
+        :param project:  The project identifier.
+        :param sistr_results_project:  The SISTR results for the project, as a dictionary of {sample id: result}.
+        :return: None
+        """
+        with tracing.span('write_project', project=project, writer=type(self).__name__):
+            self.write_project_rows(self._get_project_rows(project, sistr_results_project))
 
-            sistr_results_sorted = sorted(sistr_results_project.values(), key=methodcaller('get_sample_name'))
-            sistr_results_sorted = sorted(sistr_results_sorted, key=methodcaller('get_qc_status_numerical'),
-                                          reverse=True)
+    def write_project_rows(self, rows):
+        """
+        Writes out the rows of results for a single project, as created by _get_project_rows().
 
-            if self.include_reportable_status:
-                sistr_results_sorted = sorted(sistr_results_sorted, key=methodcaller('get_reportable_status_numerical'),
-                                              reverse=True)
+        :param rows:  The list of rows for the project, in the order to write them.
+        :return: None
+        """
+        for index, row in enumerate(rows):
+            # last element in this list
+            if (index == len(rows) - 1):
+                self._set_end_of_project(True)
+
+            self._write_row(self._format_row(row))
+            self.set_row(self.get_row() + 1)
+
+        self._set_end_of_project(False)
+
+    def _get_project_rows(self, project, sistr_results_project):
+        """
+        Sorts the results for a project (by reportable status, QC status and sample name) and creates a row for each.
+
+        :param project:  The project identifier.
+        :param sistr_results_project:  The SISTR results for the project, as a dictionary of {sample id: result}.
+        :return: A list of rows (tuples of values, in the order of the header list).
+        """
+        if self.include_reportable_status:
+            sort_key = lambda result: (-result.get_reportable_status_numerical(), -result.get_qc_status_numerical(),
+                                       result.get_sample_name())
+        else:
+            sort_key = lambda result: (-result.get_qc_status_numerical(), result.get_sample_name())
+
+        rows = []
+        for result in sorted(sistr_results_project.values(), key=sort_key):
+            if (not result.has_sistr_results()):
+                rows.append(tuple(self._get_no_results_row_list(project, result)))
+            else:
+                rows.append(tuple(self._get_row_list(project, result)))
 
-            for index, result in enumerate(sistr_results_sorted):
-                # last element in this list
-                if (index == len(sistr_results_sorted) - 1):
-                    self._set_end_of_project(True)
+        return rows
 
-                if (not result.has_sistr_results()):
-                    self._write_row(self._get_no_results_row_list(project, result))
-                else:
-                    self._write_row(self._get_row_list(project, result))
-                self.set_row(self.get_row() + 1)
+    def _format_row(self, row):
+        """
+        Override to convert the values of a row of results before writing it.
+
+        :param row: The row (tuple of values).
+        :return: The row to write.
+        """
+        return row
 
-            self._set_end_of_project(False)
+    def finish(self):
+        """
+        Finishes writing results, after all projects have been written.
 
+        :return: None
+        """
         self._formatting()
         self._finish()
 
@@ -293,8 +434,9 @@ class SistrCsvWriter(SistrResultsWriter):
                  sample_created_min_date=None):
         super(SistrCsvWriter, self).__init__(irida_url, appname, command_line, username, include_reportable_status,
                                              sample_created_min_date)
-        out_file_h = open(out_file, 'w')
-        self.writer = csv.writer(out_file_h, delimiter="\t", quotechar='"', quoting=csv.QUOTE_MINIMAL)
+        self.out_file_h = open_text_file(out_file)
+        self.writer = csv.writer(self.out_file_h, delimiter="\t", quotechar='"', quoting=csv.QUOTE_MINIMAL)
+        self.index_of_cgmlst_percent = self._get_header_index('cgMLST Percent Matching')
 
     def _write_header(self, header):
         run_info = self._get_irida_sistr_run_info()
@@ -314,61 +456,70 @@ class SistrCsvWriter(SistrResultsWriter):
     def _write_row(self, row):
         self.writer.writerow(row)
 
-    def _get_row_list(self, project, result):
-        row_list = [
-            project,
-            result.get_sample_name()
-        ]
-
-        if self.include_reportable_status:
-            row_list.append(result.get_reportable_serovar_status())
+    def close(self):
+        """Closes the file"""
+        self.out_file_h.close()
 
-        row_list.extend([
-            result.get_qc_status(),
-            result.get_serovar(),
-            result.get_serovar_antigen(),
-            result.get_serovar_cgmlst(),
-            result.get_serogroup(),
-            result.get_h1(),
-            result.get_h2(),
-            result.get_o_antigen(),
-            result.get_cgmlst_subspecies(),
-            result.get_cgmlst_genome(),
-            result.get_cgmlst_matching_alleles(),
-            "{0:.1f}".format(result.get_cgmlst_matching_proportion() * 100) + '%',
-            result.get_cgmlst_sequence_type(),
-            result.get_mash_subspecies(),
-            result.get_mash_serovar(),
-            result.get_mash_genome(),
-            result.get_mash_distance(),
-            result.get_qc_messages(),
-            result.get_submission_url(self.irida_url),
-            result.get_sample_created_date(),
-            result.get_sample_id(),
-            result.get_paired_id(),
-            result.get_submission_identifier(),
-            result.get_submission_created_date(),
-            result.get_submission_workflow_version(),
-            result.get_submission_workflow_id(),
-        ])
+    def _format_row(self, row):
+        proportion = row[self.index_of_cgmlst_percent]
+        if proportion is None:
+            return row
 
-        return row_list
+        row = list(row)
+        row[self.index_of_cgmlst_percent] = "{0:.1f}".format(proportion * 100) + '%'
+        return row
 
 
 class SistrExcelWriter(SistrResultsWriter):
     """A writer object for writing SISTR results to an excel spreadsheet"""
 
     def __init__(self, irida_url, appname, command_line, username, out_file, include_reportable_status=True,
-                 sample_created_min_date=None):
+                 sample_created_min_date=None, constant_memory=False):
+        """
+        Construct a new SistrExcelWriter.
+
+        :param out_file: The excel file to write to.
+        :param constant_memory: Whether to flush each row to disk once the next row is started (xlsxwriter's
+                                'constant_memory' mode), instead of keeping the whole worksheet in memory. Cells must
+                                then be written strictly row by row, as any written to an earlier row are dropped.
+        """
         super(SistrExcelWriter, self).__init__(irida_url, appname, command_line, username, include_reportable_status,
                                                sample_created_min_date)
-        self.workbook = xlsxwriter.Workbook(out_file, {'default_date_format': 'yyyy/mm/dd'})
+        self.workbook = xlsxwriter.Workbook(out_file, {'default_date_format': 'yyyy/mm/dd',
+                                                       'constant_memory': constant_memory})
         self.worksheet = self.workbook.add_worksheet('Data')
         self.index_of_cgmlst_percent = self._get_header_list().index('cgMLST Percent Matching')
         self.index_of_date_formats = [self._get_header_list().index('Sample Created Date'),
                                       self._get_header_list().index('IRIDA Analysis Date')
                                       ]
+
+        # Formats are created once and shared by all cells, rather than creating a new format for every cell
         self.percent_format = self.workbook.add_format({'num_format': '0.0%'})
+        self.percent_bottom_format = self.workbook.add_format({'num_format': '0.0%', 'bottom': 5})
+        self.date_format = self.workbook.add_format({'num_format': 'yyyy/mm/dd'})
+        self.date_bottom_format = self.workbook.add_format({'num_format': 'yyyy/mm/dd', 'bottom': 5})
+        self.regular_format = self.workbook.add_format()
+        self.regular_bottom_format = self.workbook.add_format({'bottom': 5})
+        self.bottom_row_format = self.workbook.add_format({'bottom': 5})
+
+        # The format of each column, indexed by whether or not the row is the end of a project
+        self.column_formats = {
+            end_of_project: self._get_column_formats(end_of_project) for end_of_project in [False, True]
+        }
+
+    def _get_column_formats(self, end_of_project):
+        self._set_end_of_project(end_of_project)
+        column_formats = []
+        for col in range(len(self._get_header_list())):
+            if col == self.index_of_cgmlst_percent:
+                column_formats.append(self._get_percent_format())
+            elif col in self.index_of_date_formats:
+                column_formats.append(self._get_date_format())
+            else:
+                column_formats.append(self._get_regular_format())
+        self._set_end_of_project(False)
+
+        return column_formats
 
     def _get_header_column_number(self, title):
         """
@@ -449,40 +600,35 @@ class SistrExcelWriter(SistrResultsWriter):
         self.worksheet.set_column(self._range_title('Mash Matching Genome Name', 'IRIDA Analysis Date'), 30)
 
     def _write_row(self, row):
-        col = 0
-        for item in row:
-            if col == self.index_of_cgmlst_percent:
-                self.worksheet.write(self.get_row(), col, item, self._get_percent_format())
-            elif col in self.index_of_date_formats:
-                self.worksheet.write(self.get_row(), col, item, self._get_date_format())
-            else:
-                self.worksheet.write(self.get_row(), col, item, self._get_regular_format())
-            col += 1
+        # Rows are written one at a time, in order, as required by constant_memory mode
+        row_number = self.get_row()
+        column_formats = self.column_formats[self._is_end_of_project()]
+        for col, item in enumerate(row):
+            self.worksheet.write(row_number, col, item, column_formats[col])
 
         if self._is_end_of_project():
-            bottom_format = self.workbook.add_format({'bottom': 5})
-            self.worksheet.set_row(self.get_row(), None, bottom_format)
+            self.worksheet.set_row(row_number, None, self.bottom_row_format)
 
     def _get_percent_format(self):
         if (self._is_end_of_project()):
-            return self.workbook.add_format({'num_format': '0.0%', 'bottom': 5})
+            return self.percent_bottom_format
         else:
-            return self.workbook.add_format({'num_format': '0.0%'})
+            return self.percent_format
 
     def _get_date_format(self):
         if (self._is_end_of_project()):
-            return self.workbook.add_format({'num_format': 'yyyy/mm/dd', 'bottom': 5})
+            return self.date_bottom_format
         else:
             return self._get_default_date_format()
 
     def _get_default_date_format(self):
-        return self.workbook.add_format({'num_format': 'yyyy/mm/dd'})
+        return self.date_format
 
     def _get_regular_format(self):
         if (self._is_end_of_project()):
-            return self.workbook.add_format({'bottom': 5})
+            return self.regular_bottom_format
         else:
-            return self.workbook.add_format()
+            return self.regular_format
 
     def _formatting(self):
         format_pass = self.workbook.add_format({'bg_color': '#DFF0D8'})
@@ -546,3 +692,321 @@ class SistrExcelWriter(SistrResultsWriter):
     def close(self):
         """Closes the workbook"""
         self.workbook.close()
+
+
+class SistrJsonLinesWriter(SistrResultsWriter):
+    """A writer object for writing SISTR results as JSON Lines, one JSON object per sample"""
+
+    def __init__(self, irida_url, appname, command_line, username, out_file, include_reportable_status=True,
+                 sample_created_min_date=None):
+        """
+        Construct a new SistrJsonLinesWriter.
+
+        :param out_file: The file to write to (compressed if it ends with '.gz' or '.zst').
+        """
+        super(SistrJsonLinesWriter, self).__init__(irida_url, appname, command_line, username,
+                                                   include_reportable_status, sample_created_min_date)
+        self.out_file_h = open_text_file(out_file)
+        self.columns = [self._get_column_name(title) for title in self._get_header_list()]
+
+    def _write_header(self, header):
+        """There is no header, each object contains the names of the columns"""
+        return
+
+    def _format_value(self, value):
+        return self._format_timestamp(value) if isinstance(value, datetime) else value
+
+    def _write_row(self, row):
+        self.out_file_h.write(json.dumps(OrderedDict(zip(self.columns, map(self._format_value, row)))))
+        self.out_file_h.write('\n')
+
+    def write_project_rows(self, rows):
+        super(SistrJsonLinesWriter, self).write_project_rows(rows)
+        # Make the results of each project available to readers as soon as they are written
+        self.out_file_h.flush()
+
+    def close(self):
+        """Closes the file"""
+        self.out_file_h.close()
+
+
+class SistrParquetWriter(SistrResultsWriter):
+    """A writer object for writing SISTR results to an Apache Parquet file, with a typed column for each header"""
+
+    # Columns which are not stored as strings, all others are stored as (dictionary encoded) strings if listed in
+    # CATEGORICAL_COLUMNS or as plain strings otherwise
+    INTEGER_COLUMNS = ['Project ID', 'Alleles Matching Genome', 'IRIDA Sample Identifier',
+                       'IRIDA File Pair Identifier', 'IRIDA Submission Identifier']
+    FLOAT_COLUMNS = ['cgMLST Percent Matching', 'Mash Distance']
+    TIMESTAMP_COLUMNS = ['Sample Created Date', 'IRIDA Analysis Date']
+    CATEGORICAL_COLUMNS = ['Reportable Serovar Status', 'QC Status', 'Serovar (overall)', 'Serovar (antigen)',
+                           'Serovar (cgMLST)', 'Serogroup', 'H1', 'H2', 'O-antigen', 'cgMLST Subspecies',
+                           'Mash Subspecies', 'Mash Serovar', 'IRIDA Workflow Version', 'IRIDA Workflow ID']
+
+    def __init__(self, irida_url, appname, command_line, username, out_file, include_reportable_status=True,
+                 sample_created_min_date=None, row_group_size=100000):
+        """
+        Construct a new SistrParquetWriter.
+
+        :param out_file: The Parquet file to write to.
+        :param row_group_size: The number of rows to buffer before writing them out as a row group.
+        """
+        if not self.is_available():
+            raise ImportError("Writing Parquet files requires the 'pyarrow' package, please install it with "
+                              "'pip install irida-sistr-results[parquet]'")
+
+        super(SistrParquetWriter, self).__init__(irida_url, appname, command_line, username,
+                                                 include_reportable_status, sample_created_min_date)
+        self.row_group_size = row_group_size
+        self.rows = []
+
+        self.schema = self._get_schema()
+        self.parquet_writer = pyarrow.parquet.ParquetWriter(out_file, self.schema)
+
+    @classmethod
+    def is_available(cls):
+        """Whether or not the 'pyarrow' package needed to write Parquet files is installed"""
+        return pyarrow is not None
+
+    def _get_column_type(self, title):
+        if title in self.INTEGER_COLUMNS:
+            return pyarrow.int64()
+        elif title in self.FLOAT_COLUMNS:
+            return pyarrow.float64()
+        elif title in self.TIMESTAMP_COLUMNS:
+            return pyarrow.timestamp('ms')
+        elif title in self.CATEGORICAL_COLUMNS:
+            return pyarrow.dictionary(pyarrow.int32(), pyarrow.string())
+        else:
+            return pyarrow.string()
+
+    def _get_schema(self):
+        """
+        Gets the schema of the Parquet file, including the run information as file metadata.
+
+        :return: The pyarrow.Schema.
+        """
+        metadata = {}
+        for k, v in self._get_irida_sistr_run_info().items():
+            metadata[k] = self._format_timestamp(v) if isinstance(v, datetime) else str(v)
+
+        return pyarrow.schema([(title, self._get_column_type(title)) for title in self._get_header_list()],
+                              metadata=metadata)
+
+    def _to_column(self, values, column_type):
+        """
+        Converts a list of values from the rows of results into a column of the given type.
+
+        :param values: The list of values.
+        :param column_type: The pyarrow.DataType of the column.
+        :return: The pyarrow.Array.
+        """
+        if pyarrow.types.is_integer(column_type):
+            values = [int(v) if isinstance(v, int) or (isinstance(v, str) and v.isdigit()) else None for v in values]
+        elif pyarrow.types.is_floating(column_type):
+            values = [float(v) if v is not None else None for v in values]
+        elif pyarrow.types.is_timestamp(column_type):
+            values = [v if isinstance(v, datetime) else None for v in values]
+        else:
+            values = [str(v) if v is not None else None for v in values]
+
+        if pyarrow.types.is_dictionary(column_type):
+            return pyarrow.array(values, type=column_type.value_type).dictionary_encode()
+        else:
+            return pyarrow.array(values, type=column_type)
+
+    def _write_header(self, header):
+        """The header is written as the schema of the file"""
+        return
+
+    def _write_row(self, row):
+        self.rows.append(row)
+
+        if len(self.rows) >= self.row_group_size:
+            self._write_row_group()
+
+    def _write_row_group(self):
+        if not self.rows:
+            return
+
+        columns = [self._to_column(list(values), column_type)
+                   for values, column_type in zip(zip(*self.rows), self.schema.types)]
+        self.parquet_writer.write_table(pyarrow.Table.from_arrays(columns, schema=self.schema))
+        self.rows = []
+
+    def _finish(self):
+        self._write_row_group()
+
+    def close(self):
+        """Closes the Parquet file"""
+        self.parquet_writer.close()
+
+
+class SistrSqliteWriter(SistrResultsWriter):
+    """
+    A writer object for storing SISTR results in a SQLite database, with one row per (project, sample).
+
+    Writing to an existing database updates it in place: a sample's stored result is only replaced by a better one,
+    using the same rules as IridaAPI._update_sample_sistr_info (any result replaces a missing one, and a PASS result
+    replaces one which did not pass or a PASS from an older analysis).
+    """
+
+    # The SQLite type of each column
+    COLUMN_TYPES = {
+        'project_id': 'INTEGER NOT NULL',
+        'sample_name': 'TEXT',
+        'reportable_serovar_status': 'TEXT',
+        'qc_status': 'TEXT NOT NULL',
+        'serovar': 'TEXT',
+        'serovar_antigen': 'TEXT',
+        'serovar_cgmlst': 'TEXT',
+        'serogroup': 'TEXT',
+        'h1': 'TEXT',
+        'h2': 'TEXT',
+        'o_antigen': 'TEXT',
+        'cgmlst_subspecies': 'TEXT',
+        'cgmlst_genome_match': 'TEXT',
+        'cgmlst_matching_alleles': 'INTEGER',
+        'cgmlst_matching_proportion': 'REAL',
+        'cgmlst_st': 'INTEGER',
+        'mash_subspecies': 'TEXT',
+        'mash_serovar': 'TEXT',
+        'mash_genome': 'TEXT',
+        'mash_distance': 'REAL',
+        'qc_messages': 'TEXT',
+        'irida_url': 'TEXT',
+        'sample_created_date': 'TEXT',
+        'sample_id': 'INTEGER NOT NULL',
+        'paired_id': 'INTEGER',
+        'submission_id': 'INTEGER',
+        'analysis_date': 'TEXT',
+        'workflow_version': 'TEXT',
+        'workflow_id': 'TEXT',
+    }
+
+    INDEXED_COLUMNS = ['serovar', 'qc_status', 'cgmlst_st', 'sample_created_date']
+
+    RUN_INFO_COLUMNS = ['appname', 'version', 'command_line', 'irida_url', 'username', 'app_run_date',
+                        'sample_created_min_date']
+
+    def __init__(self, irida_url, appname, command_line, username, out_file, include_reportable_status=True,
+                 sample_created_min_date=None):
+        """
+        Construct a new SistrSqliteWriter.
+
+        :param out_file: The SQLite database file to write to (created if it does not exist).
+        """
+        super(SistrSqliteWriter, self).__init__(irida_url, appname, command_line, username,
+                                                include_reportable_status, sample_created_min_date)
+        self.run_id = None
+        self.columns = [self._get_column_name(title) for title in self._get_header_list()] + ['run_id']
+        self.index_of_date_formats = [self._get_header_index('Sample Created Date'),
+                                      self._get_header_index('IRIDA Analysis Date')]
+        self.upsert_statement = self._get_upsert_statement()
+
+        self._connection = sqlite3.connect(out_file)
+        self._create_tables()
+
+    def _create_tables(self):
+        column_definitions = ', '.join(column + ' ' + self.COLUMN_TYPES[column] for column in COLUMN_NAMES.values())
+        self._connection.execute('CREATE TABLE IF NOT EXISTS runs (run_id INTEGER PRIMARY KEY, ' +
+                                 ', '.join(column + ' TEXT' for column in self.RUN_INFO_COLUMNS) + ')')
+        self._connection.execute('CREATE TABLE IF NOT EXISTS results (' + column_definitions +
+                                 ', run_id INTEGER NOT NULL REFERENCES runs (run_id), '
+                                 'PRIMARY KEY (project_id, sample_id))')
+        for column in self.INDEXED_COLUMNS:
+            self._connection.execute('CREATE INDEX IF NOT EXISTS results_{0} ON results ({0})'.format(column))
+        self._connection.commit()
+
+    def _get_upsert_statement(self):
+        """
+        Gets the statement inserting a row of results, or replacing the existing result for the same project and
+        sample if the new result is better.
+
+        :return: The SQL statement.
+        """
+        updates = ', '.join('{0} = excluded.{0}'.format(column) for column in self.columns
+                            if column not in ['project_id', 'sample_id'])
+
+        return ('INSERT INTO results (' + ', '.join(self.columns) + ') ' +
+                'VALUES (' + ', '.join(['?'] * len(self.columns)) + ') ' +
+                'ON CONFLICT (project_id, sample_id) DO UPDATE SET ' + updates + ' ' +
+                "WHERE results.qc_status = 'MISSING' "
+                "OR (excluded.qc_status = 'PASS' AND results.qc_status != 'PASS') "
+                "OR (excluded.qc_status = 'PASS' AND excluded.analysis_date > results.analysis_date)")
+
+    def _write_header(self, header):
+        """Records the information about this run in the runs table"""
+        run_info = self._get_irida_sistr_run_info()
+        values = [run_info.get(column) for column in self.RUN_INFO_COLUMNS]
+        values = [self._format_timestamp(v) if isinstance(v, datetime) else v for v in values]
+
+        cursor = self._connection.execute('INSERT INTO runs (' + ', '.join(self.RUN_INFO_COLUMNS) + ') ' +
+                                          'VALUES (' + ', '.join(['?'] * len(values)) + ')', values)
+        self.run_id = cursor.lastrowid
+
+    def _format_row(self, row):
+        row = list(row)
+        for index in self.index_of_date_formats:
+            if isinstance(row[index], datetime):
+                row[index] = self._format_timestamp(row[index])
+        row.append(self.run_id)
+
+        return row
+
+    def _write_row(self, row):
+        self._connection.execute(self.upsert_statement, row)
+
+    def write_project_rows(self, rows):
+        super(SistrSqliteWriter, self).write_project_rows(rows)
+        self._connection.commit()
+
+    def _finish(self):
+        self._connection.commit()
+
+    def close(self):
+        """Closes the database"""
+        self._connection.close()
+
+
+class SistrMultiWriter(SistrResultsWriter):
+    """A writer which creates the rows of SISTR results once and writes them out to several other writers"""
+
+    def __init__(self, writers):
+        """
+        Construct a new SistrMultiWriter.
+
+        :param writers: The list of SistrResultsWriter to write to, which must all use the same IRIDA URL and
+                        reportable status setting (and so have the same rows).
+        """
+        first_writer = writers[0]
+        super(SistrMultiWriter, self).__init__(first_writer.irida_url, first_writer.appname,
+                                               first_writer.command_line, first_writer.username,
+                                               first_writer.include_reportable_status,
+                                               first_writer.sample_created_min_date)
+
+        for writer in writers:
+            if (writer.irida_url != self.irida_url or
+                    writer.include_reportable_status != self.include_reportable_status):
+                raise SistrResultsException("Cannot write the same rows to writers with different settings")
+
+        self.writers = writers
+
+    def begin(self):
+        for writer in self.writers:
+            writer.begin()
+
+    def write_project(self, project, sistr_results_project):
+        with tracing.span('write_project', project=project, writer=type(self).__name__):
+            rows = self._get_project_rows(project, sistr_results_project)
+            for writer in self.writers:
+                writer.write_project_rows(rows)
+
+    def finish(self):
+        for writer in self.writers:
+            writer.finish()
+
+    def close(self):
+        """Closes all the writers"""
+        for writer in self.writers:
+            writer.close()
@@ -0,0 +1,8 @@
+"""
+A local stand-in for an IRIDA server, serving synthetic SISTR results, for end-to-end and load testing.
+
+Run with 'python -m irida_sistr_results.tests.mock_irida --help'.
+"""
+
+from irida_sistr_results.tests.mock_irida.data import MockIridaData
+from irida_sistr_results.tests.mock_irida.server import MockIridaServer
@@ -0,0 +1,51 @@
+import argparse
+
+from irida_sistr_results.tests.mock_irida import MockIridaData, MockIridaServer
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Runs a local stand-in for an IRIDA server with synthetic SISTR results.',
+                                     epilog='Example:\n\tpython -m irida_sistr_results.tests.mock_irida --port 8080' +
+                                            '\n\tirida-sistr-results --irida-url http://127.0.0.1:8080 --client-id c ' +
+                                            '--client-secret s -u user --password p -a -o out.xlsx',
+                                     formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--host', action='store', dest='host', default='127.0.0.1', help='The host [127.0.0.1]')
+    parser.add_argument('--port', action='store', dest='port', type=int, default=8080, help='The port [8080]')
+    parser.add_argument('--projects', action='store', dest='projects', type=int, default=10,
+                        help='The number of projects [10]')
+    parser.add_argument('--samples', action='store', dest='samples_per_project', type=int, default=100,
+                        help='The number of samples in each project [100]')
+    parser.add_argument('--duplicate-submission-rate', action='store', dest='duplicate_submission_rate', type=float,
+                        default=0.1, help='The proportion of samples with two SISTR submissions [0.1]')
+    parser.add_argument('--shared-sample-rate', action='store', dest='shared_sample_rate', type=float, default=0.05,
+                        help='The proportion of samples in a project which belong to another project [0.05]')
+    parser.add_argument('--incomplete-rate', action='store', dest='incomplete_rate', type=float, default=0.05,
+                        help='The proportion of SISTR submissions which are not COMPLETED [0.05]')
+    parser.add_argument('--shared-submission-rate', action='store', dest='shared_submission_rate', type=float,
+                        default=0.01,
+                        help='The proportion of SISTR submissions listed in the analyses of the sample\'s project [0.01]')
+    parser.add_argument('--user-run-submission-rate', action='store', dest='user_run_submission_rate', type=float,
+                        default=0,
+                        help='The proportion of sequencing object pairs with a SISTR submission run by a user [0]')
+    parser.add_argument('--latency', action='store', dest='latency', type=float, default=0,
+                        help='The time (in seconds) to wait before responding to each request [0]')
+    parser.add_argument('--error-rate', action='store', dest='error_rate', type=float, default=0,
+                        help='The proportion of requests to fail with a 500 error [0]')
+    parser.add_argument('--token-lifetime', action='store', dest='token_lifetime', type=int, default=3600,
+                        help='The number of seconds until an access token expires [3600]')
+    parser.add_argument('--seed', action='store', dest='seed', type=int, default=0, help='The random seed [0]')
+    args = parser.parse_args()
+
+    data = MockIridaData.generate(projects=args.projects, samples_per_project=args.samples_per_project,
+                                  duplicate_submission_rate=args.duplicate_submission_rate,
+                                  shared_sample_rate=args.shared_sample_rate, incomplete_rate=args.incomplete_rate,
+                                  shared_submission_rate=args.shared_submission_rate,
+                                  user_run_submission_rate=args.user_run_submission_rate, seed=args.seed)
+    server = MockIridaServer(data, latency=args.latency, error_rate=args.error_rate,
+                             token_lifetime=args.token_lifetime, host=args.host, port=args.port, seed=args.seed)
+
+    print("Serving {} projects with {} samples and {} SISTR submissions at {}".format(
+        len(data.projects), data.get_sample_count(), len(data.submissions), server.url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
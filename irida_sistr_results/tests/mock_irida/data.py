@@ -0,0 +1,203 @@
+import random
+
+from irida_sistr_results.irida_sistr_workflow import IridaSistrWorkflow
+
+# 2018-01-01, the earliest created date of generated samples/submissions (in milliseconds)
+START_DATE = 1514764800000
+DAY = 24 * 60 * 60 * 1000
+
+SEROVARS = ['Enteritidis', 'Typhimurium', 'Heidelberg', 'Infantis', 'Typhi', 'Paratyphi A', 'Kentucky', 'Newport',
+            'I 1,4,[5],12:i:-', 'Muenchen']
+QC_STATUSES = ['PASS', 'PASS', 'PASS', 'WARNING', 'FAIL']
+INCOMPLETE_STATES = ['NEW', 'RUNNING', 'ERROR']
+
+
+class MockIridaData(object):
+    """
+    Synthetic projects, samples, sequencing object pairs and SISTR analysis submissions served by a MockIridaServer.
+
+    Objects are stored as plain dictionaries of their fields and the identifiers of related objects, the HAL JSON
+    (with links) is created by the server.
+    """
+
+    def __init__(self):
+        self.projects = {}
+        self.samples = {}
+        self.pairs = {}
+        self.submissions = {}
+        self.user_submission_ids = []
+
+    @classmethod
+    def generate(cls, projects=10, samples_per_project=100, duplicate_submission_rate=0.1, shared_sample_rate=0.05,
+                 incomplete_rate=0.05, no_results_rate=0.05, shared_submission_rate=0.01, user_submission_rate=0.01,
+                 user_run_submission_rate=0, workflow_versions=('0.3',), seed=0):
+        """
+        Generates synthetic data.
+
+        :param projects: The number of projects.
+        :param samples_per_project: The number of samples in each project.
+        :param duplicate_submission_rate: The proportion of samples with a second sequencing object pair (and so a
+                                          second automated SISTR submission).
+        :param shared_sample_rate: The proportion of samples in each project (after the first) which are samples from
+                                   another project.
+        :param incomplete_rate: The proportion of submissions which are not COMPLETED.
+        :param no_results_rate: The proportion of samples with a sequencing object pair but no SISTR submission.
+        :param shared_submission_rate: The proportion of submissions also shared with the sample's project.
+        :param user_submission_rate: The proportion of submissions also in the user's list of analyses.
+        :param user_run_submission_rate: The proportion of sequencing object pairs with a (newer) SISTR submission run
+                                         by a user rather than automatically, shared with the sample's project and
+                                         in the user's list of analyses.
+        :param workflow_versions: The SISTR workflow versions to pick from for each submission.
+        :param seed: The random seed, the same parameters and seed always generate the same data.
+        :return: The MockIridaData.
+        """
+        data = cls()
+        rand = random.Random(seed)
+        workflow_ids = [IridaSistrWorkflow.workflow_version_to_id(version) for version in workflow_versions]
+
+        for project_id in range(1, projects + 1):
+            project = data.add_project('Project ' + str(project_id))
+
+            for i in range(samples_per_project):
+                if data.samples and project_id > 1 and rand.random() < shared_sample_rate:
+                    data.add_sample_to_project(project['identifier'], rand.choice(list(data.samples.keys())))
+                    continue
+
+                sample = data.add_sample(project['identifier'], 'sample-{}-{}'.format(project_id, i),
+                                         START_DATE + rand.randrange(1000) * DAY)
+
+                pair_count = 2 if rand.random() < duplicate_submission_rate else 1
+                for j in range(pair_count):
+                    pair = data.add_pair(sample['identifier'])
+                    # Only drawn when asked for, so the same seed generates the same data as before
+                    if user_run_submission_rate and rand.random() < user_run_submission_rate:
+                        submission = data.add_submission(pair['identifier'], rand.choice(workflow_ids), 'COMPLETED',
+                                                         sample['createdDate'] + rand.randrange(100, 200) * DAY,
+                                                         cls._generate_predictions(rand), automated=False)
+                        project['submission_ids'].append(submission['identifier'])
+                        data.user_submission_ids.append(submission['identifier'])
+
+                    if rand.random() < no_results_rate:
+                        continue
+
+                    state = rand.choice(INCOMPLETE_STATES) if rand.random() < incomplete_rate else 'COMPLETED'
+                    submission = data.add_submission(pair['identifier'], rand.choice(workflow_ids), state,
+                                                     sample['createdDate'] + rand.randrange(1, 100) * DAY,
+                                                     cls._generate_predictions(rand))
+
+                    if rand.random() < shared_submission_rate:
+                        project['submission_ids'].append(submission['identifier'])
+                    if rand.random() < user_submission_rate:
+                        data.user_submission_ids.append(submission['identifier'])
+
+        return data
+
+    @classmethod
+    def _generate_predictions(cls, rand):
+        serovar = rand.choice(SEROVARS)
+        matching_alleles = rand.randrange(280, 331)
+
+        return [{
+            'cgmlst_ST': rand.randrange(2 ** 32),
+            'cgmlst_distance': 1 - matching_alleles / 330.0,
+            'cgmlst_found_loci': 330,
+            'cgmlst_genome_match': 'SRR' + str(rand.randrange(1000000, 9999999)),
+            'cgmlst_matching_alleles': matching_alleles,
+            'cgmlst_subspecies': 'enterica',
+            'fasta_filepath': '/tmp/contigs.fasta',
+            'genome': 'contigs',
+            'h1': 'g,m',
+            'h2': '-',
+            'mash_distance': rand.random() / 100,
+            'mash_genome': 'SRR' + str(rand.randrange(1000000, 9999999)),
+            'mash_match': rand.randrange(900, 1000),
+            'mash_serovar': serovar,
+            'mash_subspecies': 'enterica',
+            'o_antigen': '1,9,12',
+            'qc_messages': '',
+            'qc_status': rand.choice(QC_STATUSES),
+            'serogroup': 'D1',
+            'serovar': serovar,
+            'serovar_antigen': serovar,
+            'serovar_cgmlst': serovar,
+        }]
+
+    def add_project(self, name):
+        """
+        Adds a project.
+
+        :param name: The project name.
+        :return: The project.
+        """
+        identifier = str(len(self.projects) + 1)
+        project = {'identifier': identifier, 'name': name, 'createdDate': START_DATE, 'sample_ids': [],
+                   'submission_ids': []}
+        self.projects[identifier] = project
+
+        return project
+
+    def add_sample(self, project_id, sample_name, created_date):
+        """
+        Adds a sample to a project.
+
+        :param project_id: The project identifier.
+        :param sample_name: The sample name.
+        :param created_date: The created date (milliseconds since the epoch).
+        :return: The sample.
+        """
+        identifier = str(len(self.samples) + 1)
+        sample = {'identifier': identifier, 'sampleName': sample_name, 'createdDate': created_date, 'pair_ids': []}
+        self.samples[identifier] = sample
+        self.add_sample_to_project(project_id, identifier)
+
+        return sample
+
+    def add_sample_to_project(self, project_id, sample_id):
+        """
+        Adds an existing sample to (another) project.
+
+        :param project_id: The project identifier.
+        :param sample_id: The sample identifier.
+        """
+        if sample_id not in self.projects[project_id]['sample_ids']:
+            self.projects[project_id]['sample_ids'].append(sample_id)
+
+    def add_pair(self, sample_id):
+        """
+        Adds a sequencing object pair to a sample.
+
+        :param sample_id: The sample identifier.
+        :return: The pair.
+        """
+        identifier = str(len(self.pairs) + 1)
+        pair = {'identifier': identifier, 'sample_id': sample_id, 'submission_id': None}
+        self.pairs[identifier] = pair
+        self.samples[sample_id]['pair_ids'].append(identifier)
+
+        return pair
+
+    def add_submission(self, pair_id, workflow_id, analysis_state, created_date, predictions, automated=True):
+        """
+        Adds a SISTR analysis submission of a sequencing object pair.
+
+        :param pair_id: The pair identifier.
+        :param workflow_id: The SISTR workflow id.
+        :param analysis_state: The analysis state (e.g., 'COMPLETED').
+        :param created_date: The created date (milliseconds since the epoch).
+        :param predictions: The SISTR predictions (a list of dictionaries).
+        :param automated: Whether this is the automated SISTR analysis of the pair (otherwise it was run by a user).
+        :return: The submission.
+        """
+        identifier = str(len(self.submissions) + 1)
+        submission = {'identifier': identifier, 'name': 'SISTR ' + identifier, 'workflowId': workflow_id,
+                      'analysisState': analysis_state, 'createdDate': created_date, 'pair_id': pair_id,
+                      'predictions': predictions}
+        self.submissions[identifier] = submission
+        if automated:
+            self.pairs[pair_id]['submission_id'] = identifier
+
+        return submission
+
+    def get_sample_count(self):
+        """Gets the number of (project, sample) pairs, that is the number of rows of results"""
+        return sum(len(project['sample_ids']) for project in self.projects.values())
@@ -0,0 +1,300 @@
+import gzip
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class MockIridaHandler(BaseHTTPRequestHandler):
+    """Handles requests to a MockIridaServer"""
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately, so don't wait to batch them up on kept-alive connections
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        mock_irida = self.server.mock_irida
+        if urlsplit(self.path).path != '/api/oauth/token':
+            self._send(404, {'error': 'not found'})
+            return
+
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8')
+        params = {key: values[0] for key, values in parse_qs(body).items()}
+        status, body = mock_irida.handle_token(params)
+        self._send(status, body)
+
+    def do_GET(self):
+        mock_irida = self.server.mock_irida
+        status, body = mock_irida.handle_get(urlsplit(self.path).path, self.headers.get('Authorization'))
+        self._send(status, body)
+
+    def _send(self, status, body):
+        body = json.dumps(body).encode('utf-8')
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        return
+
+
+class MockIridaServer(object):
+    """
+    A local HTTP stand-in for the parts of the IRIDA REST API used by IridaAPI, serving the projects, samples and SISTR
+    analysis submissions of a MockIridaData.
+
+    Any username, password and client are accepted. Requests may be delayed (latency) and randomly fail with a 500
+    error (error_rate) to simulate a loaded server.
+    """
+
+    ROUTES = [
+        ('projects', r'/api/projects'),
+        ('project', r'/api/projects/(\d+)'),
+        ('project_samples', r'/api/projects/(\d+)/samples'),
+        ('project_sistr', r'/api/projects/(\d+)/analyses/sistr'),
+        ('sample', r'/api/samples/(\d+)'),
+        ('sample_pairs', r'/api/samples/(\d+)/pairs'),
+        ('pair', r'/api/sequencingObjects/pairs/(\d+)'),
+        ('pair_sistr', r'/api/sequencingObjects/pairs/(\d+)/analysis/sistr'),
+        ('user_sistr', r'/api/analysisSubmissions/analysisType/sistr'),
+        ('submission', r'/api/analysisSubmissions/(\d+)'),
+        ('submission_analysis', r'/api/analysisSubmissions/(\d+)/analysis'),
+        ('submission_predictions', r'/api/analysisSubmissions/(\d+)/analysis/file/sistr-predictions'),
+        ('submission_pairs', r'/api/analysisSubmissions/(\d+)/sequenceFiles/pairs'),
+        ('submission_unpaired', r'/api/analysisSubmissions/(\d+)/sequenceFiles/unpaired'),
+    ]
+
+    def __init__(self, data, latency=0, error_rate=0, token_lifetime=3600, host='127.0.0.1', port=0, seed=0):
+        """
+        Creates a new MockIridaServer (call start() to start serving requests).
+
+        :param data: The MockIridaData to serve.
+        :param latency: The time (in seconds) to wait before responding to each request.
+        :param error_rate: The proportion of requests (other than for tokens) to fail with a 500 error.
+        :param token_lifetime: The number of seconds until an access token expires.
+        :param host: The host to listen on.
+        :param port: The port to listen on (default 0 for any free port).
+        :param seed: The random seed for choosing which requests fail.
+        """
+        self.data = data
+        self.latency = latency
+        self.error_rate = error_rate
+        self.token_lifetime = token_lifetime
+        self.requests = Counter()
+        self.errors = 0
+        self.tokens_granted = 0
+
+        self._routes = [(name, re.compile(pattern + '$')) for name, pattern in self.ROUTES]
+        self._access_tokens = {}
+        self._refresh_tokens = set()
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+
+        self._server = ThreadingHTTPServer((host, port), MockIridaHandler)
+        self._server.daemon_threads = True
+        self._server.mock_irida = self
+        self._thread = None
+        self.url = 'http://{}:{}'.format(host, self._server.server_port)
+
+    def start(self):
+        """Starts serving requests in a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={'poll_interval': 0.05},
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """Serves requests in the current thread until interrupted."""
+        self._server.serve_forever()
+
+    def stop(self):
+        """Stops serving requests."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _href(self, path):
+        return self.url + path
+
+    def _links(self, rels):
+        return [{'rel': rel, 'href': self._href(path)} for rel, path in rels]
+
+    def _resource(self, resource):
+        return {'resource': resource}
+
+    def _resources(self, resources):
+        return {'resource': {'resources': resources, 'links': []}}
+
+    def expire_tokens(self):
+        """Expires all access tokens, so the next request with each is rejected."""
+        with self._lock:
+            self._access_tokens.clear()
+
+    def handle_token(self, params):
+        """
+        Grants an access token for the 'password' or 'refresh_token' grant types.
+
+        :param params: The form parameters of the token request.
+        :return: A tuple of (HTTP status, JSON body).
+        """
+        with self._lock:
+            self.requests['token'] += 1
+
+            if params.get('grant_type') == 'refresh_token':
+                if params.get('refresh_token') not in self._refresh_tokens:
+                    return 400, {'error': 'invalid_grant'}
+                self._refresh_tokens.discard(params['refresh_token'])
+            elif params.get('grant_type') != 'password':
+                return 400, {'error': 'unsupported_grant_type'}
+
+            access_token = uuid.uuid4().hex
+            refresh_token = uuid.uuid4().hex
+            self._access_tokens[access_token] = time.time() + self.token_lifetime
+            self._refresh_tokens.add(refresh_token)
+            self.tokens_granted += 1
+
+        return 200, {'access_token': access_token, 'token_type': 'bearer', 'refresh_token': refresh_token,
+                     'expires_in': self.token_lifetime, 'scope': 'read'}
+
+    def _is_authorized(self, authorization):
+        if authorization is None or not authorization.startswith('Bearer '):
+            return False
+
+        with self._lock:
+            expires_at = self._access_tokens.get(authorization[len('Bearer '):])
+        return expires_at is not None and expires_at > time.time()
+
+    def handle_get(self, path, authorization):
+        """
+        Handles a GET request to the REST API.
+
+        :param path: The path of the request.
+        :param authorization: The Authorization header of the request.
+        :return: A tuple of (HTTP status, JSON body).
+        """
+        if self.latency:
+            time.sleep(self.latency)
+
+        for name, pattern in self._routes:
+            match = pattern.match(path)
+            if match:
+                break
+        else:
+            return 404, {'error': 'not found'}
+
+        with self._lock:
+            self.requests[name] += 1
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.errors += 1
+                return 500, {'error': 'internal server error'}
+
+        if not self._is_authorized(authorization):
+            return 401, {'error': 'invalid_token'}
+
+        try:
+            resource = getattr(self, '_get_' + name)(*match.groups())
+        except KeyError:
+            return 404, {'error': 'not found'}
+
+        return 200, resource
+
+    def _project_json(self, project):
+        return {'identifier': project['identifier'], 'name': project['name'], 'createdDate': project['createdDate'],
+                'links': self._links([('self', '/api/projects/' + project['identifier']),
+                                     ('project/samples', '/api/projects/' + project['identifier'] + '/samples')])}
+
+    def _sample_json(self, sample):
+        path = '/api/samples/' + sample['identifier']
+        return {'identifier': sample['identifier'], 'sampleName': sample['sampleName'],
+                'createdDate': sample['createdDate'], 'organism': 'Salmonella enterica',
+                'links': self._links([('self', path), ('sample/sequenceFiles/pairs', path + '/pairs')])}
+
+    def _pair_json(self, pair):
+        path = '/api/sequencingObjects/pairs/' + pair['identifier']
+        links = self._links([('self', path), ('sample', '/api/samples/' + pair['sample_id'])])
+        if pair['submission_id'] is not None:
+            links.extend(self._links([('analysis/sistr', path + '/analysis/sistr')]))
+
+        return {'identifier': pair['identifier'], 'links': links}
+
+    def _submission_json(self, submission):
+        path = '/api/analysisSubmissions/' + submission['identifier']
+        return {'identifier': submission['identifier'], 'name': submission['name'],
+                'workflowId': submission['workflowId'], 'analysisState': submission['analysisState'],
+                'createdDate': submission['createdDate'],
+                'links': self._links([('self', path), ('analysis', path + '/analysis'),
+                                      ('input/paired', path + '/sequenceFiles/pairs'),
+                                      ('input/unpaired', path + '/sequenceFiles/unpaired')])}
+
+    def _completed_submission(self, submission_id):
+        submission = self.data.submissions[submission_id]
+        if submission['analysisState'] != 'COMPLETED':
+            raise KeyError(submission_id)
+        return submission
+
+    def _get_projects(self):
+        return self._resources([self._project_json(project) for project in self.data.projects.values()])
+
+    def _get_project(self, project_id):
+        return self._resource(self._project_json(self.data.projects[project_id]))
+
+    def _get_project_samples(self, project_id):
+        return self._resources([self._sample_json(self.data.samples[sample_id])
+                                for sample_id in self.data.projects[project_id]['sample_ids']])
+
+    def _get_project_sistr(self, project_id):
+        return self._resources([self._submission_json(self.data.submissions[submission_id])
+                                for submission_id in self.data.projects[project_id]['submission_ids']])
+
+    def _get_sample(self, sample_id):
+        return self._resource(self._sample_json(self.data.samples[sample_id]))
+
+    def _get_sample_pairs(self, sample_id):
+        return self._resources([self._pair_json(self.data.pairs[pair_id])
+                                for pair_id in self.data.samples[sample_id]['pair_ids']])
+
+    def _get_pair(self, pair_id):
+        return self._resource(self._pair_json(self.data.pairs[pair_id]))
+
+    def _get_pair_sistr(self, pair_id):
+        return self._resource(self._submission_json(self.data.submissions[self.data.pairs[pair_id]['submission_id']]))
+
+    def _get_user_sistr(self):
+        return self._resources([self._submission_json(self.data.submissions[submission_id])
+                                for submission_id in self.data.user_submission_ids])
+
+    def _get_submission(self, submission_id):
+        return self._resource(self._submission_json(self.data.submissions[submission_id]))
+
+    def _get_submission_analysis(self, submission_id):
+        submission = self._completed_submission(submission_id)
+        path = '/api/analysisSubmissions/' + submission['identifier'] + '/analysis'
+        return self._resource({'analysisType': 'SISTR_TYPING', 'createdDate': submission['createdDate'],
+                               'links': self._links([('self', path), ('outputFile/sistr-predictions',
+                                                                      path + '/file/sistr-predictions')])})
+
+    def _get_submission_predictions(self, submission_id):
+        return self._completed_submission(submission_id)['predictions']
+
+    def _get_submission_pairs(self, submission_id):
+        return self._resources([self._pair_json(self.data.pairs[self.data.submissions[submission_id]['pair_id']])])
+
+    def _get_submission_unpaired(self, submission_id):
+        if submission_id not in self.data.submissions:
+            raise KeyError(submission_id)
+        return self._resources([])
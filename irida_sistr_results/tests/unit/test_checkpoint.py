@@ -0,0 +1,112 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from irida_sistr_results.checkpoint import Checkpoint
+from irida_sistr_results.sistr_info import SampleSistrInfo
+
+SETTINGS = {'sistr_workflow_ids': None, 'stream': False}
+
+
+class CheckpointTest(unittest.TestCase):
+
+    def setUp(self):
+        self.checkpoint_dir = tempfile.mkdtemp()
+        self.checkpoint_file = os.path.join(self.checkpoint_dir, 'checkpoint.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.checkpoint_dir)
+
+    def _create_sistr_info(self, sample_id, has_results=True):
+        sample = {
+            'identifier': str(sample_id),
+            'sampleName': 'name' + str(sample_id),
+            'createdDate': 1500000000000
+        }
+
+        if not has_results:
+            return SampleSistrInfo.create_empty_info(sample)
+
+        return SampleSistrInfo({
+            'submission': {
+                'workflowId': '92ecf046-ee09-4271-b849-7a82625d6b60',
+                'createdDate': 1500000000001,
+                'identifier': str(sample_id * 10)
+            },
+            'has_results': True,
+            'sistr_predictions': [{
+                'qc_status': 'PASS',
+                'serovar': 'Enteritidis'
+            }],
+            'sample': sample
+        }, [])
+
+    def _record_projects(self, settings=SETTINGS):
+        checkpoint = Checkpoint(self.checkpoint_file)
+        checkpoint.start(settings)
+        checkpoint.record_project('1', [self._create_sistr_info(1), self._create_sistr_info(2, has_results=False)],
+                                  [self._create_sistr_info(2)])
+        checkpoint.record_project('2', [self._create_sistr_info(3)], [])
+
+    def test_resume(self):
+        self._record_projects()
+
+        checkpoint = Checkpoint(self.checkpoint_file, resume=True)
+        checkpoint.start(SETTINGS)
+        projects = list(checkpoint.iter_completed_projects(['Enteritidis']))
+
+        self.assertEqual(['1', '2'], checkpoint.completed_projects)
+        self.assertEqual(['1', '2'], [project_id for project_id, results, additional_results in projects])
+        results, additional_results = projects[0][1:]
+        self.assertEqual(['1', '2'], [result.get_sample_id() for result in results])
+        self.assertEqual([True, False], [result.has_sistr_results() for result in results])
+        self.assertEqual('20', additional_results[0].get_submission_identifier(), "Should keep merged results")
+        self.assertTrue(results[0].is_reportable_serovar(), "Should use current reportable serovars")
+
+    def test_no_resume(self):
+        self._record_projects()
+
+        checkpoint = Checkpoint(self.checkpoint_file)
+        checkpoint.start(SETTINGS)
+
+        self.assertEqual([], checkpoint.completed_projects)
+        self.assertEqual([], list(checkpoint.iter_completed_projects([])))
+        checkpoint = Checkpoint(self.checkpoint_file, resume=True)
+        checkpoint.start(SETTINGS)
+        self.assertEqual([], checkpoint.completed_projects, "Should have started the checkpoint over")
+
+    def test_no_checkpoint_file(self):
+        checkpoint = Checkpoint(self.checkpoint_file, resume=True)
+        checkpoint.start(SETTINGS)
+
+        self.assertEqual([], checkpoint.completed_projects)
+        self.assertTrue(os.path.exists(self.checkpoint_file), "Should start a new checkpoint")
+
+    def test_different_settings(self):
+        self._record_projects()
+
+        checkpoint = Checkpoint(self.checkpoint_file, resume=True)
+        checkpoint.start({'sistr_workflow_ids': None, 'stream': True})
+        self.assertEqual([], checkpoint.completed_projects, "Should not resume with different settings")
+
+    def test_partly_written_record(self):
+        self._record_projects()
+        with open(self.checkpoint_file, 'a') as checkpoint_h:
+            checkpoint_h.write('{"project":"3","results":[')
+
+        checkpoint = Checkpoint(self.checkpoint_file, resume=True)
+        checkpoint.start(SETTINGS)
+        self.assertEqual(['1', '2'], checkpoint.completed_projects, "Should ignore partly written record")
+
+        checkpoint.record_project('3', [self._create_sistr_info(4)], [])
+        checkpoint = Checkpoint(self.checkpoint_file, resume=True)
+        checkpoint.start(SETTINGS)
+        self.assertEqual(['1', '2', '3'], checkpoint.completed_projects, "Should replace partly written record")
+        self.assertEqual(3, len(list(checkpoint.iter_completed_projects([]))))
+
+    def test_remove(self):
+        self._record_projects()
+        checkpoint = Checkpoint(self.checkpoint_file)
+        checkpoint.remove()
+        self.assertFalse(os.path.exists(self.checkpoint_file))
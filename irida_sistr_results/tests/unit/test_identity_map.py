@@ -0,0 +1,90 @@
+import asyncio
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from irida_sistr_results.identity_map import IdentityMap, tally_requests
+
+
+class IdentityMapTest(unittest.TestCase):
+
+    def setUp(self):
+        self.identity_map = IdentityMap()
+
+    def _create_value(self, value, requests=1):
+        tally_requests(requests)
+        return value
+
+    def test_get_or_create(self):
+        value = self.identity_map.get_or_create('sample', '1', lambda: self._create_value('a'))
+        self.assertEqual('a', value, "Should have created value")
+        self.assertEqual({}, self.identity_map.hits, "Should have no hits")
+
+    def test_get_or_create_existing(self):
+        self.identity_map.get_or_create('sample', '1', lambda: self._create_value('a', 3))
+        value = self.identity_map.get_or_create('sample', '1', lambda: self._create_value('b'))
+        self.assertEqual('a', value, "Should have reused existing value")
+        self.assertEqual({'sample': 1}, self.identity_map.hits, "Should have a hit")
+        self.assertEqual(3, self.identity_map.requests_saved, "Should have saved requests made creating value")
+
+    def test_get_or_create_different_kinds(self):
+        self.identity_map.get_or_create('sample', '1', lambda: 'a')
+        value = self.identity_map.get_or_create('submission', '1', lambda: 'b')
+        self.assertEqual('b', value, "Should not reuse values of a different kind")
+
+    def test_get_or_create_nested_requests(self):
+        def create_submission():
+            self.identity_map.get_or_create('href', 'sample/1', lambda: self._create_value('sample', 1))
+            return self._create_value('submission', 2)
+
+        self.identity_map.get_or_create('submission', '1', create_submission)
+        self.identity_map.get_or_create('submission', '1', create_submission)
+        self.assertEqual(3, self.identity_map.requests_saved, "Should include requests of nested values")
+
+    def test_get_or_create_error(self):
+        def fail():
+            raise Exception("error")
+
+        self.assertRaises(Exception, self.identity_map.get_or_create, 'sample', '1', fail)
+        value = self.identity_map.get_or_create('sample', '1', lambda: 'a')
+        self.assertEqual('a', value, "Should create value again after an error")
+
+    def test_get_or_create_threads(self):
+        created = []
+        release = threading.Event()
+
+        def create():
+            created.append(1)
+            release.wait(5)
+            return 'a'
+
+        with ThreadPoolExecutor(4) as executor:
+            futures = [executor.submit(self.identity_map.get_or_create, 'sample', '1', create) for i in range(4)]
+            release.set()
+            values = [f.result() for f in futures]
+
+        self.assertEqual(['a'] * 4, values, "Should have same value in all threads")
+        self.assertEqual(1, len(created), "Should only create value once")
+
+    def test_get_existing(self):
+        self.assertIsNone(self.identity_map.get_existing('sample', '1'), "Should not have value")
+        self.identity_map.get_or_create('sample', '1', lambda: self._create_value('a'))
+        self.assertEqual('a', self.identity_map.get_existing('sample', '1'), "Should have existing value")
+        self.assertEqual(1, self.identity_map.requests_saved, "Should have saved requests")
+
+    def test_get_or_create_async(self):
+        created = []
+
+        async def create():
+            created.append(1)
+            await asyncio.sleep(0.01)
+            tally_requests(2)
+            return 'a'
+
+        async def run():
+            return await asyncio.gather(
+                *[self.identity_map.get_or_create_async('sample', '1', create) for i in range(4)])
+
+        self.assertEqual(['a'] * 4, asyncio.run(run()), "Should have same value in all tasks")
+        self.assertEqual(1, len(created), "Should only create value once")
+        self.assertEqual(6, self.identity_map.requests_saved, "Should have saved requests")
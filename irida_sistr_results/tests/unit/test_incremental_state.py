@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from irida_sistr_results.incremental_state import IncrementalState
+from irida_sistr_results.sistr_info import SampleSistrInfo
+
+
+class IncrementalStateTest(unittest.TestCase):
+
+    def setUp(self):
+        self.state_dir = tempfile.mkdtemp()
+        self.state_file = os.path.join(self.state_dir, 'state.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.state_dir)
+
+    def _create_sistr_info(self, sample_id, has_results=True):
+        sample = {
+            'identifier': str(sample_id),
+            'sampleName': 'name' + str(sample_id),
+            'createdDate': 1500000000000
+        }
+
+        if not has_results:
+            return SampleSistrInfo.create_empty_info(sample)
+
+        return SampleSistrInfo({
+            'submission': {
+                'workflowId': '92ecf046-ee09-4271-b849-7a82625d6b60',
+                'createdDate': 1500000000001,
+                'identifier': str(sample_id * 10)
+            },
+            'has_results': True,
+            'sistr_predictions': [{
+                'qc_status': 'PASS',
+                'serovar': 'Enteritidis'
+            }],
+            'sample': sample
+        }, [])
+
+    def test_no_state_file(self):
+        state = IncrementalState(self.state_file)
+
+        self.assertEqual({}, state.get_known_results('1', []), "Should have no known results")
+
+    def test_save_load(self):
+        state = IncrementalState(self.state_file)
+        state.update_project('1', [self._create_sistr_info(1), self._create_sistr_info(2, has_results=False)])
+        state.save()
+
+        state = IncrementalState(self.state_file)
+        known_results = state.get_known_results('1', ['Enteritidis'])
+
+        self.assertEqual(['1'], list(known_results.keys()), "Should only have known completed results")
+        self.assertEqual('10', known_results['1'].get_submission_identifier(), "Should have stored submission")
+        self.assertTrue(known_results['1'].is_reportable_serovar(), "Should use current reportable serovars")
+        self.assertEqual({}, state.get_known_results('2', []), "Should have no results for other projects")
+
+    def test_keeps_other_projects(self):
+        state = IncrementalState(self.state_file)
+        state.update_project('1', [self._create_sistr_info(1)])
+        state.save()
+
+        state = IncrementalState(self.state_file)
+        state.update_project('2', [self._create_sistr_info(2)])
+        state.save()
+
+        state = IncrementalState(self.state_file)
+        self.assertEqual(['1'], list(state.get_known_results('1', []).keys()), "Should keep project from first run")
+        self.assertEqual(['2'], list(state.get_known_results('2', []).keys()), "Should have project from second run")
+
+    def test_different_workflows(self):
+        state = IncrementalState(self.state_file, ['92ecf046-ee09-4271-b849-7a82625d6b60'])
+        state.update_project('1', [self._create_sistr_info(1)])
+        state.save()
+
+        state = IncrementalState(self.state_file, None)
+        self.assertEqual({}, state.get_known_results('1', []), "Should ignore state for different workflows")
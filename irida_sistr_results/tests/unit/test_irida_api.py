@@ -1,7 +1,11 @@
+import itertools
+import random
 import unittest
+from datetime import datetime
 from unittest.mock import Mock
 
-from irida_sistr_results.irida_api import IridaAPI
+from irida_sistr_results.irida_api import SUBMISSION_RELS, TRAVERSAL_PROJECT, TRAVERSAL_SAMPLES, IridaAPI, \
+    SubmissionCandidate, SubmissionContext
 from irida_sistr_results.sistr_info import SampleSistrInfo
 
 
@@ -13,6 +17,7 @@ class IridaAPITest(unittest.TestCase):
         self.irida_api = IridaAPI(self.connector, [])
         self.irida_api.get_sistr_info_from_submission = Mock(side_effect=lambda x: x['identifier'])
         self.irida_api._get_sistr_submission = Mock(side_effect=lambda x: {'identifier': x})
+        self.pair_ids = itertools.count()
 
     def _create_user_results_state(self, analysis_states):
         return [{
@@ -45,6 +50,269 @@ class IridaAPITest(unittest.TestCase):
             }
         }, [])
 
+    def _create_project_samples(self, sample_ids):
+        return [{
+            'identifier': str(sample_id),
+            'sampleName': 'name' + str(sample_id),
+            'createdDate': 1500000000000
+        } for sample_id in sample_ids]
+
+    def _get_resources_project_samples(self, path):
+        if path.endswith('/samples'):
+            return self._create_project_samples(range(20))
+        else:
+            # Only even samples have sequencing data
+            sample_id = int(path.split('/')[3])
+            return [] if sample_id % 2 else [{'identifier': str(sample_id), 'links': []}]
+
+    def test_get_sistr_results_for_project(self):
+        self.connector.get_resources.side_effect = self._get_resources_project_samples
+        sistr_results = self.irida_api.get_sistr_results_for_project(1, None, None)
+        self.assertEqual([str(x) for x in range(0, 20, 2)], [r.get_sample_id() for r in sistr_results],
+                         "Should have results for samples with sequencing data")
+
+    def test_get_sistr_results_for_project_jobs(self):
+        self.connector.get_resources.side_effect = self._get_resources_project_samples
+        irida_api = IridaAPI(self.connector, [], jobs=4)
+        try:
+            sistr_results = irida_api.get_sistr_results_for_project(1, None, None)
+        finally:
+            irida_api.close()
+        self.assertEqual([str(x) for x in range(0, 20, 2)], [r.get_sample_id() for r in sistr_results],
+                         "Should have results in the same order as a sequential run")
+
+    def test_get_sistr_results_for_project_known_results(self):
+        self.connector.get_resources.side_effect = self._get_resources_project_samples
+        known_result = SampleSistrInfo({
+            'submission': {
+                'workflowId': '92ecf046-ee09-4271-b849-7a82625d6b60',
+                'createdDate': 1500000000000
+            },
+            'has_results': True,
+            'sistr_predictions': [{
+                'qc_status': 'PASS'
+            }],
+            'sample': self._create_project_samples([4])[0]
+        }, [])
+
+        sistr_results = self.irida_api.get_sistr_results_for_project(1, None, None, {'4': known_result})
+
+        self.assertEqual([str(x) for x in range(0, 20, 2)], [r.get_sample_id() for r in sistr_results],
+                         "Should have results in the same order")
+        self.assertIs(known_result, sistr_results[2], "Should use known result")
+        self.assertNotIn('/api/samples/4/pairs', [c[0][0] for c in self.connector.get_resources.call_args_list],
+                         "Should not load results for sample with known results")
+
+    def test_get_sistr_results_for_project_shared_samples(self):
+        self.connector.get_resources.side_effect = self._get_resources_project_samples
+        sistr_results_1 = self.irida_api.get_sistr_results_for_project(1, None, None)
+        sistr_results_2 = self.irida_api.get_sistr_results_for_project(2, None, None)
+
+        self.assertEqual([r.get_sample_id() for r in sistr_results_1], [r.get_sample_id() for r in sistr_results_2],
+                         "Should have same results for samples in both projects")
+        pairs_paths = [c[0][0] for c in self.connector.get_resources.call_args_list if c[0][0].endswith('/pairs')]
+        self.assertEqual(20, len(pairs_paths), "Should only traverse samples shared between projects once")
+        self.assertEqual(20, self.irida_api.identity_map.hits['sample'], "Should have reused samples")
+
+    def _create_sample_submissions(self, submissions):
+        """Mocks a sample with a sequencing object pair (and automated submission) per (workflow, qc, date)"""
+        pairs = [{'identifier': str(next(self.pair_ids)), 'links': [{'rel': 'analysis/sistr', 'href': str(index)}]}
+                 for index in range(len(submissions))]
+        self.connector.get_resources.side_effect = lambda path: pairs
+        self.connector.get.side_effect = lambda href: {
+            'identifier': href, 'analysisState': 'COMPLETED', 'workflowId': submissions[int(href)][0],
+            'createdDate': submissions[int(href)][2]}
+        self.irida_api.get_sistr_info_from_submission = Mock(
+            side_effect=lambda sistr, context: self._create_sistr_info(*submissions[int(sistr['identifier'])]))
+
+    def _pick_all_sistr_info(self, sample, submissions, sistr_workflow_ids):
+        sistr_info = SampleSistrInfo.create_empty_info(sample)
+        for submission in submissions:
+            sistr_info = self.irida_api._update_sample_sistr_info(sistr_info, self._create_sistr_info(*submission),
+                                                                  sistr_workflow_ids)
+        return sistr_info
+
+    def test_get_sistr_info_for_sample_loads_newest_pass(self):
+        sample = self._create_project_samples([1])[0]
+        self._create_sample_submissions([('92ecf046-ee09-4271-b849-7a82625d6b60', 'PASS', 1500000000000),
+                                         ('e8f9cc61-3264-48c6-81d9-02d9e84bccc7', 'PASS', 1500000000003),
+                                         ('92ecf046-ee09-4271-b849-7a82625d6b60', 'FAIL', 1500000000002),
+                                         ('92ecf046-ee09-4271-b849-7a82625d6b60', 'PASS', 1500000000001)])
+
+        sistr_info = self.irida_api._get_sistr_info_for_sample(sample, ['92ecf046-ee09-4271-b849-7a82625d6b60'])
+
+        self.assertEqual(datetime.fromtimestamp(1500000000001 / 1000), sistr_info.get_submission_created_date())
+        self.assertEqual(['2', '3'], [c[0][0]['identifier'] for c in
+                                      self.irida_api.get_sistr_info_from_submission.call_args_list],
+                         "Should only load results newer than the newest PASS, of included workflows")
+        self.assertEqual(1, self.irida_api.submissions_superseded)
+
+    def test_get_sistr_info_for_sample_same_as_loading_all(self):
+        rand = random.Random(1)
+        workflow_ids = ['92ecf046-ee09-4271-b849-7a82625d6b60', 'e8f9cc61-3264-48c6-81d9-02d9e84bccc7']
+        for i in range(200):
+            sample = self._create_project_samples([i])[0]
+            submissions = [(rand.choice(workflow_ids), rand.choice(['PASS', 'WARNING', 'FAIL']),
+                            1500000000000 + rand.randrange(3)) for j in range(rand.randrange(1, 5))]
+            sistr_workflow_ids = rand.choice([None, workflow_ids[:1]])
+            self._create_sample_submissions(submissions)
+
+            sistr_info = self.irida_api._create_sistr_info_for_sample(sample, sistr_workflow_ids)
+
+            expected = self._pick_all_sistr_info(sample, submissions, sistr_workflow_ids)
+            self.assertEqual((expected.has_sistr_results(), expected.get_qc_status(),
+                              expected.get_submission_created_date(), expected.get_submission_workflow_id()),
+                             (sistr_info.has_sistr_results(), sistr_info.get_qc_status(),
+                              sistr_info.get_submission_created_date(), sistr_info.get_submission_workflow_id()),
+                             "Should pick the same result as loading all submissions " + str(submissions))
+
+    def _create_project_traversal(self):
+        """Mocks project 1 with samples 2 and 3, each with a pair whose automated submission is listed for the project"""
+        self.resources = {'/api/projects/1/samples': self._create_project_samples([2, 3]),
+                          '/api/projects/1/analyses/sistr': []}
+        self.qc_statuses = {}
+        for sample_id in [2, 3]:
+            self.resources['/api/samples/' + str(sample_id) + '/pairs'] = []
+            pair = self._add_pair(str(sample_id), str(sample_id))
+            self._add_submission(pair, str(sample_id * 10), 'PASS', 1500000000000)
+
+    def _add_pair(self, sample_id, pair_id):
+        pair = {'identifier': pair_id, 'links': [{'rel': 'sample', 'href': 'http://irida/api/samples/' + sample_id},
+                                                 {'rel': 'analysis/sistr', 'href': 'pairs/' + pair_id + '/sistr'}]}
+        self.resources.setdefault('/api/samples/' + sample_id + '/pairs', []).append(pair)
+        return pair
+
+    def _add_submission(self, pair, submission_id, qc_status, created_date, automated=True, listed=True):
+        href = 'http://irida/api/submissions/' + submission_id + '/'
+        submission = {'identifier': submission_id, 'name': 'sistr', 'analysisState': 'COMPLETED',
+                      'createdDate': created_date, 'workflowId': '92ecf046-ee09-4271-b849-7a82625d6b60',
+                      'links': [{'rel': rel, 'href': href + rel} for rel in SUBMISSION_RELS]}
+        self.resources[href + 'input/paired'] = [pair]
+        self.qc_statuses[submission_id] = qc_status
+        if automated:
+            self.resources['pairs/' + pair['identifier'] + '/sistr'] = submission
+        if listed:
+            self.resources['/api/projects/1/analyses/sistr'].append(submission)
+        return submission
+
+    def _create_submission_sistr_info(self, submission, context):
+        return SampleSistrInfo({'submission': submission, 'has_results': True, 'sample': context.sample,
+                                'paired_files': context.paired_files,
+                                'sistr_predictions': [{'qc_status': self.qc_statuses[submission['identifier']]}]},
+                               [])
+
+    def _get_sistr_results_by_traversal(self, same_results=True):
+        results = {}
+        for traversal in [TRAVERSAL_SAMPLES, TRAVERSAL_PROJECT]:
+            connector = Mock()
+            connector.get.side_effect = lambda path, **kwargs: self.resources[path]
+            connector.get_resources.side_effect = lambda path, **kwargs: self.resources[path]
+            irida_api = IridaAPI(connector, [], traversal=traversal)
+            irida_api.get_sistr_info_from_submission = Mock(side_effect=self._create_submission_sistr_info)
+            results[traversal] = [(r.get_sample_id(), r.get_submission_identifier(), r.get_qc_status()) for r in
+                                  irida_api.get_sistr_results_for_project(1, None, None)]
+
+        if same_results:
+            self.assertEqual(results[TRAVERSAL_SAMPLES], results[TRAVERSAL_PROJECT],
+                             "Should have same results as traversing samples")
+        requested_paths = [c[0][0] for c in connector.get_resources.call_args_list + connector.get.call_args_list]
+        return results[TRAVERSAL_PROJECT], irida_api, requested_paths
+
+    def test_get_sistr_results_for_project_traversal(self):
+        self._create_project_traversal()
+        self.resources['/api/samples/3/pairs'] = []
+        self.resources['/api/projects/1/analyses/sistr'].pop()
+        self._add_submission(self._add_pair('2', '4'), '40', 'PASS', 1500000000001)
+
+        sistr_results, irida_api, requested_paths = self._get_sistr_results_by_traversal()
+
+        self.assertEqual([('2', '40', 'PASS')], sistr_results, "Should have no results for sample with no pairs")
+        irida_api.get_sistr_info_from_submission.assert_called_once()
+        submission, context = irida_api.get_sistr_info_from_submission.call_args[0]
+        self.assertEqual([self.resources['/api/samples/2/pairs'][1]], context.paired_files)
+        self.assertEqual(self.resources['/api/projects/1/samples'][0], context.sample, "Should pass sample from project")
+        self.assertNotIn('/api/samples/2/pairs', requested_paths, "Should not traverse sample joined to submissions")
+        self.assertIn('/api/samples/3/pairs', requested_paths, "Should traverse sample with no submissions listed")
+        self.assertNotIn('pairs/4/sistr', requested_paths, "Should not resolve automated submission of joined pair")
+
+        irida_api.get_sistr_submission_candidates_shared_to_project(1)
+        self.assertEqual(1, irida_api.identity_map.hits['project_submissions'],
+                         "Should reuse submissions listed for project")
+
+    def test_get_sistr_results_for_project_traversal_user_submission(self):
+        self._create_project_traversal()
+        # A newer user-run submission passing QC, shared with the project, is not the automated result of the sample
+        self._add_submission(self.resources['/api/samples/2/pairs'][0], '21', 'PASS', 1500000000001, automated=False)
+
+        sistr_results, irida_api, requested_paths = self._get_sistr_results_by_traversal()
+
+        self.assertEqual([('2', '20', 'PASS'), ('3', '30', 'PASS')], sistr_results)
+        self.assertIn('/api/samples/2/pairs', requested_paths, "Should traverse sample with user-run submission")
+        self.assertNotIn('/api/samples/3/pairs', requested_paths)
+        self.assertEqual(1, requested_paths.count('pairs/2/sistr'),
+                         "Should not resolve automated submission of pair again when traversing sample")
+
+    def test_get_sistr_results_for_project_traversal_automated_not_listed(self):
+        self._create_project_traversal()
+        self.resources['/api/projects/1/analyses/sistr'].pop(0)
+        self._add_submission(self.resources['/api/samples/2/pairs'][0], '21', 'PASS', 1500000000001, automated=False)
+
+        sistr_results, irida_api, requested_paths = self._get_sistr_results_by_traversal(same_results=False)
+
+        # Only listed for the pair, so joined as its automated submission without a request to confirm it. Traversing
+        # samples, it is merged as a newer result shared with the project instead.
+        self.assertEqual([('2', '21', 'PASS'), ('3', '30', 'PASS')], sistr_results,
+                         "Should join the only submission listed for a pair")
+        self.assertNotIn('/api/samples/2/pairs', requested_paths)
+        self.assertNotIn('pairs/2/sistr', requested_paths)
+
+    def test_get_sistr_results_for_project_traversal_sample_outside_project(self):
+        self._create_project_traversal()
+        self._add_submission(self._add_pair('4', '4'), '40', 'PASS', 1500000000000)
+
+        sistr_results, irida_api, requested_paths = self._get_sistr_results_by_traversal()
+
+        self.assertEqual([('2', '20', 'PASS'), ('3', '30', 'PASS')], sistr_results)
+        self.assertEqual(['20', '30'], [c[0][0]['identifier'] for c in
+                                        irida_api.get_sistr_info_from_submission.call_args_list],
+                         "Should not load results of sample outside project")
+        self.assertNotIn('pairs/4/sistr', requested_paths)
+
+    def test_get_sistr_info_from_submission_known_context(self):
+        irida_api = IridaAPI(self.connector, [])
+        submission = {'identifier': '1', 'name': 'sistr', 'createdDate': 1500000000000,
+                      'workflowId': '92ecf046-ee09-4271-b849-7a82625d6b60',
+                      'links': [{'rel': rel, 'href': 'http://irida/api/submissions/' + rel} for rel in SUBMISSION_RELS]}
+        sample = self._create_project_samples([2])[0]
+        sequencing_object = {'identifier': '3', 'links': [{'rel': 'sample', 'href': 'http://irida/api/samples/2'}]}
+        self.connector.get.return_value = {'links': [{'rel': 'outputFile/sistr-predictions', 'href': 'predictions'}]}
+        self.connector.get_file.return_value = Mock(json=lambda: [{'qc_status': 'PASS'}])
+
+        sistr_info = irida_api.get_sistr_info_from_submission(
+            submission, SubmissionContext.for_sequencing_object(sequencing_object, sample))
+
+        self.assertEqual(('2', '3', 'PASS'), (sistr_info.get_sample_id(), sistr_info.get_paired_id(),
+                                              sistr_info.get_qc_status()))
+        self.connector.get_resources.assert_not_called()
+        self.connector.get.assert_called_once_with('http://irida/api/submissions/analysis', immutable=True)
+        self.assertEqual({'submission_inputs': 2, 'sample': 1}, irida_api.requests_avoided)
+        self.assertEqual(3, irida_api.get_requests_avoided())
+
+    def test_get_sistr_info_from_submission_unpaired_files(self):
+        irida_api = IridaAPI(self.connector, [])
+        submission = {'identifier': '1', 'name': 'sistr',
+                      'links': [{'rel': rel, 'href': 'http://irida/api/submissions/' + rel} for rel in SUBMISSION_RELS]}
+        self.connector.get_resources.return_value = [{'identifier': '4'}]
+
+        with self.assertRaises(Exception):
+            irida_api.get_sistr_info_from_submission(submission, SubmissionContext(paired_files=[]))
+        self.connector.get_resources.assert_called_once_with('http://irida/api/submissions/input/unpaired',
+                                                             immutable=True)
+
+    def test_invalid_traversal(self):
+        with self.assertRaises(ValueError):
+            IridaAPI(self.connector, [], traversal='pairs')
+
     def test_get_sistr_submissions_for_user_single(self):
         self.connector.get_resources.return_value = self._create_user_results_state(['COMPLETED'])
         sistr_results = self.irida_api.get_sistr_submissions_for_user()
@@ -90,6 +358,23 @@ class IridaAPITest(unittest.TestCase):
                                                                        'e8f9cc61-3264-48c6-81d9-02d9e84bccc7'])
         self.assertEqual([0, 1], sistr_results, "Should have correct identifiers")
 
+    def test_get_sistr_submissions_for_project_already_loaded(self):
+        self.connector.get_resources.return_value = self._create_user_results_state(['COMPLETED', 'COMPLETED'])
+        self.irida_api.identity_map.get_or_create('submission', 1, lambda: 1)
+        sistr_results = self.irida_api.get_sistr_submissions_shared_to_project(1)
+        self.assertEqual([0, 1], sistr_results, "Should have correct identifiers")
+        self.irida_api._get_sistr_submission.assert_called_once_with(0)
+
+    def test_get_sistr_submissions_for_project_listed_links(self):
+        submissions = self._create_user_results_state(['COMPLETED', 'COMPLETED'])
+        submissions[1]['links'] = [{'rel': rel, 'href': 'http://irida/api/submissions/' + rel} for rel in
+                                   SUBMISSION_RELS]
+        self.connector.get_resources.return_value = submissions
+        sistr_results = self.irida_api.get_sistr_submissions_shared_to_project(1)
+        self.assertEqual([0, 1], sistr_results, "Should have correct identifiers")
+        self.irida_api._get_sistr_submission.assert_called_once_with(0)
+        self.assertEqual({'analysis_submission': 1}, self.irida_api.requests_avoided)
+
     def test_get_sistr_submissions_for_project_multiple(self):
         self.connector.get_resources.return_value = self._create_user_results_state(['COMPLETED', 'COMPLETED'])
         sistr_results = self.irida_api.get_sistr_submissions_shared_to_project(1)
@@ -122,6 +407,38 @@ class IridaAPITest(unittest.TestCase):
                                                                                 'e8f9cc61-3264-48c6-81d9-02d9e84bccc7'])
         self.assertEqual([0, 1], sistr_results, "Should have correct identifiers")
 
+    def test_get_sistr_submission_candidates_for_user(self):
+        submissions = self._create_user_results_state(['COMPLETED', 'COMPLETED', 'ERROR'])
+        for submission in submissions:
+            submission['createdDate'] = 1500000000000
+            submission['links'] = [{'rel': 'input/paired', 'href': 'http://irida/api/submissions/pairs'}]
+        paired = [{'links': [{'rel': 'sample', 'href': 'http://irida/api/samples/7'}]}]
+        self.connector.get_resources.side_effect = lambda path, **kwargs: paired if path.endswith(
+            '/pairs') else submissions
+        loaded_sistr_info = self._create_sistr_info('92ecf046-ee09-4271-b849-7a82625d6b60', 'PASS', 1500000000000)
+        self.irida_api.identity_map.get_or_create('submission', 1, lambda: loaded_sistr_info)
+
+        candidates = self.irida_api.get_sistr_submission_candidates_for_user()
+
+        self.assertEqual(2, len(candidates), "Should skip incomplete submissions")
+        self.assertEqual(['7', '1'], [c.sample_id for c in candidates], "Should get sample from link")
+        self.assertEqual(paired, candidates[0].paired_files)
+        self.assertIs(loaded_sistr_info, candidates[1].sistr_info, "Should reuse already loaded submission")
+        self.assertEqual(2, self.connector.get_resources.call_count, "Should only get paired files of new submission")
+
+    def test_get_sistr_info_for_candidates(self):
+        candidates = [SubmissionCandidate(0, '7', None, {'identifier': 0, 'name': 'sistr'}, []),
+                      SubmissionCandidate(1, '8', None, {'identifier': 1, 'name': 'sistr'}, [])]
+        self.irida_api.get_sistr_info_from_submission = Mock(
+            side_effect=lambda submission, context: 'info' + str(submission['identifier']) if submission[
+                'identifier'] else None)
+
+        self.assertEqual(['info1'], self.irida_api.get_sistr_info_for_candidates(candidates),
+                         "Should skip submissions which could not be read")
+        self.assertEqual('info1', candidates[1].sistr_info, "Should keep loaded results")
+        self.irida_api.get_sistr_info_for_candidates(candidates)
+        self.assertEqual(3, self.irida_api.get_sistr_info_from_submission.call_count)
+
     def test_update_sample_sistr_info_most_recent(self):
         curr_sistr_info = self._create_sistr_info('92ecf046-ee09-4271-b849-7a82625d6b60', 'PASS', 1500000000000)
         new_sistr_info = self._create_sistr_info('92ecf046-ee09-4271-b849-7a82625d6b60', 'PASS', 1500000000001)
@@ -0,0 +1,219 @@
+import json
+import unittest
+from unittest.mock import Mock
+
+from requests.exceptions import HTTPError
+
+from irida_sistr_results.irida_api import TRAVERSAL_PROJECT, TRAVERSAL_SAMPLES, IridaAPI
+from irida_sistr_results.irida_async import AsyncIridaAPI
+
+
+class FakeIridaData(object):
+    """In-memory IRIDA resources for a project of samples with SISTR results"""
+
+    def __init__(self):
+        self.resources = {'/api/projects/1/samples': {'resources': []},
+                          '/api/projects/1/analyses/sistr': {'resources': []}}
+        self.files = {}
+
+        for sample_id in range(1, 6):
+            sample = self.add_sample(sample_id)
+
+            # two submissions per sample, the second newer but failing QC
+            for n, qc_status in enumerate(['PASS', 'FAIL']):
+                pair = self.add_pair(sample, str(sample_id * 10 + n))
+                self.add_submission(pair, str(sample_id * 10 + n), qc_status, 1500000000000 + n)
+
+        # sample without any sequencing data
+        empty_sample = {'identifier': '6', 'sampleName': 'name6', 'createdDate': 1500000000000}
+        self.resources['/api/projects/1/samples']['resources'].append(empty_sample)
+        self.resources['/api/samples/6/pairs'] = {'resources': []}
+
+    def add_sample(self, sample_id, in_project=True):
+        sample = {'identifier': str(sample_id), 'sampleName': 'name' + str(sample_id),
+                  'createdDate': 1500000000000,
+                  'links': [{'rel': 'self', 'href': '/api/samples/' + str(sample_id)}]}
+        self.resources['/api/samples/' + str(sample_id)] = sample
+        self.resources['/api/samples/' + str(sample_id) + '/pairs'] = {'resources': []}
+        if in_project:
+            self.resources['/api/projects/1/samples']['resources'].append(sample)
+        return sample
+
+    def add_pair(self, sample, pair_id):
+        pair = {'identifier': pair_id,
+                'links': [{'rel': 'analysis/sistr', 'href': '/api/pairs/' + pair_id + '/sistr'},
+                          {'rel': 'sample', 'href': '/api/samples/' + sample['identifier']}]}
+        self.resources['/api/samples/' + sample['identifier'] + '/pairs']['resources'].append(pair)
+        return pair
+
+    def add_submission(self, pair, submission_id, qc_status, created_date, automated=True, listed=True):
+        """Adds a submission run on a pair, either its automated submission or one run by a user"""
+        submission = {'identifier': submission_id, 'name': 'sistr', 'analysisState': 'COMPLETED',
+                      'workflowId': '92ecf046-ee09-4271-b849-7a82625d6b60', 'createdDate': created_date,
+                      'links': [{'rel': 'input/paired', 'href': '/api/submissions/' + submission_id + '/paired'},
+                                {'rel': 'input/unpaired', 'href': '/api/submissions/' + submission_id + '/unpaired'},
+                                {'rel': 'analysis', 'href': '/api/submissions/' + submission_id + '/analysis'},
+                                {'rel': 'self', 'href': '/api/submissions/' + submission_id}]}
+        if automated:
+            self.resources['/api/pairs/' + pair['identifier'] + '/sistr'] = submission
+        self.resources['/api/analysisSubmissions/' + submission_id] = submission
+        self.resources['/api/submissions/' + submission_id + '/paired'] = {'resources': [pair]}
+        self.resources['/api/submissions/' + submission_id + '/unpaired'] = {'resources': []}
+        self.resources['/api/submissions/' + submission_id + '/analysis'] = {
+            'links': [{'rel': 'outputFile/sistr-predictions', 'href': '/files/' + submission_id}]}
+        self.files['/files/' + submission_id] = json.dumps([{'qc_status': qc_status, 'serovar': 'Enteritidis'}])
+        if listed:
+            self.resources['/api/projects/1/analyses/sistr']['resources'].append(submission)
+        return submission
+
+    def get_pair(self, pair_id):
+        return self.resources['/api/submissions/' + pair_id + '/paired']['resources'][0]
+
+    def unlist_submission(self, submission_id):
+        listed = self.resources['/api/projects/1/analyses/sistr']['resources']
+        listed[:] = [submission for submission in listed if submission['identifier'] != submission_id]
+
+    def get(self, path):
+        if path not in self.resources:
+            raise HTTPError("404 Error: Not Found for url: " + path)
+        return self.resources[path]
+
+
+class FakeAsyncConnector(object):
+
+    def __init__(self, data):
+        self.data = data
+        self.closed = False
+        self.paths = []
+
+    async def get(self, path, immutable=False):
+        self.paths.append(path)
+        return self.data.get(path)
+
+    async def get_resources(self, path, immutable=False):
+        self.paths.append(path)
+        return self.data.get(path)['resources']
+
+    async def get_file(self, path, immutable=False):
+        self.paths.append(path)
+        return self.data.files[path]
+
+    async def close(self):
+        self.closed = True
+
+
+class AsyncIridaAPITest(unittest.TestCase):
+
+    def setUp(self):
+        self.data = FakeIridaData()
+        self.connector = FakeAsyncConnector(self.data)
+        self.irida_api = AsyncIridaAPI(self.connector, ['Enteritidis'])
+
+        sync_connector = Mock()
+        sync_connector.get = Mock(side_effect=lambda path, immutable=False: self.data.get(path))
+        sync_connector.get_resources = Mock(
+            side_effect=lambda path, immutable=False: self.data.get(path)['resources'])
+        sync_connector.get_file = Mock(side_effect=lambda path, immutable=False: Mock(json=Mock(return_value=json.loads(
+            self.data.files[path]))))
+        self.sync_irida_api = IridaAPI(sync_connector, ['Enteritidis'])
+
+    def tearDown(self):
+        self.irida_api.close()
+
+    def _summarize(self, sistr_results):
+        return [(r.get_sample_id(), r.has_sistr_results() and r.get_submission_identifier(), r.get_qc_status()) for r
+                in sistr_results]
+
+    def test_get_sistr_results_for_project(self):
+        sistr_results = self.irida_api.get_sistr_results_for_project(1, None, None)
+
+        self.assertEqual([('1', '10', 'PASS'), ('2', '20', 'PASS'), ('3', '30', 'PASS'), ('4', '40', 'PASS'),
+                          ('5', '50', 'PASS')], self._summarize(sistr_results), "Did not get expected results")
+        self.assertEqual(self._summarize(self.sync_irida_api.get_sistr_results_for_project(1, None, None)),
+                         self._summarize(sistr_results), "Should be same results as IridaAPI")
+
+    def test_get_sistr_results_for_project_workflow(self):
+        sistr_results = self.irida_api.get_sistr_results_for_project(1, ['e8f9cc61-3264-48c6-81d9-02d9e84bccc7'],
+                                                                     None)
+
+        self.assertEqual(['MISSING'] * 5, [r.get_qc_status() for r in sistr_results], "Should have no results")
+
+    def _get_sistr_results_by_traversal(self, same_results=True):
+        results = {}
+        for traversal in [TRAVERSAL_SAMPLES, TRAVERSAL_PROJECT]:
+            connector = FakeAsyncConnector(self.data)
+            irida_api = AsyncIridaAPI(connector, ['Enteritidis'], traversal=traversal)
+            results[traversal] = self._summarize(irida_api.get_sistr_results_for_project(1, None, None))
+            irida_api.close()
+
+        if same_results:
+            self.assertEqual(results[TRAVERSAL_SAMPLES], results[TRAVERSAL_PROJECT],
+                             "Should have same results as traversing samples")
+        return results[TRAVERSAL_PROJECT], connector.paths
+
+    def test_get_sistr_results_for_project_traversal(self):
+        sistr_results, paths = self._get_sistr_results_by_traversal()
+
+        self.assertEqual(('1', '10', 'PASS'), sistr_results[0])
+        self.assertEqual(['/api/samples/6/pairs'], [path for path in paths if path.endswith('/pairs')],
+                         "Should only traverse sample with no submissions listed")
+        self.assertFalse([path for path in paths if path.endswith('/sistr') and path.startswith('/api/pairs/')],
+                         "Should not resolve automated submissions of joined pairs")
+
+    def test_get_sistr_results_for_project_traversal_user_submission(self):
+        # a newer user-run submission passing QC shared with the project is not the sample's automated result
+        self.data.add_submission(self.data.get_pair('10'), '100', 'PASS', 1500000000005, automated=False)
+
+        sistr_results, paths = self._get_sistr_results_by_traversal()
+
+        self.assertEqual(('1', '10', 'PASS'), sistr_results[0])
+        self.assertIn('/api/samples/1/pairs', paths, "Should traverse sample with a user-run submission listed")
+        self.assertNotIn('/api/samples/2/pairs', paths)
+
+    def test_get_sistr_results_for_project_traversal_automated_not_listed(self):
+        self.data.unlist_submission('20')
+        self.data.unlist_submission('21')
+        self.data.add_submission(self.data.get_pair('21'), '200', 'PASS', 1500000000005, automated=False)
+
+        sistr_results, paths = self._get_sistr_results_by_traversal(same_results=False)
+
+        # Only listed for the pair, so joined as its automated submission without a request to confirm it
+        self.assertEqual(('2', '200', 'PASS'), sistr_results[1], "Should join the only submission listed for a pair")
+        self.assertNotIn('/api/samples/2/pairs', paths)
+        self.assertNotIn('/api/pairs/21/sistr', paths)
+
+    def test_get_sistr_results_for_project_traversal_sample_outside_project(self):
+        sample = self.data.add_sample(7, in_project=False)
+        self.data.add_submission(self.data.add_pair(sample, '70'), '70', 'PASS', 1500000000000)
+
+        sistr_results, paths = self._get_sistr_results_by_traversal()
+
+        self.assertNotIn('7', [sample_id for sample_id, submission_id, qc_status in sistr_results])
+        self.assertNotIn('/files/70', paths, "Should not load results of sample outside project")
+
+    def test_get_sistr_submissions_shared_to_project(self):
+        sistr_results = self.irida_api.get_sistr_submissions_shared_to_project(1)
+
+        self.assertEqual(self._summarize(self.sync_irida_api.get_sistr_submissions_shared_to_project(1)),
+                         self._summarize(sistr_results), "Should be same results as IridaAPI")
+
+    def test_get_sistr_submissions_shared_to_project_error(self):
+        del self.data.resources['/api/submissions/11/analysis']
+        sistr_results = self.irida_api.get_sistr_submissions_shared_to_project(1)
+
+        self.assertEqual(9, len(sistr_results), "Should skip submission with errors")
+
+    def test_get_sistr_info_from_submission_unpaired_files(self):
+        submission = self.data.resources['/api/analysisSubmissions/10']
+        self.data.resources['/api/submissions/10/unpaired'] = {'resources': [{'identifier': '4'}]}
+
+        with self.assertRaises(Exception):
+            self.irida_api.get_sistr_info_from_submission(submission)
+        self.assertEqual(['/api/submissions/10/unpaired'], self.connector.paths,
+                         "Should not load predictions of submission with unpaired files")
+
+    def test_close(self):
+        self.irida_api.get_sistr_results_for_project(1, None, None)
+        self.irida_api.close()
+
+        self.assertTrue(self.connector.closed, "Should have closed connector")
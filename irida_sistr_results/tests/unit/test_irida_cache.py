@@ -0,0 +1,55 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from irida_sistr_results.irida_cache import IridaResponseCache
+
+
+class IridaResponseCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache_file = os.path.join(self.cache_dir, 'responses.sqlite')
+        self.cache = IridaResponseCache(self.cache_file)
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.cache_dir)
+
+    def test_get_miss(self):
+        self.assertIsNone(self.cache.get('http://localhost/api/1'), "Should not be in cache")
+        self.assertEqual(0, self.cache.hits, "Should have no hits")
+        self.assertEqual(1, self.cache.misses, "Should have a miss")
+
+    def test_put_get(self):
+        self.cache.put('http://localhost/api/1', b'{"resource": 1}')
+
+        self.assertEqual(b'{"resource": 1}', self.cache.get('http://localhost/api/1'), "Should be in cache")
+        self.assertEqual(1, self.cache.hits, "Should have a hit")
+        self.assertEqual(1.0, self.cache.get_hit_rate(), "Should have correct hit rate")
+
+    def test_persistent(self):
+        self.cache.put('http://localhost/api/1', b'{"resource": 1}')
+        self.cache.close()
+
+        self.cache = IridaResponseCache(self.cache_file)
+        self.assertEqual(b'{"resource": 1}', self.cache.get('http://localhost/api/1'), "Should be stored in file")
+        self.assertGreater(self.cache.get_size(), 0, "Should have loaded size of cache")
+
+    def test_evict_least_recently_used(self):
+        self.cache.close()
+        self.cache = IridaResponseCache(self.cache_file, max_size_bytes=150)
+
+        # random bytes don't compress, so each response is ~40 bytes once stored
+        bodies = [os.urandom(30) for i in range(4)]
+        self.cache.put('http://localhost/api/0', bodies[0])
+        self.cache.put('http://localhost/api/1', bodies[1])
+        self.cache.put('http://localhost/api/2', bodies[2])
+        self.cache.get('http://localhost/api/0')
+        self.cache.put('http://localhost/api/3', bodies[3])
+
+        self.assertLessEqual(self.cache.get_size(), 150, "Should have evicted down to maximum size")
+        self.assertEqual(bodies[0], self.cache.get('http://localhost/api/0'), "Recently used should not be evicted")
+        self.assertIsNone(self.cache.get('http://localhost/api/1'), "Least recently used should be evicted")
+        self.assertEqual(bodies[3], self.cache.get('http://localhost/api/3'), "Newest should not be evicted")
@@ -0,0 +1,94 @@
+import json
+import os
+import tempfile
+import unittest
+
+from irida_sistr_results.irida_metrics import RequestMetrics, classify_endpoint
+
+
+class IridaMetricsTest(unittest.TestCase):
+
+    def test_classify_endpoint(self):
+        base = 'http://localhost/irida/api/'
+        self.assertEqual('projects', classify_endpoint(base + 'projects'))
+        self.assertEqual('project', classify_endpoint(base + 'projects/1'))
+        self.assertEqual('project_samples', classify_endpoint(base + 'projects/1/samples'))
+        self.assertEqual('project_analyses', classify_endpoint(base + 'projects/1/analyses/sistr'))
+        self.assertEqual('sample', classify_endpoint(base + 'samples/2'))
+        self.assertEqual('sample_pairs', classify_endpoint(base + 'samples/2/pairs'))
+        self.assertEqual('pair', classify_endpoint(base + 'sequencingObjects/pairs/3'))
+        self.assertEqual('pair_analysis_submission', classify_endpoint(base + 'sequencingObjects/pairs/3/analysis/sistr'))
+        self.assertEqual('user_analysis_submissions', classify_endpoint(base + 'analysisSubmissions/analysisType/sistr'))
+        self.assertEqual('analysis_submission', classify_endpoint(base + 'analysisSubmissions/4'))
+        self.assertEqual('analysis', classify_endpoint(base + 'analysisSubmissions/4/analysis'))
+        self.assertEqual('predictions_file', classify_endpoint(base + 'analysisSubmissions/4/analysis/file/sistr-predictions'))
+        self.assertEqual('submission_inputs', classify_endpoint(base + 'analysisSubmissions/4/sequenceFiles/pairs'))
+        self.assertEqual('submission_inputs', classify_endpoint('/api/analysisSubmissions/4/sequenceFiles/unpaired'))
+        self.assertEqual('other', classify_endpoint(base + 'users/1'))
+
+    def test_record(self):
+        metrics = RequestMetrics()
+        for i in range(4):
+            metrics.request_started()
+        self.assertEqual(4, metrics.in_flight)
+        metrics.record('sample', 0.02, 100, 200)
+        metrics.record('sample', 0.2, 50, 500)
+        metrics.record_error('sample', 30)
+        metrics.record_retry('sample')
+        metrics.record('project_samples', 0.5, 1000, 200)
+
+        sample_metrics = metrics.get_endpoint_metrics()['sample']
+        self.assertEqual(3, sample_metrics.requests)
+        self.assertEqual(2, sample_metrics.errors)
+        self.assertEqual(1, sample_metrics.retries)
+        self.assertEqual(150, sample_metrics.bytes_received)
+        self.assertAlmostEqual(30.22 / 3, sample_metrics.get_mean_latency())
+        self.assertEqual(0.025, sample_metrics.get_latency_percentile(0.3), "Should estimate from bucket bound")
+        self.assertEqual(30, sample_metrics.get_latency_percentile(0.95), "Should use maximum for last bucket")
+
+        self.assertEqual(4, metrics.get_total('requests'))
+        self.assertEqual(0, metrics.in_flight)
+        self.assertEqual(1150, metrics.get_total('bytes_received'))
+
+        table = metrics.format_table()
+        self.assertEqual(3, len(table))
+        self.assertTrue(table[1].startswith('sample '), "Should sort endpoints by total time")
+
+    def test_write_json(self):
+        metrics = RequestMetrics()
+        metrics.record('sample', 0.02, 100, 200)
+
+        metrics_file = tempfile.NamedTemporaryFile(suffix='.json', delete=False).name
+        try:
+            metrics.write(metrics_file, {'samples': 1})
+            with open(metrics_file) as metrics_h:
+                data = json.load(metrics_h)
+        finally:
+            os.remove(metrics_file)
+
+        self.assertEqual({'samples': 1}, data['run'])
+        self.assertEqual(1, data['endpoints']['sample']['requests'])
+        self.assertEqual(1, data['endpoints']['sample']['latency_seconds']['buckets']['0.025'])
+        self.assertEqual(0, data['endpoints']['sample']['latency_seconds']['buckets']['+Inf'])
+
+    def test_write_prometheus(self):
+        metrics = RequestMetrics()
+        metrics.record('sample', 0.02, 100, 200)
+        metrics.record('sample', 0.2, 50, 200)
+
+        metrics_file = tempfile.NamedTemporaryFile(suffix='.prom', delete=False).name
+        try:
+            metrics.write(metrics_file, {'samples_per_second': 2.5, 'status': 'ok'})
+            with open(metrics_file) as metrics_h:
+                lines = metrics_h.read().splitlines()
+        finally:
+            os.remove(metrics_file)
+
+        self.assertIn('irida_sistr_results_requests_total{endpoint="sample"} 2', lines)
+        self.assertIn('irida_sistr_results_response_bytes_total{endpoint="sample"} 150', lines)
+        self.assertIn('irida_sistr_results_request_duration_seconds_bucket{endpoint="sample",le="0.025"} 1', lines)
+        self.assertIn('irida_sistr_results_request_duration_seconds_bucket{endpoint="sample",le="0.25"} 2', lines)
+        self.assertIn('irida_sistr_results_request_duration_seconds_bucket{endpoint="sample",le="+Inf"} 2', lines)
+        self.assertIn('irida_sistr_results_request_duration_seconds_count{endpoint="sample"} 2', lines)
+        self.assertIn('irida_sistr_results_run_samples_per_second 2.5', lines)
+        self.assertFalse([line for line in lines if 'run_status' in line], "Should only write numeric run stats")
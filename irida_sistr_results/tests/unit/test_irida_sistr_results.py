@@ -1,6 +1,7 @@
 import unittest
 from unittest.mock import Mock
 
+from irida_sistr_results.irida_api import SubmissionCandidate
 from irida_sistr_results.irida_sistr_results import IridaSistrResults
 from irida_sistr_results.sistr_info import SampleSistrInfo
 
@@ -9,14 +10,16 @@ class IridaSistrResultsTest(unittest.TestCase):
 
     def setUp(self):
         self.irida_api = Mock()
+        self.irida_api.get_sistr_info_for_candidates = Mock(
+            side_effect=lambda candidates: [candidate.sistr_info for candidate in candidates])
         self.irida_sistr_results = IridaSistrResults(self.irida_api, False, True)
 
-    def _create_sistr_info(self, workflow_id, qc_status, created_date, sample_id):
+    def _create_sistr_info(self, workflow_id, qc_status, created_date, sample_id, submission_id='1'):
         return SampleSistrInfo({
             'submission': {
                 'workflowId': workflow_id,
                 'createdDate': created_date,
-                'identifier': '1'
+                'identifier': submission_id
             },
             'has_results': True,
             'sistr_predictions': [{
@@ -31,6 +34,9 @@ class IridaSistrResultsTest(unittest.TestCase):
     def _create_project_sistr_results(self, workflow_id, sample_ids):
         return [self._create_sistr_info(workflow_id, 'PASS', 1500000000001, sample_id) for sample_id in sample_ids]
 
+    def _create_candidates(self, sistr_infos):
+        return [SubmissionCandidate.from_sistr_info(sistr_info) for sistr_info in sistr_infos]
+
     def _create_project_info(self, id):
         return {
             'identifier': str(id),
@@ -44,7 +50,7 @@ class IridaSistrResultsTest(unittest.TestCase):
 
         self.irida_api.get_user_project = Mock(return_value=self._create_project_info(1))
         self.irida_api.get_sistr_results_for_project = Mock(return_value=project_sistr_results)
-        self.irida_api.get_sistr_submissions_shared_to_project = Mock(return_value=[])
+        self.irida_api.get_sistr_submission_candidates_shared_to_project = Mock(return_value=[])
 
         results = self.irida_sistr_results.get_sistr_results_from_projects([1])
 
@@ -58,7 +64,8 @@ class IridaSistrResultsTest(unittest.TestCase):
 
         self.irida_api.get_user_project = Mock(return_value=self._create_project_info(1))
         self.irida_api.get_sistr_results_for_project = Mock(return_value=project_sistr_results)
-        self.irida_api.get_sistr_submissions_shared_to_project = Mock(return_value=[shared_results])
+        self.irida_api.get_sistr_submission_candidates_shared_to_project = Mock(
+            return_value=self._create_candidates([shared_results]))
 
         results = self.irida_sistr_results.get_sistr_results_from_projects([1])
 
@@ -71,7 +78,8 @@ class IridaSistrResultsTest(unittest.TestCase):
 
         self.irida_api.get_user_project = Mock(return_value=self._create_project_info(1))
         self.irida_api.get_sistr_results_for_project = Mock(return_value=project_sistr_results)
-        self.irida_api.get_sistr_submissions_shared_to_project = Mock(return_value=[shared_results])
+        self.irida_api.get_sistr_submission_candidates_shared_to_project = Mock(
+            return_value=self._create_candidates([shared_results]))
 
         results = self.irida_sistr_results.get_sistr_results_from_projects([1])
 
@@ -84,7 +92,8 @@ class IridaSistrResultsTest(unittest.TestCase):
 
         self.irida_api.get_user_project = Mock(return_value=self._create_project_info(1))
         self.irida_api.get_sistr_results_for_project = Mock(return_value=project_sistr_results)
-        self.irida_api.get_sistr_submissions_shared_to_project = Mock(return_value=[shared_results])
+        self.irida_api.get_sistr_submission_candidates_shared_to_project = Mock(
+            return_value=self._create_candidates([shared_results]))
 
         results = self.irida_sistr_results.get_sistr_results_from_projects([1])
 
@@ -100,7 +109,8 @@ class IridaSistrResultsTest(unittest.TestCase):
 
         self.irida_api.get_user_project = Mock(return_value=self._create_project_info(1))
         self.irida_api.get_sistr_results_for_project = Mock(return_value=project_sistr_results)
-        self.irida_api.get_sistr_submissions_shared_to_project = Mock(return_value=shared_results)
+        self.irida_api.get_sistr_submission_candidates_shared_to_project = Mock(
+            return_value=self._create_candidates(shared_results))
 
         results = self.irida_sistr_results.get_sistr_results_from_projects([1])
 
@@ -116,8 +126,90 @@ class IridaSistrResultsTest(unittest.TestCase):
 
         self.irida_api.get_user_project = Mock(return_value=self._create_project_info(1))
         self.irida_api.get_sistr_results_for_project = Mock(return_value=project_sistr_results)
-        self.irida_api.get_sistr_submissions_shared_to_project = Mock(return_value=shared_results)
+        self.irida_api.get_sistr_submission_candidates_shared_to_project = Mock(
+            return_value=self._create_candidates(shared_results))
 
         results = self.irida_sistr_results.get_sistr_results_from_projects([1])
 
         self.assertEqual(results, {'1': {'1': expected_results}}, "Did not get expected SISTR results")
+
+    def test_get_sistr_results_from_projects_skip_candidates(self):
+        irida_sistr_results = IridaSistrResults(self.irida_api, True, False)
+        project_sistr_results = self._create_project_sistr_results('92ecf046-ee09-4271-b849-7a82625d6b60', [1])
+        project_sistr_results.append(SampleSistrInfo.create_empty_info({'identifier': '2', 'sampleName': 'name2'}))
+        user_results = [
+            self._create_sistr_info('92ecf046-ee09-4271-b849-7a82625d6b60', 'PASS', 1500000000002, 1, '11'),
+            self._create_sistr_info('92ecf046-ee09-4271-b849-7a82625d6b60', 'PASS', 1500000000002, 2, '12'),
+            self._create_sistr_info('92ecf046-ee09-4271-b849-7a82625d6b60', 'PASS', 1500000000002, 3, '13')
+        ]
+
+        self.irida_api.get_user_project = Mock(return_value=self._create_project_info(1))
+        self.irida_api.get_sistr_results_for_project = Mock(return_value=project_sistr_results)
+        self.irida_api.get_sistr_submission_candidates_shared_to_project = Mock(return_value=[])
+        self.irida_api.get_sistr_submission_candidates_for_user = Mock(
+            return_value=self._create_candidates(user_results))
+
+        results = irida_sistr_results.get_sistr_results_from_projects([1])
+
+        self.assertEqual({'1': project_sistr_results[0], '2': user_results[1]}, results['1'])
+        self.irida_api.get_sistr_info_for_candidates.assert_called_once()
+        loaded_candidates = self.irida_api.get_sistr_info_for_candidates.call_args[0][0]
+        self.assertEqual(['12'], [c.submission_id for c in loaded_candidates],
+                         "Should only load results which could replace a sample without results")
+
+    def test_get_sistr_results_from_projects_jobs(self):
+        irida_sistr_results = IridaSistrResults(self.irida_api, False, True, jobs=3)
+        project_sistr_results = {
+            str(p): self._create_project_sistr_results('92ecf046-ee09-4271-b849-7a82625d6b60', [p, p + 10])
+            for p in range(1, 6)
+        }
+        # sample 2 is shared between projects 2 and 3, this shared result replaces it in both
+        shared_results = self._create_sistr_info('92ecf046-ee09-4271-b849-7a82625d6b60', 'PASS', 1500000000002, 2)
+        project_sistr_results['3'].append(self._create_sistr_info('92ecf046-ee09-4271-b849-7a82625d6b60', 'PASS',
+                                                                  1500000000001, 2))
+
+        self.irida_api.get_user_project = Mock(side_effect=self._create_project_info)
+        self.irida_api.get_sistr_results_for_project = Mock(side_effect=lambda p, w, d, k: project_sistr_results[p])
+        self.irida_api.get_sistr_submission_candidates_shared_to_project = Mock(
+            side_effect=lambda p, w: self._create_candidates([shared_results]) if p == '5' else [])
+
+        results = irida_sistr_results.get_sistr_results_from_projects(range(1, 6))
+
+        self.assertEqual(['1', '2', '3', '4', '5'], list(results.keys()), "Projects should be in order")
+        self.assertEqual(shared_results, results['2']['2'], "Shared result should replace result in project 2")
+        self.assertEqual(shared_results, results['3']['2'], "Shared result should replace result in project 3")
+        self.assertEqual(['2', '3'], irida_sistr_results.sample_project['2'], "Should track projects for sample")
+
+    def test_iter_sistr_results_from_projects(self):
+        irida_sistr_results = IridaSistrResults(self.irida_api, True, True, jobs=2)
+        project_sistr_results = {
+            str(p): self._create_project_sistr_results('92ecf046-ee09-4271-b849-7a82625d6b60', [p, p + 10])
+            for p in range(1, 4)
+        }
+        shared_results = self._create_sistr_info('92ecf046-ee09-4271-b849-7a82625d6b60', 'PASS', 1500000000002, 2)
+        user_results = self._create_sistr_info('92ecf046-ee09-4271-b849-7a82625d6b60', 'PASS', 1500000000003, 13)
+
+        self.irida_api.get_user_project = Mock(side_effect=self._create_project_info)
+        self.irida_api.get_sistr_results_for_project = Mock(side_effect=lambda p, w, d, k: project_sistr_results[p])
+        self.irida_api.get_sistr_submission_candidates_shared_to_project = Mock(
+            side_effect=lambda p, w: self._create_candidates([shared_results]) if p == '2' else [])
+        self.irida_api.get_sistr_submission_candidates_for_user = Mock(
+            return_value=self._create_candidates([user_results]))
+
+        streamed_results = []
+        for project, results in irida_sistr_results.iter_sistr_results_from_projects([3, 1, 2]):
+            streamed_results.append((project, results))
+            self.assertEqual({}, irida_sistr_results.sistr_results, "Should release results of streamed projects")
+
+        self.assertEqual(['1', '2', '3'], [p for p, r in streamed_results], "Projects should be in order")
+        self.assertEqual(shared_results, streamed_results[1][1]['2'], "Shared result should replace result")
+        self.assertEqual(user_results, streamed_results[2][1]['13'], "User result should replace result")
+        self.assertEqual({}, irida_sistr_results.sample_project, "Should release samples of streamed projects")
+
+    def test_iter_sistr_results_from_projects_duplicate(self):
+        self.irida_api.get_user_project = Mock(return_value=self._create_project_info(1))
+        self.irida_api.get_sistr_results_for_project = Mock(return_value=[])
+        self.irida_api.get_sistr_submission_candidates_shared_to_project = Mock(return_value=[])
+
+        with self.assertRaises(Exception):
+            list(self.irida_sistr_results.iter_sistr_results_from_projects([1, 1]))
@@ -0,0 +1,133 @@
+import asyncio
+import threading
+import unittest
+
+from irida_sistr_results import irida_throttle
+from irida_sistr_results.irida_throttle import AdaptiveConcurrencyLimit, LatencyEstimate, RequestThrottle, TokenBucket
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class IridaThrottleTest(unittest.TestCase):
+
+    def test_token_bucket(self):
+        clock = FakeClock()
+        bucket = TokenBucket(10, burst=2, clock=clock)
+
+        self.assertEqual(0, bucket.reserve())
+        self.assertEqual(0, bucket.reserve(), "Should allow a burst")
+        self.assertAlmostEqual(0.1, bucket.reserve())
+        self.assertAlmostEqual(0.2, bucket.reserve(), "Should queue requests behind those already waiting")
+
+        clock.now = 10
+        self.assertEqual(0, bucket.reserve(), "Should refill over time")
+        self.assertEqual(0, bucket.reserve())
+        self.assertAlmostEqual(0.1, bucket.reserve(), "Should not refill beyond the burst")
+        self.assertEqual(3, bucket.delayed)
+
+    def test_latency_estimate(self):
+        estimate = LatencyEstimate()
+        for i in range(irida_throttle.LATENCY_WARMUP - 1):
+            estimate.observe(10.0)
+        self.assertEqual(600, estimate.get_timeout(600), "Should use maximum timeout until warmed up")
+
+        estimate.observe(10.0)
+        self.assertFalse(estimate.is_congested())
+        self.assertAlmostEqual(irida_throttle.TIMEOUT_MULTIPLIER * (10.0 + 4 * estimate.variation),
+                               estimate.get_timeout(600))
+        self.assertEqual(20, estimate.get_timeout(20), "Should not exceed maximum timeout")
+
+        for i in range(20):
+            estimate.observe(50.0)
+        self.assertTrue(estimate.is_congested(), "Should detect rising latency")
+        self.assertEqual(10.0, estimate.minimum)
+
+    def test_concurrency_limit(self):
+        limit = AdaptiveConcurrencyLimit(max_limit=10, initial_limit=2)
+
+        first, second = limit.acquire(), limit.acquire()
+        limit.release(first, False)
+        self.assertEqual(3, limit.limit)
+        third, fourth = limit.acquire(), limit.acquire()
+        for permit in [second, third, fourth]:
+            limit.release(permit, False)
+        self.assertEqual(4, limit.limit, "Should grow by one per request in slow start, while at the limit")
+
+        permits = [limit.acquire() for i in range(4)]
+        limit.release(permits[0], True)
+        self.assertEqual(2, limit.limit, "Should back off on congestion")
+        limit.release(permits[1], True)
+        self.assertEqual(2, limit.limit, "Should back off at most once per round trip")
+        limit.release(permits[2], False)
+        self.assertEqual(2.5, limit.limit, "Should grow additively after backing off")
+        limit.release(permits[3], False)
+        self.assertEqual(2.5, limit.limit, "Should not grow while not at the limit")
+
+        permits = [limit.acquire(), limit.acquire()]
+        limit.release(permits[0], True)
+        limit.release(permits[1], True)
+        limit.release(limit.acquire(), True)
+        self.assertEqual(1, limit.limit, "Should not go below minimum")
+        self.assertEqual((1, 4, 3), (limit.lowest_limit, limit.highest_limit, limit.decreases))
+
+    def test_concurrency_limit_blocks(self):
+        limit = AdaptiveConcurrencyLimit(max_limit=1, initial_limit=1)
+        permit = limit.acquire()
+
+        acquired = threading.Event()
+        thread = threading.Thread(target=lambda: acquired.set() if limit.acquire() is not None else None)
+        thread.start()
+        self.assertFalse(acquired.wait(0.1), "Should wait for a request in flight to complete")
+        limit.release(permit, False)
+        thread.join(5)
+        self.assertTrue(acquired.is_set())
+
+    def test_concurrency_limit_async(self):
+        limit = AdaptiveConcurrencyLimit(max_limit=2, initial_limit=2)
+        max_in_flight = []
+
+        async def request():
+            permit = await limit.acquire_async()
+            max_in_flight.append(limit.in_flight)
+            await asyncio.sleep(0.01)
+            limit.release(permit, False)
+
+        async def requests():
+            await asyncio.gather(*[request() for i in range(10)])
+
+        asyncio.run(requests())
+        self.assertEqual(2, max(max_in_flight))
+        self.assertEqual(0, limit.in_flight)
+
+    def test_throttle(self):
+        throttle = RequestThrottle(max_concurrency=8, adaptive_timeout=True)
+        self.assertEqual(600, throttle.get_timeout('sample', 600))
+
+        for i in range(irida_throttle.LATENCY_WARMUP):
+            throttle.release(throttle.acquire(), 'sample', 0.01, 200)
+        self.assertEqual(irida_throttle.TIMEOUT_MIN, throttle.get_timeout('sample', 600))
+        self.assertEqual(600, throttle.get_timeout('project', 600), "Should adapt timeouts per endpoint")
+
+        before = throttle.concurrency_limit.limit
+        throttle.release(throttle.acquire(), 'sample', 30, 500)
+        self.assertEqual(before / 2, throttle.concurrency_limit.limit, "Should back off on server errors")
+        self.assertEqual(irida_throttle.TIMEOUT_MIN, throttle.get_timeout('sample', 600),
+                         "Should not use latency of errors")
+
+        self.assertEqual(irida_throttle.RETRY_BACKOFF, throttle.get_retry_delay(0))
+        self.assertIsNone(throttle.get_retry_delay(irida_throttle.MAX_RETRIES))
+        self.assertEqual(1, len(throttle.format_summary()))
+
+    def test_throttle_disabled(self):
+        throttle = RequestThrottle()
+        self.assertIsNone(throttle.acquire())
+        throttle.release(None, 'sample', 1, 200)
+        self.assertEqual(600, throttle.get_timeout('sample', 600))
+        self.assertEqual([], throttle.format_summary())
@@ -0,0 +1,124 @@
+import json
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+
+from irida_sistr_results.irida_connector import IridaConnector
+from irida_sistr_results.irida_token import IridaTokenManager
+
+
+class IridaTokenManagerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.token_dir = tempfile.mkdtemp()
+        self.token_file = os.path.join(self.token_dir, 'tokens.json')
+        self.granted = []
+        self.oauth_service = Mock()
+        self.oauth_service.access_token_url = 'http://localhost/api/oauth/token'
+        self.oauth_service.client_id = 'client'
+        self.oauth_service.get_raw_access_token = Mock(side_effect=self._grant_token)
+
+    def tearDown(self):
+        shutil.rmtree(self.token_dir)
+
+    def _grant_token(self, data):
+        self.granted.append(data['grant_type'])
+        response = Mock()
+        response.json.return_value = {
+            'access_token': 'token' + str(len(self.granted)),
+            'refresh_token': 'refresh' + str(len(self.granted)),
+            'expires_in': 3600
+        }
+        return response
+
+    def _create_token_manager(self, token_file=None):
+        return IridaTokenManager(self.oauth_service, 'user', 'password', token_file)
+
+    def test_get_access_token(self):
+        token_manager = self._create_token_manager()
+        self.assertEqual('token1', token_manager.get_access_token(), "Should have requested token")
+        self.assertEqual('token1', token_manager.get_access_token(), "Should have reused token")
+        self.assertEqual(['password'], self.granted, "Should only request one token")
+
+    def test_get_access_token_invalid_credentials(self):
+        response = Mock()
+        response.json.return_value = {'error': 'invalid_grant'}
+        self.oauth_service.get_raw_access_token = Mock(return_value=response)
+        self.assertRaises(KeyError, self._create_token_manager().get_access_token)
+
+    def test_get_access_token_expired(self):
+        token_manager = self._create_token_manager()
+        token_manager.get_access_token()
+        token_manager._token['expires_at'] = 0
+        self.assertEqual('token2', token_manager.get_access_token(), "Should have refreshed expired token")
+        self.assertEqual(['password', 'refresh_token'], self.granted, "Should use refresh token")
+
+    def test_refresh(self):
+        token_manager = self._create_token_manager()
+        token_manager.get_access_token()
+        self.assertEqual('token2', token_manager.refresh('token1'), "Should have refreshed rejected token")
+        self.assertEqual('token2', token_manager.refresh('token1'), "Should not refresh an already refreshed token")
+        self.assertEqual(['password', 'refresh_token'], self.granted, "Should only refresh once")
+
+    def test_refresh_failed(self):
+        token_manager = self._create_token_manager()
+        token_manager.get_access_token()
+        failed_response = Mock()
+        failed_response.json.return_value = {'error': 'invalid_token'}
+        self.oauth_service.get_raw_access_token = Mock(
+            side_effect=lambda data: failed_response if data['grant_type'] == 'refresh_token' else self._grant_token(
+                data))
+        self.assertEqual('token2', token_manager.refresh('token1'), "Should authenticate again")
+        self.assertEqual(['password', 'password'], self.granted, "Should have used password")
+
+    def test_stored_token(self):
+        self._create_token_manager(self.token_file).get_access_token()
+        self.assertEqual(stat.S_IRUSR | stat.S_IWUSR, stat.S_IMODE(os.stat(self.token_file).st_mode),
+                         "Only the user should be able to read the stored tokens")
+
+        self.assertEqual('token1', self._create_token_manager(self.token_file).get_access_token(),
+                         "Should reuse stored token")
+        self.assertEqual(['password'], self.granted, "Should only request one token")
+
+    def test_stored_token_expired(self):
+        self._create_token_manager(self.token_file).get_access_token()
+        with open(self.token_file) as token_file_h:
+            tokens = json.load(token_file_h)
+        for token in tokens.values():
+            token['expires_at'] = 0
+        with open(self.token_file, 'w') as token_file_h:
+            json.dump(tokens, token_file_h)
+
+        self.assertEqual('token2', self._create_token_manager(self.token_file).get_access_token(),
+                         "Should refresh expired stored token")
+        self.assertEqual(['password', 'refresh_token'], self.granted, "Should use stored refresh token")
+
+
+class IridaConnectorTokenTest(unittest.TestCase):
+
+    @patch('irida_sistr_results.irida_connector.IridaTokenManager')
+    def test_get_unauthorized(self, token_manager_class):
+        token_manager = token_manager_class.return_value
+        token_manager.get_access_token.return_value = 'token1'
+        token_manager.refresh.return_value = 'token2'
+        connector = IridaConnector('client', 'secret', 'user', 'password', 'http://localhost/irida', 10)
+
+        unauthorized = Mock(status_code=401, content=b'')
+        ok = Mock(status_code=200, ok=True, content=b'{}')
+        ok.json.return_value = {'resource': {'identifier': '1'}}
+        connector.session.get = Mock(side_effect=[unauthorized, ok])
+
+        self.assertEqual({'identifier': '1'}, connector.get('/api/projects/1'), "Should get resource")
+        token_manager.refresh.assert_called_once_with('token1')
+        self.assertEqual('Bearer token2', connector.session.get.call_args[1]['headers']['Authorization'],
+                         "Should retry with refreshed token")
+        self.assertEqual('http://localhost/irida/api/projects/1', connector.session.get.call_args[0][0],
+                         "Should request full url")
+
+        project_metrics = connector.get_request_metrics().get_endpoint_metrics()['project']
+        self.assertEqual(2, project_metrics.requests)
+        self.assertEqual(1, project_metrics.errors, "Should count unauthorized response as an error")
+        self.assertEqual(1, project_metrics.retries, "Should count retry with refreshed token")
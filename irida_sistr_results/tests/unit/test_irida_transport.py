@@ -0,0 +1,61 @@
+import gzip
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from irida_sistr_results.irida_transport import configure_session
+
+
+class GzipJsonHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = json.dumps({'resource': {'path': self.path}}).encode('utf-8')
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        return
+
+
+class IridaTransportTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), GzipJsonHandler)
+        self.server_thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.server_thread.start()
+        self.url = 'http://127.0.0.1:' + str(self.server.server_port)
+
+        self.session = requests.Session()
+        self.adapter = configure_session(self.session, pool_size=2)
+
+    def tearDown(self):
+        self.session.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connections_reused(self):
+        for i in range(5):
+            response = self.session.get(self.url + '/api/' + str(i))
+            self.assertEqual({'resource': {'path': '/api/' + str(i)}}, response.json(), "Did not get expected JSON")
+
+        connection_stats = self.adapter.connection_stats
+        self.assertEqual(5, connection_stats.requests_sent, "Did not count requests")
+        self.assertEqual(1, connection_stats.connections_opened, "Should have opened one connection")
+        self.assertEqual(4, connection_stats.get_connections_reused(), "Should have reused connection")
+
+    def test_gzip(self):
+        response = self.session.get(self.url + '/api/file', headers={'Accept': 'text/plain'})
+
+        self.assertEqual('gzip', response.headers['Content-Encoding'], "Response should be compressed")
+        self.assertEqual({'resource': {'path': '/api/file'}}, response.json(), "Should transparently decompress")
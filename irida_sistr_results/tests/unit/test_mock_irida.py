@@ -0,0 +1,289 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+from requests.exceptions import HTTPError
+
+from irida_sistr_results.irida_api import TRAVERSAL_PROJECT, TRAVERSAL_SAMPLES, IridaAPI
+from irida_sistr_results.irida_async import AsyncIridaAPI, AsyncIridaConnector, aiohttp
+from irida_sistr_results.irida_cache import IridaResponseCache
+from irida_sistr_results.irida_connector import IridaConnector
+from irida_sistr_results.irida_sistr_results import IridaSistrResults
+from irida_sistr_results.irida_throttle import RequestThrottle
+from irida_sistr_results.tests.mock_irida import MockIridaData, MockIridaServer
+
+
+class MockIridaTest(unittest.TestCase):
+    """End-to-end tests loading results from a MockIridaServer"""
+
+    def setUp(self):
+        self.data = MockIridaData.generate(projects=3, samples_per_project=20, duplicate_submission_rate=0.3,
+                                           shared_sample_rate=0.1, incomplete_rate=0.2, shared_submission_rate=0.1,
+                                           user_submission_rate=0.1, seed=1)
+        self.server = MockIridaServer(self.data).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def _create_irida_api(self, jobs=1, throttle=None, traversal=TRAVERSAL_SAMPLES, max_in_flight=None):
+        connector = IridaConnector('client', 'secret', 'user', 'password', self.server.url, 10, throttle=throttle,
+                                   max_in_flight=max_in_flight)
+        return IridaAPI(connector, ['Enteritidis'], jobs, traversal)
+
+    def _get_completed_submission_ids(self, sample_id):
+        return [pair['submission_id'] for pair in self.data.pairs.values()
+                if pair['sample_id'] == sample_id and pair['submission_id'] is not None and
+                self.data.submissions[pair['submission_id']]['analysisState'] == 'COMPLETED']
+
+    def test_get_sistr_results_all_projects(self):
+        irida_api = self._create_irida_api(jobs=4)
+        sistr_results = IridaSistrResults(irida_api, True, True).get_sistr_results_all_projects()
+        irida_api.close()
+
+        self.assertEqual(sorted(self.data.projects.keys()), sorted(sistr_results.keys()))
+        for project_id, project in self.data.projects.items():
+            self.assertEqual(sorted(project['sample_ids']), sorted(sistr_results[project_id].keys()),
+                             "Should have results for all samples in project " + project_id)
+            for sample_id, result in sistr_results[project_id].items():
+                submission_ids = self._get_completed_submission_ids(sample_id)
+                if submission_ids:
+                    self.assertIn(result.get_submission_identifier(), submission_ids,
+                                  "Should have completed result for sample " + sample_id)
+                else:
+                    self.assertFalse(result.has_sistr_results(), "Should have no results for sample " + sample_id)
+
+        self.assertEqual(1, self.server.tokens_granted, "Should only request one token")
+        self.assertEqual(len(self.data.projects), self.server.requests['project_samples'])
+
+        endpoint_metrics = irida_api.irida_connector.get_request_metrics().get_endpoint_metrics()
+        for endpoint, route in [('project_samples', 'project_samples'), ('sample_pairs', 'sample_pairs'),
+                                ('pair_analysis_submission', 'pair_sistr'), ('analysis', 'submission_analysis'),
+                                ('predictions_file', 'submission_predictions')]:
+            self.assertEqual(self.server.requests[route], endpoint_metrics[endpoint].requests,
+                             "Should count requests to " + endpoint)
+
+        progress = irida_api.progress
+        self.assertEqual(len(self.data.projects), progress.projects_done)
+        self.assertEqual(sum(len(project['sample_ids']) for project in self.data.projects.values()),
+                         progress.samples_done)
+        self.assertEqual(progress.samples_done, progress.get_estimated_samples())
+        self.assertEqual(0, irida_api.irida_connector.get_request_metrics().in_flight)
+
+    def test_get_sistr_results_skips_user_submissions(self):
+        irida_api = self._create_irida_api(jobs=4)
+        sistr_results = IridaSistrResults(irida_api, True, True)
+        results = sistr_results.get_sistr_results_from_projects(['1'])
+        irida_api.close()
+
+        project_sample_ids = self.data.projects['1']['sample_ids']
+        project_submission_ids = [submission_id for sample_id in project_sample_ids for submission_id in
+                                  self._get_completed_submission_ids(sample_id)]
+        other_user_submission_ids = {submission_id for submission_id in self.data.user_submission_ids if
+                                     submission_id not in project_submission_ids and
+                                     self.data.submissions[submission_id]['analysisState'] == 'COMPLETED'}
+        self.assertTrue(other_user_submission_ids, "Should have user submissions for samples in other projects")
+
+        self.assertEqual(sorted(project_sample_ids), sorted(results['1'].keys()))
+        self.assertEqual(len(project_submission_ids) - irida_api.submissions_superseded,
+                         self.server.requests['submission_predictions'],
+                         "Should only load predictions of submissions for samples in the project")
+        self.assertEqual(len(other_user_submission_ids), sistr_results.get_submissions_skipped())
+
+    def test_get_sistr_results_project_traversal(self):
+        # All automated submissions are listed in the analyses of their sample's project, along with newer submissions
+        # run by a user on some pairs
+        self.server.stop()
+        self.data = MockIridaData.generate(projects=3, samples_per_project=20, duplicate_submission_rate=0.3,
+                                           shared_sample_rate=0.1, incomplete_rate=0.2, shared_submission_rate=1.0,
+                                           user_run_submission_rate=0.2, seed=1)
+        self.server = MockIridaServer(self.data).start()
+        user_run_submission_ids = [submission_id for submission_id, submission in self.data.submissions.items()
+                                   if self.data.pairs[submission['pair_id']]['submission_id'] != submission_id]
+        self.assertTrue(user_run_submission_ids, "Should have submissions run by a user shared with projects")
+
+        for update_existing in [True, False]:
+            results = {}
+            requests = {}
+            for traversal in [TRAVERSAL_SAMPLES, TRAVERSAL_PROJECT]:
+                requests_before = sum(self.server.requests.values())
+                irida_api = self._create_irida_api(jobs=4, traversal=traversal)
+                sistr_results = IridaSistrResults(irida_api, False, update_existing).get_sistr_results_all_projects()
+                irida_api.close()
+                results[traversal] = {(project_id, sample_id): (result.get_submission_identifier(),
+                                                                result.get_qc_status())
+                                      for project_id, project_results in sistr_results.items()
+                                      for sample_id, result in project_results.items()}
+                requests[traversal] = sum(self.server.requests.values()) - requests_before
+
+            self.assertEqual(results[TRAVERSAL_SAMPLES], results[TRAVERSAL_PROJECT],
+                             "Should pick the same results as traversing samples")
+            self.assertLess(requests[TRAVERSAL_PROJECT], requests[TRAVERSAL_SAMPLES],
+                            "Should send fewer requests than traversing samples")
+
+        for (project_id, sample_id), (submission_id, qc_status) in results[TRAVERSAL_PROJECT].items():
+            if submission_id in user_run_submission_ids:
+                self.assertFalse(self._get_completed_submission_ids(sample_id),
+                                 "Should only use submissions run by a user for samples with no automated results")
+
+    def test_get_sistr_results_avoids_known_requests(self):
+        irida_api = self._create_irida_api(jobs=4)
+        IridaSistrResults(irida_api, False, True).get_sistr_results_all_projects()
+        irida_api.close()
+
+        submissions_loaded = self.server.requests['submission_predictions']
+        self.assertEqual(0, self.server.requests['submission_unpaired'],
+                         "Should know automated submissions have no unpaired input files")
+        self.assertEqual(0, self.server.requests['sample'], "Should use sample listed for project")
+        self.assertEqual(0, self.server.requests['submission'], "Should use submissions as listed for project")
+        self.assertEqual(submissions_loaded, irida_api.requests_avoided['sample'])
+        self.assertLess(self.server.requests['submission_pairs'], irida_api.requests_avoided['submission_inputs'])
+
+    def _get_results_all_projects(self, irida_results, stream):
+        if stream:
+            sistr_results = dict(irida_results.iter_sistr_results_all_projects())
+        else:
+            sistr_results = irida_results.get_sistr_results_all_projects()
+        return {(project_id, sample_id): (result.get_submission_identifier(), result.get_qc_status())
+                for project_id, project_results in sistr_results.items()
+                for sample_id, result in project_results.items()}
+
+    @unittest.skipIf(aiohttp is None, "aiohttp not installed")
+    def test_async_engine_cache(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        cache = IridaResponseCache(os.path.join(cache_dir, 'cache.sqlite'))
+        self.addCleanup(cache.close)
+
+        cache_threads = set()
+
+        def record_cache_thread(fn):
+            def record(*args):
+                cache_threads.add(threading.current_thread().name)
+                return fn(*args)
+            return record
+
+        results = []
+        for run in range(2):
+            connector = IridaConnector('client', 'secret', 'user', 'password', self.server.url, 10, cache=cache)
+            irida_api = AsyncIridaAPI(AsyncIridaConnector(connector), ['Enteritidis'])
+            with patch.object(cache, 'get', record_cache_thread(cache.get)), \
+                    patch.object(cache, 'put', record_cache_thread(cache.put)):
+                results.append(self._get_results_all_projects(IridaSistrResults(irida_api, False, True), False))
+            irida_api.close()
+            if run == 0:
+                predictions_requests = self.server.requests['submission_predictions']
+
+        self.assertEqual(results[0], results[1])
+        self.assertGreater(cache.hits, 0)
+        self.assertEqual(predictions_requests, self.server.requests['submission_predictions'],
+                         "Should read predictions from the cache")
+        self.assertTrue(cache_threads)
+        self.assertNotIn('irida-async', cache_threads, "Should not read/write the cache on the event loop thread")
+
+    def test_resume_from_checkpoint(self):
+        checkpoint_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, checkpoint_dir)
+        checkpoint_file = os.path.join(checkpoint_dir, 'checkpoint.jsonl')
+
+        for stream in [False, True]:
+            irida_api = self._create_irida_api(jobs=4)
+            expected_results = self._get_results_all_projects(IridaSistrResults(irida_api, True, True), stream)
+            irida_api.close()
+
+            irida_api = self._create_irida_api(jobs=4)
+            get_sistr_results_for_project = irida_api.get_sistr_results_for_project
+
+            def fail_project(project, *args):
+                if project == '3':
+                    raise HTTPError("Timed out")
+                return get_sistr_results_for_project(project, *args)
+
+            with patch.object(irida_api, 'get_sistr_results_for_project', side_effect=fail_project):
+                with self.assertRaises(HTTPError):
+                    self._get_results_all_projects(
+                        IridaSistrResults(irida_api, True, True, checkpoint_file=checkpoint_file), stream)
+            irida_api.close()
+
+            project_samples_before = self.server.requests['project_samples']
+            irida_api = self._create_irida_api(jobs=4)
+            irida_results = IridaSistrResults(irida_api, True, True, checkpoint_file=checkpoint_file, resume=True)
+            results = self._get_results_all_projects(irida_results, stream)
+            irida_api.close()
+
+            self.assertEqual(expected_results, results, "Should have same results as a run which did not fail")
+            self.assertEqual(1, self.server.requests['project_samples'] - project_samples_before,
+                             "Should only load project which was not completed")
+            self.assertEqual(1, irida_api.progress.projects_done)
+
+            irida_results.remove_checkpoint()
+            self.assertFalse(os.path.exists(checkpoint_file))
+
+    def test_max_in_flight(self):
+        self.server.latency = 0.005
+        irida_api = self._create_irida_api(jobs=4, max_in_flight=2)
+        request_metrics = irida_api.irida_connector.get_request_metrics()
+
+        # The project and sample pools each have 4 threads, but their requests share the one limit
+        lock = threading.Lock()
+        projects_in_flight = [0]
+        peak_projects_in_flight = []
+        peak_in_flight = []
+        request_started = request_metrics.request_started
+        get_sistr_results_for_project = irida_api.get_sistr_results_for_project
+
+        def record_peak_in_flight():
+            request_started()
+            peak_in_flight.append(request_metrics.in_flight)
+
+        def record_peak_projects_in_flight(*args, **kwargs):
+            with lock:
+                projects_in_flight[0] += 1
+                peak_projects_in_flight.append(projects_in_flight[0])
+            try:
+                return get_sistr_results_for_project(*args, **kwargs)
+            finally:
+                with lock:
+                    projects_in_flight[0] -= 1
+
+        with patch.object(request_metrics, 'request_started', record_peak_in_flight), \
+                patch.object(irida_api, 'get_sistr_results_for_project', record_peak_projects_in_flight):
+            sistr_results = IridaSistrResults(irida_api, True, True, jobs=4).get_sistr_results_all_projects()
+        irida_api.close()
+
+        self.assertEqual(sorted(self.data.projects.keys()), sorted(sistr_results.keys()))
+        self.assertGreater(max(peak_projects_in_flight), 1, "Should load several projects at once")
+        self.assertLessEqual(max(peak_in_flight), 2, "Should have at most max_in_flight requests at once")
+        self.assertEqual(0, request_metrics.in_flight)
+
+    def test_token_expired(self):
+        irida_api = self._create_irida_api()
+        irida_api.get_user_project('1')
+        self.server.expire_tokens()
+        self.assertEqual('1', irida_api.get_user_project('1')['identifier'], "Should refresh token")
+        self.assertEqual(2, self.server.tokens_granted)
+
+    def test_errors(self):
+        self.server.error_rate = 1
+        irida_api = self._create_irida_api()
+
+        self.assertRaises(HTTPError, irida_api.get_user_projects)
+        self.assertEqual(1, self.server.errors)
+
+    @patch('irida_sistr_results.irida_throttle.RETRY_BACKOFF', 0.001)
+    def test_throttle_retries_errors(self):
+        self.server.error_rate = 0.05
+        throttle = RequestThrottle(rate_limit=1000, max_concurrency=4, adaptive_timeout=True)
+        irida_api = self._create_irida_api(jobs=4, throttle=throttle)
+        sistr_results = IridaSistrResults(irida_api, False, False).get_sistr_results_all_projects()
+        irida_api.close()
+
+        self.assertEqual(sum(len(project['sample_ids']) for project in self.data.projects.values()),
+                         sum(len(project_results) for project_results in sistr_results.values()))
+        self.assertGreater(self.server.errors, 0)
+        self.assertEqual(self.server.errors, irida_api.irida_connector.get_request_metrics().get_total('retries'),
+                         "Should retry each server error")
+        self.assertGreater(throttle.concurrency_limit.decreases, 0, "Should back off on server errors")
+        self.assertEqual(0, throttle.concurrency_limit.in_flight)
@@ -0,0 +1,111 @@
+import io
+import unittest
+from unittest.mock import Mock
+
+from irida_sistr_results.progress import Progress, ProgressReporter
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class ProgressTest(unittest.TestCase):
+
+    def setUp(self):
+        self.progress = Progress()
+        self.progress.add_projects(4)
+        self.clock = FakeClock()
+
+    def test_estimated_samples(self):
+        self.assertEqual(0, self.progress.get_estimated_samples())
+
+        self.progress.project_listed(10)
+        self.assertEqual(40, self.progress.get_estimated_samples(), "Should extrapolate from listed projects")
+
+        self.progress.project_listed(20)
+        self.assertEqual(60, self.progress.get_estimated_samples())
+
+        self.progress.project_listed(5)
+        self.progress.project_listed(0)
+        self.assertEqual(35, self.progress.get_estimated_samples(), "Should be exact once all projects are listed")
+
+    def test_status(self):
+        reporter = ProgressReporter(self.progress, Mock(in_flight=3), Mock(get_hit_rate=lambda: 0.25), mode='log',
+                                    clock=self.clock)
+        for project in range(4):
+            self.progress.project_listed(25)
+
+        reporter.tick()
+        for second in range(10):
+            self.clock.now += 1
+            for sample in range(2):
+                self.progress.sample_done()
+            reporter.tick()
+        self.progress.project_done()
+
+        status = reporter.get_status()
+        self.assertEqual(1, status['projects_done'])
+        self.assertEqual(20, status['samples_done'])
+        self.assertEqual(100, status['samples_total'])
+        self.assertEqual(2.0, status['rate'])
+        self.assertEqual(40.0, status['eta'])
+        self.assertEqual(10.0, status['elapsed'])
+
+        self.assertEqual('Progress: samples=20/100 percent=20.0% projects=1/4 rate=2.0/s in_flight=3 '
+                         'cache_hit_rate=25.0% elapsed=0:00:10 eta=0:00:40', reporter.format_log_line(status))
+
+    def test_status_unknown(self):
+        reporter = ProgressReporter(self.progress, mode='log', clock=self.clock)
+        reporter.tick()
+
+        status = reporter.get_status()
+        self.assertIsNone(status['rate'])
+        self.assertIsNone(status['eta'])
+        self.assertEqual('Progress: samples=0/0 percent=? projects=0/4 rate=? elapsed=0:00:00 eta=?',
+                         reporter.format_log_line(status))
+
+    def test_log_interval(self):
+        reporter = ProgressReporter(self.progress, mode='log', interval=60, clock=self.clock)
+        with self.assertLogs('irida-progress') as logs:
+            for second in range(150):
+                self.clock.now += 1
+                reporter.tick()
+            reporter.tick(final=True)
+
+        self.assertEqual(3, len(logs.records), "Should log every interval and at the end")
+
+    def test_bar(self):
+        stream = io.StringIO()
+        reporter = ProgressReporter(self.progress, mode='bar', stream=stream, clock=self.clock)
+        for project in range(4):
+            self.progress.project_listed(10)
+        for sample in range(20):
+            self.progress.sample_done()
+
+        reporter.start()
+        reporter.stop()
+
+        lines = stream.getvalue().split('\r')
+        self.assertEqual('\n', lines[-1][-1], "Should end the bar with a newline")
+        self.assertTrue(lines[-1].startswith('[' + '#' * 15 + '.' * 15 + ']  50.0% 20/40 samples, 0/4 projects'))
+
+    def test_auto_mode(self):
+        self.assertEqual('log', ProgressReporter(self.progress, stream=io.StringIO()).mode,
+                         "Should log when not on a terminal")
+        self.assertEqual('bar', ProgressReporter(self.progress, stream=Mock(isatty=lambda: True)).mode)
+
+    def test_none_mode(self):
+        stream = io.StringIO()
+        reporter = ProgressReporter(self.progress, mode='none', stream=stream)
+        with reporter:
+            self.assertIsNone(reporter._thread)
+        self.assertEqual('', stream.getvalue())
+
+    def test_invalid_mode(self):
+        with self.assertRaises(ValueError):
+            ProgressReporter(self.progress, mode='spinner')
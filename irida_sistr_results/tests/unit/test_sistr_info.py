@@ -78,3 +78,53 @@ class SistrInfoTest(unittest.TestCase):
         self.assertFalse(info.is_reportable_serovar())
         self.assertEqual('FAIL', info.get_reportable_serovar_status())
         self.assertEqual(0, info.get_reportable_status_numerical())
+
+    def test_to_dict_from_dict(self):
+        info = SampleSistrInfo({
+            'sample': {
+                'identifier': '1',
+                'sampleName': 'sample1',
+                'createdDate': 1500000000000,
+                'links': []
+            },
+            'submission': {
+                'identifier': '10',
+                'workflowId': '92ecf046-ee09-4271-b849-7a82625d6b60',
+                'createdDate': 1500000000001,
+                'links': []
+            },
+            'paired_files': [{'identifier': '100', 'links': []}],
+            'sistr_predictions': [{
+                'serovar': 'serovar1',
+                'qc_status': 'PASS',
+                'cgmlst_matching_alleles': 330,
+                'alleles': {'NZ_AOXE01000059.1_31': 'allele'}
+            }],
+            'has_results': True
+        }, self.reportable_serovars)
+
+        data = info.to_dict()
+        self.assertNotIn('links', data['sample'], "Should only keep fields which are written out")
+        self.assertNotIn('alleles', data['sistr_predictions'][0], "Should only keep fields which are written out")
+
+        loaded_info = SampleSistrInfo.from_dict(data, self.reportable_serovars)
+        self.assertEqual(data, loaded_info.to_dict())
+        self.assertEqual('sample1', loaded_info.get_sample_name())
+        self.assertEqual('100', loaded_info.get_paired_id())
+        self.assertEqual(info.get_sample_created_date(), loaded_info.get_sample_created_date())
+        self.assertEqual(info.get_submission_created_date(), loaded_info.get_submission_created_date())
+        self.assertEqual(1.0, loaded_info.get_cgmlst_matching_proportion())
+        self.assertEqual(3, loaded_info.get_qc_status_numerical())
+        self.assertTrue(loaded_info.is_reportable_serovar())
+
+    def test_empty_info(self):
+        info = SampleSistrInfo.create_empty_info({'identifier': '1', 'sampleName': 'sample1',
+                                                  'createdDate': 1500000000000})
+
+        self.assertFalse(info.has_sistr_results())
+        self.assertEqual('MISSING', info.get_qc_status())
+        self.assertEqual(0, info.get_qc_status_numerical())
+        self.assertEqual('1', info.get_sample_id())
+        self.assertEqual({'has_results': False,
+                          'sample': {'identifier': '1', 'sampleName': 'sample1', 'createdDate': 1500000000000}},
+                         info.to_dict())
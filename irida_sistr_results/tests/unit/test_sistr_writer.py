@@ -0,0 +1,271 @@
+import csv
+import gzip
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+import zipfile
+from datetime import datetime
+from unittest.mock import Mock
+from xml.etree import ElementTree
+
+from irida_sistr_results.SistrResultsException import SistrResultsException
+from irida_sistr_results.sistr_info import SampleSistrInfo
+from irida_sistr_results.sistr_writer import SistrCsvWriter, SistrExcelWriter, SistrJsonLinesWriter, \
+    SistrMultiWriter, SistrParquetWriter, SistrSqliteWriter
+
+try:
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+XLSX_NAMESPACE = {'x': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+
+
+class SistrWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.out_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.out_dir)
+
+    def _create_sistr_info(self, sample_id, qc_status, serovar='Enteritidis', submission_created_date=1500000000001):
+        sample = {
+            'identifier': str(sample_id),
+            'sampleName': 'name' + str(sample_id),
+            'createdDate': 1500000000000
+        }
+
+        if qc_status is None:
+            return SampleSistrInfo.create_empty_info(sample)
+
+        return SampleSistrInfo({
+            'submission': {
+                'workflowId': '92ecf046-ee09-4271-b849-7a82625d6b60',
+                'createdDate': submission_created_date,
+                'identifier': str(sample_id * 10)
+            },
+            'paired_files': [{'identifier': str(sample_id * 100)}],
+            'has_results': True,
+            'sistr_predictions': [{
+                'qc_status': qc_status,
+                'serovar': serovar,
+                'cgmlst_matching_alleles': 165
+            }],
+            'sample': sample
+        }, ['Enteritidis'])
+
+    def _create_csv_writer(self, out_file):
+        return SistrCsvWriter('http://localhost/irida', 'appname', 'command line', 'user',
+                              os.path.join(self.out_dir, out_file))
+
+    def _open(self, out_file):
+        out_file = os.path.join(self.out_dir, out_file)
+        if out_file.endswith('.gz'):
+            return gzip.open(out_file, 'rt')
+        elif out_file.endswith('.zst'):
+            return zstandard.open(out_file, 'rt')
+        else:
+            return open(out_file)
+
+    def _read_csv(self, out_file):
+        with self._open(out_file) as out_file_h:
+            return [row for row in csv.reader(out_file_h, delimiter="\t") if not row[0].startswith('#')]
+
+    def test_write_csv_sorted(self):
+        writer = self._create_csv_writer('out.tsv')
+        writer.write({
+            '2': {'5': self._create_sistr_info(5, 'PASS')},
+            '1': {
+                '1': self._create_sistr_info(1, None),
+                '2': self._create_sistr_info(2, 'WARNING'),
+                '3': self._create_sistr_info(3, 'PASS', serovar='Typhi'),
+                '4': self._create_sistr_info(4, 'PASS')
+            }
+        })
+        writer.close()
+
+        rows = self._read_csv('out.tsv')
+        self.assertEqual(['Project ID', 'Sample Name', 'Reportable Serovar Status', 'QC Status'], rows[0][0:4])
+        self.assertEqual([['1', 'name4'], ['1', 'name3'], ['1', 'name2'], ['1', 'name1'], ['2', 'name5']],
+                         [row[0:2] for row in rows[1:]], "Should sort by project, reportable and QC status")
+        self.assertEqual('50.0%', rows[1][rows[0].index('cgMLST Percent Matching')])
+        self.assertEqual('', rows[4][rows[0].index('cgMLST Percent Matching')], "Should have no percent if missing")
+
+    def test_write_csv_gzip(self):
+        writer = self._create_csv_writer('out.tsv.gz')
+        writer.write({'1': {'1': self._create_sistr_info(1, 'PASS')}})
+        writer.close()
+
+        self.assertEqual([['1', 'name1']], [row[0:2] for row in self._read_csv('out.tsv.gz')[1:]])
+
+    @unittest.skipIf(zstandard is None, "zstandard is not installed")
+    def test_write_csv_zstd(self):
+        writer = self._create_csv_writer('out.tsv.zst')
+        writer.write({'1': {'1': self._create_sistr_info(1, 'PASS')}})
+        writer.close()
+
+        self.assertEqual([['1', 'name1']], [row[0:2] for row in self._read_csv('out.tsv.zst')[1:]])
+
+    def test_write_jsonl(self):
+        writer = SistrJsonLinesWriter('http://localhost/irida', 'appname', 'command line', 'user',
+                                      os.path.join(self.out_dir, 'out.jsonl.gz'))
+        writer.write({'1': {'1': self._create_sistr_info(1, 'PASS'), '2': self._create_sistr_info(2, None)}})
+        writer.close()
+
+        with self._open('out.jsonl.gz') as out_file_h:
+            results = [json.loads(line) for line in out_file_h]
+
+        self.assertEqual(['1', '2'], [result['sample_id'] for result in results])
+        self.assertEqual('PASS', results[0]['reportable_serovar_status'])
+        self.assertEqual(0.5, results[0]['cgmlst_matching_proportion'])
+        self.assertEqual(datetime.fromtimestamp(1500000000).isoformat(sep=' '), results[0]['sample_created_date'])
+        self.assertEqual('MISSING', results[1]['qc_status'])
+        self.assertIsNone(results[1]['serovar'])
+
+    def _read_excel_cells(self, out_file):
+        """Reads the value and style of each cell of the 'Data' worksheet, whether strings are shared or inline"""
+        with zipfile.ZipFile(os.path.join(self.out_dir, out_file)) as workbook:
+            shared_strings = []
+            if 'xl/sharedStrings.xml' in workbook.namelist():
+                shared_strings = [''.join(t.text or '' for t in si.iter('{' + XLSX_NAMESPACE['x'] + '}t')) for si in
+                                  ElementTree.fromstring(workbook.read('xl/sharedStrings.xml'))]
+            sheet = ElementTree.fromstring(workbook.read('xl/worksheets/sheet1.xml'))
+
+        cells = {}
+        for cell in sheet.iterfind('.//x:c', XLSX_NAMESPACE):
+            if cell.get('t') == 's':
+                value = shared_strings[int(cell.find('x:v', XLSX_NAMESPACE).text)]
+            elif cell.get('t') == 'inlineStr':
+                value = cell.find('x:is/x:t', XLSX_NAMESPACE).text
+            else:
+                value = cell.findtext('x:v', None, XLSX_NAMESPACE)
+            cells[cell.get('r')] = (value, cell.get('s'))
+        return cells
+
+    def test_write_excel_constant_memory(self):
+        results = {
+            '1': {'1': self._create_sistr_info(1, 'PASS'), '2': self._create_sistr_info(2, None),
+                  '3': self._create_sistr_info(3, 'FAIL', serovar='Typhi')},
+            '2': {'4': self._create_sistr_info(4, 'WARNING')}
+        }
+        for out_file, constant_memory in [('in_memory.xlsx', False), ('constant_memory.xlsx', True)]:
+            writer = SistrExcelWriter('http://localhost/irida', 'appname', 'command line', 'user',
+                                      os.path.join(self.out_dir, out_file), constant_memory=constant_memory)
+            writer.write(results)
+            writer.close()
+
+        cells = self._read_excel_cells('in_memory.xlsx')
+        self.assertEqual(('name1', cells['B2'][1]), cells['B2'], "Should have written sample names")
+        self.assertEqual(cells, self._read_excel_cells('constant_memory.xlsx'),
+                         "Should write the same cells in constant_memory mode")
+
+    def test_multi_writer(self):
+        writers = [self._create_csv_writer('out1.tsv'), self._create_csv_writer('out2.tsv')]
+        writer = SistrMultiWriter(writers)
+        writer.write({'1': {'1': self._create_sistr_info(1, 'PASS'), '2': self._create_sistr_info(2, 'FAIL')}})
+        writer.close()
+
+        self.assertEqual(3, len(self._read_csv('out1.tsv')))
+        self.assertEqual(self._read_csv('out1.tsv'), self._read_csv('out2.tsv'), "Should write same rows to both")
+
+    def test_multi_writer_rows_computed_once(self):
+        writers = [Mock(irida_url='http://localhost/irida', include_reportable_status=True) for i in range(2)]
+        writer = SistrMultiWriter(writers)
+        writer.write_project('1', {'1': self._create_sistr_info(1, 'PASS')})
+
+        rows = writers[0].write_project_rows.call_args[0][0]
+        self.assertEqual(1, len(rows))
+        self.assertIs(rows, writers[1].write_project_rows.call_args[0][0], "Should share rows between writers")
+
+    def test_multi_writer_different_settings(self):
+        writers = [Mock(irida_url='http://localhost/irida', include_reportable_status=True),
+                   Mock(irida_url='http://localhost/irida', include_reportable_status=False)]
+
+        self.assertRaises(SistrResultsException, SistrMultiWriter, writers)
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_write_parquet(self):
+        out_file = os.path.join(self.out_dir, 'out.parquet')
+        writer = SistrParquetWriter('http://localhost/irida', 'appname', 'command line', 'user', out_file,
+                                    row_group_size=2)
+        writer.write({
+            '1': {'1': self._create_sistr_info(1, 'PASS'), '2': self._create_sistr_info(2, None)},
+            '2': {'3': self._create_sistr_info(3, 'FAIL')}
+        })
+        writer.close()
+
+        parquet_file = pyarrow.parquet.ParquetFile(out_file)
+        self.assertEqual(2, parquet_file.num_row_groups, "Should write rows in groups of row_group_size")
+        self.assertEqual(b'appname', parquet_file.schema_arrow.metadata[b'appname'], "Should store run info")
+
+        table = parquet_file.read()
+        self.assertEqual([1, 1, 2], table.column('Project ID').to_pylist())
+        self.assertEqual([1, 2, 3], table.column('IRIDA Sample Identifier').to_pylist())
+        self.assertEqual([0.5, None, 0.5], table.column('cgMLST Percent Matching').to_pylist())
+        self.assertEqual(['PASS', 'MISSING', 'FAIL'], table.column('QC Status').to_pylist())
+        self.assertTrue(pyarrow.types.is_dictionary(table.schema.field('QC Status').type))
+        self.assertTrue(pyarrow.types.is_timestamp(table.schema.field('Sample Created Date').type))
+        self.assertEqual([100, None, 300], table.column('IRIDA File Pair Identifier').to_pylist())
+
+    def _write_sqlite(self, out_file, sistr_results):
+        writer = SistrSqliteWriter('http://localhost/irida', 'appname', 'command line', 'user', out_file)
+        writer.write(sistr_results)
+        writer.close()
+
+    def test_write_sqlite(self):
+        out_file = os.path.join(self.out_dir, 'out.sqlite')
+        self._write_sqlite(out_file, {
+            '1': {'1': self._create_sistr_info(1, 'PASS'), '2': self._create_sistr_info(2, None)},
+            '2': {'3': self._create_sistr_info(3, 'FAIL', serovar='Typhi')}
+        })
+
+        connection = sqlite3.connect(out_file)
+        sample_created_date = datetime.fromtimestamp(1500000000).isoformat(sep=' ')
+        self.assertEqual([(1, 1, 'PASS', 'Enteritidis', 0.5, sample_created_date)], connection.execute(
+            'SELECT project_id, sample_id, reportable_serovar_status, serovar, cgmlst_matching_proportion, '
+            "sample_created_date FROM results WHERE serovar = 'Enteritidis' AND qc_status = 'PASS'").fetchall())
+        self.assertEqual(3, connection.execute('SELECT COUNT(*) FROM results').fetchone()[0])
+        self.assertEqual([(1, 'appname', 'http://localhost/irida')],
+                         connection.execute('SELECT run_id, appname, irida_url FROM runs').fetchall())
+        self.assertIn('results_serovar', [row[0] for row in connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index'")])
+        connection.close()
+
+    def test_write_sqlite_upsert(self):
+        out_file = os.path.join(self.out_dir, 'out.sqlite')
+        self._write_sqlite(out_file, {
+            '1': {
+                '1': self._create_sistr_info(1, None),
+                '2': self._create_sistr_info(2, 'PASS'),
+                '3': self._create_sistr_info(3, 'FAIL'),
+                '4': self._create_sistr_info(4, 'PASS')
+            }
+        })
+        self._write_sqlite(out_file, {
+            '1': {
+                '1': self._create_sistr_info(1, 'FAIL'),
+                '2': self._create_sistr_info(2, 'FAIL', submission_created_date=1600000000000),
+                '3': self._create_sistr_info(3, 'PASS'),
+                '4': self._create_sistr_info(4, 'PASS', serovar='Typhi', submission_created_date=1600000000000),
+                '5': self._create_sistr_info(5, 'PASS')
+            }
+        })
+
+        connection = sqlite3.connect(out_file)
+        self.assertEqual([(1, 'FAIL', 2), (2, 'PASS', 1), (3, 'PASS', 2), (4, 'PASS', 2), (5, 'PASS', 2)],
+                         connection.execute('SELECT sample_id, qc_status, run_id FROM results '
+                                            'ORDER BY sample_id').fetchall(), "Should only replace worse results")
+        self.assertEqual('Typhi', connection.execute('SELECT serovar FROM results WHERE sample_id = 4').fetchone()[0],
+                         "Should replace with newer PASS result")
+        self.assertEqual(2, connection.execute('SELECT COUNT(*) FROM runs').fetchone()[0])
+        connection.close()
@@ -0,0 +1,179 @@
+import asyncio
+import json
+import os
+import threading
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from irida_sistr_results import tracing
+
+
+class TracingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.trace_file = tempfile.NamedTemporaryFile(delete=False).name
+
+    def tearDown(self):
+        tracing.stop_tracing()
+        os.remove(self.trace_file)
+
+    def _trace_work(self):
+        with tracing.span('project', project='1') as project_span:
+            project_span.set_attribute('samples', 2)
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                list(executor.map(tracing.propagate(self._trace_sample), ['1', '2']))
+
+        with self.assertRaises(ValueError):
+            with tracing.span('failed'):
+                raise ValueError('bad')
+
+    def _trace_sample(self, sample_id):
+        with tracing.span('sample', sample=sample_id):
+            with tracing.span('GET sample_pairs'):
+                tracing.current_span().set_attribute('status', 200)
+
+    def _trace_async_work(self):
+        loop = asyncio.new_event_loop()
+        loop_thread = threading.Thread(target=loop.run_forever, daemon=True)
+        loop_thread.start()
+        try:
+            with tracing.span('project', project='1'):
+                # Two batches of samples, so the lanes of the first are reused by the second
+                for sample_ids in [['1', '2'], ['3', '4']]:
+                    asyncio.run_coroutine_threadsafe(tracing.propagate_async(self._trace_samples_async(sample_ids)),
+                                                     loop).result()
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            loop_thread.join()
+            loop.close()
+
+    async def _trace_samples_async(self, sample_ids):
+        await asyncio.gather(*[self._trace_sample_async(sample_id) for sample_id in sample_ids])
+
+    async def _trace_sample_async(self, sample_id):
+        with tracing.span('sample', sample=sample_id):
+            await asyncio.gather(self._trace_request_async(), self._trace_request_async())
+
+    async def _trace_request_async(self):
+        with tracing.span('GET sample_pairs'):
+            await asyncio.sleep(0.001)
+
+    def _read_otlp_spans(self):
+        spans = []
+        with open(self.trace_file) as trace_h:
+            for line in trace_h:
+                spans.extend(json.loads(line)['resourceSpans'][0]['scopeSpans'][0]['spans'])
+        return spans
+
+    def test_disabled(self):
+        self.assertFalse(tracing.is_tracing())
+        self.assertIs(tracing.NO_SPAN, tracing.span('project'))
+        self.assertIs(tracing.NO_SPAN, tracing.current_span())
+        self.assertIs(len, tracing.propagate(len))
+        self._trace_work()
+
+    def test_chrome(self):
+        tracing.start_tracing(self.trace_file, 'chrome')
+        self.assertTrue(tracing.is_tracing())
+        self._trace_work()
+        tracing.stop_tracing()
+
+        with open(self.trace_file) as trace_h:
+            events = json.load(trace_h)['traceEvents']
+
+        spans = {}
+        for event in events:
+            if event['ph'] == 'X':
+                spans.setdefault(event['name'], []).append(event)
+        self.assertEqual(['GET sample_pairs', 'failed', 'project', 'sample'], sorted(spans.keys()))
+        self.assertEqual({'project': '1', 'samples': 2}, spans['project'][0]['args'])
+        self.assertEqual(['1', '2'], sorted(event['args']['sample'] for event in spans['sample']))
+        self.assertEqual({'status': 200}, spans['GET sample_pairs'][0]['args'])
+        self.assertEqual('ValueError: bad', spans['failed'][0]['args']['error'])
+
+        project = spans['project'][0]
+        for sample in spans['sample']:
+            self.assertNotEqual(project['tid'], sample['tid'], "Should run samples in worker threads")
+            self.assertTrue(project['ts'] <= sample['ts'] and
+                            sample['ts'] + sample['dur'] <= project['ts'] + project['dur'],
+                            "Should time samples within the project")
+
+        thread_names = [event for event in events if event['ph'] == 'M' and event['name'] == 'thread_name']
+        self.assertEqual(len(set(event['tid'] for event in events if event['ph'] == 'X')), len(thread_names),
+                         "Should name each thread")
+
+    def test_chrome_async(self):
+        tracing.start_tracing(self.trace_file, 'chrome')
+        self._trace_async_work()
+        tracing.stop_tracing()
+
+        with open(self.trace_file) as trace_h:
+            events = json.load(trace_h)['traceEvents']
+
+        spans = {}
+        for event in events:
+            if event['ph'] == 'X':
+                spans.setdefault(event['name'], []).append(event)
+        self.assertEqual(4, len(spans['sample']))
+        self.assertEqual(8, len(spans['GET sample_pairs']))
+
+        sample_lanes = set(event['tid'] for event in spans['sample'])
+        self.assertEqual(2, len(sample_lanes), "Should reuse the lanes of finished samples")
+        self.assertNotIn(spans['project'][0]['tid'], sample_lanes)
+        for request in spans['GET sample_pairs']:
+            self.assertIn(request['tid'], sample_lanes, "Should put requests in the lane of their sample")
+
+        thread_names = [event for event in events if event['ph'] == 'M' and event['name'] == 'thread_name']
+        self.assertEqual(3, len(thread_names), "Should have a lane for the thread and each concurrent sample")
+
+    def test_otlp_async(self):
+        tracing.start_tracing(self.trace_file, 'otlp')
+        self._trace_async_work()
+        tracing.stop_tracing()
+
+        spans = self._read_otlp_spans()
+        spans_by_id = {span['spanId']: span for span in spans}
+        self.assertEqual(13, len(spans))
+        for span in spans:
+            if span['name'] == 'sample':
+                self.assertEqual('project', spans_by_id[span['parentSpanId']]['name'],
+                                 "Should propagate parent to the event loop thread")
+            elif span['name'] != 'project':
+                self.assertEqual('sample', spans_by_id[span['parentSpanId']]['name'])
+
+    def test_otlp(self):
+        tracing.start_tracing(self.trace_file, 'otlp')
+        self._trace_work()
+        tracing.stop_tracing()
+
+        spans = self._read_otlp_spans()
+        spans_by_id = {span['spanId']: span for span in spans}
+        self.assertEqual(6, len(spans))
+        self.assertEqual(1, len(set(span['traceId'] for span in spans)), "Should write spans of a single trace")
+
+        for span in spans:
+            if span['name'] in ['project', 'failed']:
+                self.assertNotIn('parentSpanId', span)
+            elif span['name'] == 'sample':
+                self.assertEqual('project', spans_by_id[span['parentSpanId']]['name'],
+                                 "Should propagate parent to worker threads")
+            else:
+                self.assertEqual('sample', spans_by_id[span['parentSpanId']]['name'])
+                self.assertEqual([{'key': 'status', 'value': {'intValue': '200'}}], span['attributes'])
+                self.assertEqual(3, span['kind'])
+
+        failed = [span for span in spans if span['name'] == 'failed'][0]
+        self.assertEqual({'code': 2, 'message': 'ValueError: bad'}, failed['status'])
+
+    def test_otlp_batches(self):
+        tracer = tracing.start_tracing(self.trace_file, 'otlp')
+        for i in range(tracing.FLUSH_INTERVAL + 1):
+            with tracing.span('sample', sample=i):
+                pass
+        self.assertEqual(tracing.FLUSH_INTERVAL, tracer.spans_written, "Should write spans in batches")
+        tracing.stop_tracing()
+
+        with open(self.trace_file) as trace_h:
+            self.assertEqual(2, len(trace_h.readlines()))
+        self.assertEqual(tracing.FLUSH_INTERVAL + 1, len(self._read_otlp_spans()))
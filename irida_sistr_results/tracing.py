@@ -0,0 +1,352 @@
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+logger = logging.getLogger("irida-tracing")
+
+TRACE_FORMATS = ['chrome', 'otlp']
+
+SERVICE_NAME = 'irida-sistr-results'
+
+# Number of finished spans to buffer before writing them to the trace file
+FLUSH_INTERVAL = 1000
+
+# Spans which get their own lane in the trace viewer when run in an asyncio task, shared by the spans within them
+LANE_SPANS = ['project', 'sample']
+
+# The span (if any) work in the current thread/task is part of
+_current_span = contextvars.ContextVar('irida_current_span', default=None)
+
+# The Tracer for this process, None (the default) when tracing is disabled
+_tracer = None
+
+
+class _NoSpan(object):
+    """A span which does nothing, used when tracing is disabled."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def set_attribute(self, key, value):
+        pass
+
+
+NO_SPAN = _NoSpan()
+
+
+class Span(object):
+    """A timed (and possibly nested) unit of work, written to the trace file when it ends."""
+
+    __slots__ = ('tracer', 'name', 'attributes', 'parent', 'span_id', 'lane', 'owns_lane', 'start_ns', 'end_ns',
+                 'error', '_token')
+
+    def __init__(self, tracer, name, parent, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.parent = parent
+        self.span_id = random.getrandbits(64) or 1
+        self.lane = None
+        self.owns_lane = False
+        self.start_ns = None
+        self.end_ns = None
+        self.error = None
+        self._token = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def __enter__(self):
+        self.lane = self.tracer._get_lane(self)
+        self._token = _current_span.set(self)
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.end_ns = time.perf_counter_ns()
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.error = exc_type.__name__ + ': ' + str(exc_value)
+        self.tracer._finish(self)
+        return False
+
+
+class Tracer(object):
+    """
+    Records nested timed spans to a file, as Chrome trace events (viewable in Perfetto or chrome://tracing) or as
+    OTLP-JSON (one ExportTraceServiceRequest per line, as written by the OpenTelemetry collector file exporter).
+
+    Spans are written in batches as they end, so memory use stays bounded on long runs.
+    """
+
+    def __init__(self, trace_file, trace_format='chrome'):
+        """
+        Creates a new Tracer.
+
+        :param trace_file: The file to write spans to.
+        :param trace_format: The format of the file, 'chrome' or 'otlp'.
+        """
+        if trace_format not in TRACE_FORMATS:
+            raise ValueError("Invalid trace format [{}], must be one of {}".format(trace_format, TRACE_FORMATS))
+
+        self.trace_file = trace_file
+        self.trace_format = trace_format
+        self.trace_id = '{:032x}'.format(random.getrandbits(128))
+        self.spans_written = 0
+
+        self._pid = os.getpid()
+        # Spans are timed with the (monotonic) performance counter, converted to wall clock time when written
+        self._epoch_offset_ns = time.time_ns() - time.perf_counter_ns()
+        self._lock = threading.Lock()
+        self._pending = []
+        self._lane_count = 0
+        self._thread_lanes = {}
+        self._free_lanes = {}
+        self._trace_h = open(trace_file, 'w')
+
+        if self.trace_format == 'chrome':
+            self._trace_h.write('{"traceEvents": [\n')
+            self._write_chrome_event({'name': 'process_name', 'ph': 'M', 'pid': self._pid, 'tid': 0,
+                                      'args': {'name': SERVICE_NAME}}, first=True)
+
+    def span(self, name, parent=None, **attributes):
+        """
+        Creates a span, timed while used as a context manager.
+
+        :param name: The name of the span (e.g., 'project').
+        :param parent: The parent span, defaults to the current span of this thread/task.
+        :param attributes: Attributes of the span (e.g., project=1).
+        :return: The span.
+        """
+        return Span(self, name, parent if parent is not None else _current_span.get(), attributes)
+
+    def _get_lane(self, span):
+        """
+        Gets the row in the trace viewer for a span started now. Spans in a thread go in the row of that thread. Spans
+        in an asyncio task (which overlap other tasks on the same thread) go in the row of the project or sample they
+        are part of, the rows of finished projects/samples being reused by the next ones.
+        """
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+
+        if task is not None:
+            if span.name in LANE_SPANS:
+                span.owns_lane = True
+                return self._acquire_lane(span.name)
+
+            parent = span.parent
+            while parent is not None:
+                if parent.name in LANE_SPANS:
+                    return parent.lane
+                parent = parent.parent
+
+        key = threading.get_ident()
+        with self._lock:
+            lane = self._thread_lanes.get(key)
+            if lane is None:
+                lane = self._thread_lanes[key] = self._new_lane(threading.current_thread().name)
+        return lane
+
+    def _acquire_lane(self, name):
+        with self._lock:
+            free_lanes = self._free_lanes.setdefault(name, [])
+            return free_lanes.pop() if free_lanes else self._new_lane(name)
+
+    def _new_lane(self, name):
+        self._lane_count += 1
+        if self.trace_format == 'chrome':
+            self._write_chrome_event({'name': 'thread_name', 'ph': 'M', 'pid': self._pid, 'tid': self._lane_count,
+                                      'args': {'name': name}})
+        return self._lane_count
+
+    def _finish(self, span):
+        with self._lock:
+            if span.owns_lane:
+                self._free_lanes[span.name].append(span.lane)
+            self._pending.append(span)
+            if len(self._pending) >= FLUSH_INTERVAL:
+                self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+
+        if self.trace_format == 'chrome':
+            for span in self._pending:
+                self._write_chrome_event(self._to_chrome_event(span))
+        else:
+            self._trace_h.write(json.dumps(self._to_otlp_request(self._pending), separators=(',', ':')) + '\n')
+
+        self.spans_written += len(self._pending)
+        self._pending = []
+
+    def _write_chrome_event(self, event, first=False):
+        self._trace_h.write(('' if first else ',\n') + json.dumps(event, separators=(',', ':')))
+
+    def _to_chrome_event(self, span):
+        args = dict(span.attributes)
+        if span.error is not None:
+            args['error'] = span.error
+
+        return {
+            'name': span.name,
+            'cat': span.name.split(' ')[0],
+            'ph': 'X',
+            'ts': (span.start_ns + self._epoch_offset_ns) / 1000,
+            'dur': (span.end_ns - span.start_ns) / 1000,
+            'pid': self._pid,
+            'tid': span.lane,
+            'args': args,
+        }
+
+    def _to_otlp_value(self, value):
+        if isinstance(value, bool):
+            return {'boolValue': value}
+        elif isinstance(value, int):
+            return {'intValue': str(value)}
+        elif isinstance(value, float):
+            return {'doubleValue': value}
+        else:
+            return {'stringValue': str(value)}
+
+    def _to_otlp_span(self, span):
+        otlp_span = {
+            'traceId': self.trace_id,
+            'spanId': '{:016x}'.format(span.span_id),
+            'name': span.name,
+            'kind': 3 if span.name.startswith('GET') else 1,
+            'startTimeUnixNano': str(span.start_ns + self._epoch_offset_ns),
+            'endTimeUnixNano': str(span.end_ns + self._epoch_offset_ns),
+            'attributes': [{'key': key, 'value': self._to_otlp_value(value)} for key, value in
+                           span.attributes.items()],
+            'status': {'code': 2, 'message': span.error} if span.error is not None else {'code': 1},
+        }
+        if span.parent is not None:
+            otlp_span['parentSpanId'] = '{:016x}'.format(span.parent.span_id)
+
+        return otlp_span
+
+    def _to_otlp_request(self, spans):
+        return {'resourceSpans': [{
+            'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': SERVICE_NAME}}]},
+            'scopeSpans': [{
+                'scope': {'name': 'irida_sistr_results'},
+                'spans': [self._to_otlp_span(span) for span in spans],
+            }],
+        }]}
+
+    def close(self):
+        """Writes any remaining spans and closes the trace file."""
+        with self._lock:
+            self._flush()
+            if self.trace_format == 'chrome':
+                self._trace_h.write('\n]}\n')
+            self._trace_h.close()
+
+
+def start_tracing(trace_file, trace_format='chrome'):
+    """
+    Starts tracing, recording all spans in this process to a file until stop_tracing() is called.
+
+    :param trace_file: The file to write spans to.
+    :param trace_format: The format of the file, 'chrome' (Chrome trace events) or 'otlp' (OTLP-JSON lines).
+    :return: The Tracer.
+    """
+    global _tracer
+    if _tracer is not None:
+        raise Exception("Tracing already started, writing to " + _tracer.trace_file)
+
+    _tracer = Tracer(trace_file, trace_format)
+    return _tracer
+
+
+def stop_tracing():
+    """Stops tracing and closes the trace file (if tracing was started)."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is not None:
+        tracer.close()
+        logger.debug("Wrote %s spans to trace file %s", tracer.spans_written, tracer.trace_file)
+
+
+def is_tracing():
+    """Whether or not tracing is enabled."""
+    return _tracer is not None
+
+
+def span(name, parent=None, **attributes):
+    """
+    Creates a span of work, timed while used as a context manager (e.g., with span('project', project=1): ...).
+    Does nothing (and costs next to nothing) when tracing is disabled.
+
+    :param name: The name of the span.
+    :param parent: The parent span, defaults to the current span of this thread/task.
+    :param attributes: Attributes of the span.
+    :return: The span, or NO_SPAN if tracing is disabled.
+    """
+    if _tracer is None:
+        return NO_SPAN
+    return _tracer.span(name, parent, **attributes)
+
+
+def current_span():
+    """Gets the current span of this thread/task, or NO_SPAN if there is none (or tracing is disabled)."""
+    if _tracer is None:
+        return NO_SPAN
+    return _current_span.get() or NO_SPAN
+
+
+def propagate(fn):
+    """
+    Wraps a function to be run in another thread (e.g., by an Executor), so spans it creates are children of the
+    current span of the calling thread.
+
+    :param fn: The function.
+    :return: The wrapped function (or fn itself if tracing is disabled).
+    """
+    if _tracer is None:
+        return fn
+
+    parent = _current_span.get()
+
+    def run_in_span(*args, **kwargs):
+        token = _current_span.set(parent)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current_span.reset(token)
+
+    return run_in_span
+
+
+def propagate_async(coroutine):
+    """
+    Wraps a coroutine to be run on an event loop in another thread (e.g., by asyncio.run_coroutine_threadsafe()), so
+    spans it creates are children of the current span of the calling thread.
+
+    :param coroutine: The coroutine.
+    :return: The wrapped coroutine (or coroutine itself if tracing is disabled).
+    """
+    if _tracer is None:
+        return coroutine
+
+    parent = _current_span.get()
+
+    async def run_in_span():
+        # The task running this has its own copy of the context, so the parent is not seen by other tasks
+        _current_span.set(parent)
+        return await coroutine
+
+    return run_in_span()
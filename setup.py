@@ -31,6 +31,11 @@ setup(name='irida-sistr-results',
           'appdirs>=1.4.3',
           'pandas>=0.23.0'
       ],
+      extras_require={
+          'async': ['aiohttp>=3.5'],
+          'parquet': ['pyarrow>=1.0'],
+          'zstd': ['zstandard>=0.15']
+      },
       test_suite='nose.collector',
       tests_require=['nose'],
       packages=find_packages(),